@@ -0,0 +1,193 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import tenancy
+
+# Sustained chat requests per minute and burst allowance, per browser session and per client IP.
+CHAT_RATE_PER_MINUTE = float(os.getenv("CHAT_RATE_PER_MINUTE", "20"))
+CHAT_BURST = float(os.getenv("CHAT_BURST", "5"))
+CHAT_IP_RATE_PER_MINUTE = float(os.getenv("CHAT_IP_RATE_PER_MINUTE", "60"))
+CHAT_IP_BURST = float(os.getenv("CHAT_IP_BURST", "15"))
+# Chat requests processed at once; the rest wait in a bounded queue for at most the deadline.
+CHAT_MAX_CONCURRENT = max(1, int(os.getenv("CHAT_MAX_CONCURRENT", "8")))
+CHAT_MAX_QUEUE = max(0, int(os.getenv("CHAT_MAX_QUEUE", "16")))
+CHAT_QUEUE_DEADLINE_SECONDS = float(os.getenv("CHAT_QUEUE_DEADLINE", "5"))
+# Upstream OpenAI calls in flight across all requests, and how long a call may wait for a slot.
+OPENAI_MAX_CONCURRENT = max(1, int(os.getenv("OPENAI_MAX_CONCURRENT", "4")))
+OPENAI_WAIT_SECONDS = float(os.getenv("OPENAI_WAIT_SECONDS", "10"))
+BUCKET_CACHE_SIZE = int(os.getenv("RATE_LIMIT_CACHE_SIZE", "10000"))
+
+
+class Rejected(Exception):
+    """
+    Request refused before doing any work. status is 429 (this client is over its rate) or
+    503 (the server is saturated); retry_after is the suggested wait in seconds.
+    """
+
+    def __init__(self, status: int, retry_after: float, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: float) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """
+        Takes one token. Returns 0 on success, otherwise the seconds until a token is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class _Counters:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.values: Dict[str, float] = {}
+
+    def add(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + amount
+
+    def peak(self, name: str, value: float) -> None:
+        with self._lock:
+            if value > self.values.get(name, 0):
+                self.values[name] = value
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.values)
+
+
+class Gate:
+    """
+    Concurrency limit with a bounded FIFO-ish wait queue. When the queue is full, or a waiter's
+    deadline passes, the request is shed with a 503 instead of tying up a worker indefinitely.
+    """
+
+    def __init__(self, limit: int, max_queue: int, deadline: float, counters: _Counters, name: str) -> None:
+        self.limit = limit
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.name = name
+        self.active = 0
+        self.waiting = 0
+        self._counters = counters
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return
+            if self.waiting >= self.max_queue:
+                self._counters.add(f"{self.name}_rejected_queue_full")
+                raise Rejected(503, self.deadline, "The assistant is busy right now. Please try again shortly.")
+            self.waiting += 1
+            self._counters.peak(f"{self.name}_queue_peak", self.waiting)
+            started = time.monotonic()
+            give_up = started + self.deadline
+            try:
+                while self.active >= self.limit:
+                    remaining = give_up - time.monotonic()
+                    if remaining <= 0:
+                        self._counters.add(f"{self.name}_rejected_deadline")
+                        raise Rejected(503, self.deadline, "The assistant is busy right now. Please try again shortly.")
+                    self._cond.wait(remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+            self._counters.add(f"{self.name}_queued")
+            self._counters.add(f"{self.name}_queue_wait_ms", (time.monotonic() - started) * 1000.0)
+
+    def release(self) -> None:
+        with self._cond:
+            self.active = max(0, self.active - 1)
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+counters = _Counters()
+_session_buckets: "tenancy.LRUCache[TokenBucket]" = tenancy.LRUCache(BUCKET_CACHE_SIZE)
+_ip_buckets: "tenancy.LRUCache[TokenBucket]" = tenancy.LRUCache(BUCKET_CACHE_SIZE)
+chat_gate = Gate(CHAT_MAX_CONCURRENT, CHAT_MAX_QUEUE, CHAT_QUEUE_DEADLINE_SECONDS, counters, "chat")
+upstream_gate = Gate(OPENAI_MAX_CONCURRENT, CHAT_MAX_CONCURRENT, OPENAI_WAIT_SECONDS, counters, "openai")
+
+
+def check_rate(session_id: str, ip: Optional[str]) -> None:
+    wait = _session_buckets.get_or_create(
+        session_id, lambda: TokenBucket(CHAT_RATE_PER_MINUTE, CHAT_BURST)
+    ).take()
+    if not wait and ip:
+        wait = _ip_buckets.get_or_create(ip, lambda: TokenBucket(CHAT_IP_RATE_PER_MINUTE, CHAT_IP_BURST)).take()
+    if wait:
+        counters.add("chat_rejected_rate")
+        raise Rejected(429, wait, "You're sending messages a little fast. Please wait a moment and try again.")
+
+
+def admit(session_id: str, ip: Optional[str]) -> None:
+    """
+    Rate check then a chat slot. The caller must call finish() once the request completes.
+    """
+    check_rate(session_id, ip)
+    chat_gate.acquire()
+    counters.add("chat_admitted")
+
+
+def finish() -> None:
+    chat_gate.release()
+
+
+def upstream_slot():
+    # wraps each OpenAI call so a burst of chats cannot open unbounded upstream connections
+    return upstream_gate.slot()
+
+
+def stats() -> Dict:
+    values = counters.snapshot()
+    queued = values.get("chat_queued", 0)
+    return {
+        "chat": {
+            "active": chat_gate.active,
+            "queue_depth": chat_gate.waiting,
+            "limit": chat_gate.limit,
+            "max_queue": chat_gate.max_queue,
+            "admitted": int(values.get("chat_admitted", 0)),
+            "queued": int(queued),
+            "queue_peak": int(values.get("chat_queue_peak", 0)),
+            "avg_queue_wait_ms": round(values.get("chat_queue_wait_ms", 0) / queued, 1) if queued else 0.0,
+            "rejected_rate": int(values.get("chat_rejected_rate", 0)),
+            "rejected_queue_full": int(values.get("chat_rejected_queue_full", 0)),
+            "rejected_deadline": int(values.get("chat_rejected_deadline", 0)),
+        },
+        "openai": {
+            "active": upstream_gate.active,
+            "queue_depth": upstream_gate.waiting,
+            "limit": upstream_gate.limit,
+            "queued": int(values.get("openai_queued", 0)),
+            "rejected": int(values.get("openai_rejected_queue_full", 0) + values.get("openai_rejected_deadline", 0)),
+        },
+    }
@@ -1,30 +1,47 @@
-from flask import Flask, request, jsonify, redirect, session
+from flask import Blueprint, Flask, Response, g, request, jsonify, redirect, session, stream_with_context
 from flask_cors import CORS
-from openai import OpenAI
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 import os
 import json
+import hashlib
+import time
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Tuple, Union
-
-try:
-    from zoneinfo import ZoneInfo
-except ImportError:
-    ZoneInfo = None
-
-import httpx
-from google_auth_oauthlib.flow import Flow
+from uuid import uuid4
 
 from google_calendar import (
     get_calendar_service,
     is_connected,
-    save_creds,
     create_calendar_event,
     find_events,
-    update_calendar_event,
-    delete_calendar_event,
+    create_calendar_events,
+    free_busy,
+    reschedule_events,
+    delete_calendar_events,
+    patch_calendar_events,
+    TOKEN_PATH,
 )
 from tools import calendar_tools
+import admission
+import compression
+import date_ranges
+import event_bus
+import idempotency
+import goal_planner
+import google_oauth
+import jobs
+import json_provider
+import notifications
+import pending_actions
+import recurrence
+import reminders
+import response_cache
+import schedule_optimizer
+import scheduling
+import tenancy
+import timeutils
 
 from goals import (
     create_goal as storage_create_goal,
@@ -32,21 +49,30 @@ from goals import (
     list_goals as storage_list_goals,
     update_goal as storage_update_goal,
     get_goal as storage_get_goal,
+    list_goal_history as storage_list_goal_history,
+    query_goals as storage_query_goals,
+    store_revision as storage_revision,
+    changes_since as storage_changes_since,
 )
 
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app, supports_credentials=True)
+# every route and request hook lives on this blueprint; create_app() builds the Flask app around it
+api = Blueprint("api", __name__)
+
 
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-change-me")
+# openai alone is most of the import time, so the client is built on the first call that needs it
+@lru_cache(maxsize=1)
+def openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+def _embed(text: str):
+    with admission.upstream_slot():
+        return openai_client().embeddings.create(model="text-embedding-3-small", input=text).data[0].embedding
 
 
-GOOGLE_SCOPES = ["https://www.googleapis.com/auth/calendar"]
-GOOGLE_CLIENT_SECRETS_FILE = "credentials.json"
-REDIRECT_URI = "http://localhost:5000/api/google/oauth2callback"
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
 def _origin_from_url(url: Optional[str]) -> Optional[str]:
@@ -83,15 +109,122 @@ def _cors_origins() -> list[str]:
 
 
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+# Number of reverse proxies in front of the app. X-Forwarded-For/-Proto are only trusted when set.
+TRUSTED_PROXIES = max(0, int(os.getenv("TRUSTED_PROXIES", "0")))
+
+
+# Job workers and the reminder timer start with the first request, in the process that serves
+# it. Under the reloader (`python app.py`, `flask run --reload`) create_app() also runs in the
+# watcher parent, which must not claim jobs into memory no request will ever read.
+@api.before_app_request
+def _start_workers():
+    jobs.start()
+    reminders.start()
+
+
+def _legacy_store_in_use() -> bool:
+    token = tenancy.set_current_user(tenancy.DEFAULT_USER)
+    try:
+        return bool(storage_list_goals()) or os.path.exists(TOKEN_PATH)
+    finally:
+        tenancy.reset_current_user(token)
+
+
+# every browser session gets its own goals and Google credentials; the first one after an
+# upgrade from the shared store takes that store over instead of starting empty
+@api.before_app_request
+def _bind_session_user():
+    uid = session.get("uid")
+    if not uid:
+        uid = tenancy.DEFAULT_USER if tenancy.claim_legacy(_legacy_store_in_use) else uuid4().hex
+        session["uid"] = uid
+        session.permanent = True
+    g.user_token = tenancy.set_current_user(uid)
+
+
+_REMINDER_ENDPOINTS = frozenset({
+    "api.api_list_goals",
+    "api.api_create_goal",
+    "api.api_update_goal",
+    "api.chat",
+    "api.api_reminders",
+})
+
+
+# dates are shown and scheduled in the browser's timezone, remembered on the session
+@api.before_app_request
+def _bind_timezone():
+    zone = request.headers.get("X-Timezone")
+    if timeutils.is_valid_zone(zone):
+        session["timezone"] = zone
+    g.zone_token = timeutils.set_zone(session.get("timezone"))
+    # a user's goal and event reminders load the first time they use a route that shows or
+    # changes them; health checks and other reads don't leave a reload job behind
+    if request.endpoint in _REMINDER_ENDPOINTS:
+        reminders.ensure_loaded()
+
+
+def _rejection_response(e: admission.Rejected):
+    resp = jsonify({"error": str(e), "reply": str(e)})
+    resp.status_code = e.status
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp
+
+
+# chat requests are rate limited per session and IP and queued behind a concurrency limit
+@api.before_app_request
+def _admit_chat():
+    if request.endpoint != "api.chat":
+        return None
+    # a retry of a chat that already completed is answered before it spends a token
+    replayed = idempotency.stored_response()
+    if replayed is not None:
+        return replayed
+    try:
+        # the uid cookie is the client's to drop, so the address bucket always applies too
+        admission.admit(session["uid"], request.remote_addr or "unknown")
+    except admission.Rejected as e:
+        return _rejection_response(e)
+    g.chat_admitted = True
+    return None
+
+
+@api.teardown_app_request
+def _release_chat(exc=None):
+    if g.pop("chat_admitted", False):
+        admission.finish()
 
-# function to format current datetime in Sydney timezone
-def _current_sydney_datetime() -> datetime:
-    if ZoneInfo:
+
+@api.teardown_app_request
+def _unbind_session_user(exc=None):
+    token = g.pop("user_token", None)
+    if token is not None:
         try:
-            return datetime.now(ZoneInfo("Australia/Sydney"))
-        except Exception:
+            tenancy.reset_current_user(token)
+        except ValueError:
+            # streamed responses tear down outside the context that bound the user
             pass
-    return datetime.now()
+    zone_token = g.pop("zone_token", None)
+    if zone_token is not None:
+        try:
+            timeutils.reset_zone(zone_token)
+        except ValueError:
+            pass
+
+# stores cacheable chat replies once the response is built (see the lookup in chat())
+@api.after_app_request
+def _store_cached_reply(resp):
+    key = g.pop("response_cache_key", None)
+    if key is not None and resp.status_code == 200 and resp.is_json:
+        payload = resp.get_json(silent=True)
+        if isinstance(payload, dict) and "error" not in payload:
+            elapsed_ms = (time.perf_counter() - g.response_cache_started) * 1000.0
+            response_cache.cache.put(key, payload, elapsed_ms, ttl=g.get("response_cache_ttl"))
+    return resp
+
+# function to get the current datetime in the user's timezone
+def _current_local_datetime() -> datetime:
+    return timeutils.now()
 
 # function to format decimal numbers
 def _format_decimal(value: Optional[Union[int, float]]) -> Optional[str]:
@@ -164,9 +297,49 @@ def _compose_goal_progress(goal: dict) -> str:
     summary = " ".join(sentences)
     return f"{title} — {summary}".strip()
 
+# function to compose a one-line pace summary from a goal_analytics insight
+def _compose_goal_insight(item: dict) -> str:
+    unit = item.get("unit") or ""
+
+    def fmt_amount(value: Optional[float]) -> str:
+        text = _format_decimal(value) or "0"
+        if unit == "%":
+            return f"{text}%"
+        if unit == "$":
+            return f"${text}"
+        return f"{text} {unit}".strip()
+
+    state = item.get("state")
+    title = item.get("title") or "Untitled goal"
+    if state == "complete":
+        return f"{title} — done, nice work."
+    sentences = []
+    if state == "overdue":
+        sentences.append(f"Past its target date ({item.get('target_date')}) with {fmt_amount(item['remaining'])} to go.")
+    elif state == "inactive":
+        sentences.append(f"Paused with {fmt_amount(item['remaining'])} to go.")
+    else:
+        label = {"at_risk": "At risk", "ahead": "Ahead of schedule", "on_track": "On track"}.get(state)
+        if label:
+            sentences.append(f"{label}.")
+        if item.get("projected_completion"):
+            pace = f"You're averaging {fmt_amount(round(item['pace_per_day'], 2))}/day"
+            if item.get("required_per_day") is not None:
+                pace += f" and need {fmt_amount(round(item['required_per_day'], 2))}/day to finish by {item.get('target_date')}"
+            sentences.append(f"{pace}.")
+            sentences.append(f"At this pace you'll finish around {timeutils.fmt_date_only(item['projected_completion'])}.")
+        else:
+            sentences.append("No progress logged yet, so there's no finish date to project.")
+            if item.get("required_per_day") is not None:
+                sentences.append(f"You need {fmt_amount(round(item['required_per_day'], 2))}/day to finish by {item.get('target_date')}.")
+    if item.get("stalled"):
+        sentences.append(f"No updates in {int(item.get('idle_days') or 0)} days.")
+    return f"{title} — {' '.join(sentences)}"
+
+# public client address for geolocation, None for local and private networks. remote_addr is
+# the client ProxyFix recovered from X-Forwarded-For when TRUSTED_PROXIES is set, else the peer.
 def get_client_ip(req: request) -> Optional[str]:
-    fwd = req.headers.get("X-Forwarded-For", "").split(",")[0].strip()
-    ip = fwd or req.remote_addr or ""
+    ip = req.remote_addr or ""
     if not ip:
         return None
     private_prefixes = (
@@ -179,10 +352,15 @@ def get_client_ip(req: request) -> Optional[str]:
         return None
     return ip
 
+# httpx is imported on first use; most requests never make an outbound call
+def _http_get(url: str, **kwargs):
+    import httpx
+    return httpx.get(url, **kwargs)
+
 def ip_to_location(ip: str) -> Optional[Tuple[float, float]]:
     try:
         url = f"http://ip-api.com/json/{ip}?fields=status,lat,lon"
-        r = httpx.get(url, timeout=5)
+        r = _http_get(url, timeout=5)
         if r.status_code == 200:
             j = r.json()
             if j.get("status") == "success":
@@ -202,12 +380,12 @@ def fetch_weather(lat: float, lon: float) -> Optional[dict]:
                 "appid": OPENWEATHER_API_KEY,
                 "units": "metric", "lang": "en",
             }
-            r = httpx.get("https://api.openweathermap.org/data/2.5/weather", params=params, timeout=8)
+            r = _http_get("https://api.openweathermap.org/data/2.5/weather", params=params, timeout=8)
             if r.status_code == 200:
                 j = r.json(); j["_source"] = "owm"
                 return j
         params = {"latitude": lat, "longitude": lon, "current_weather": True}
-        r2 = httpx.get("https://api.open-meteo.com/v1/forecast", params=params, timeout=8)
+        r2 = _http_get("https://api.open-meteo.com/v1/forecast", params=params, timeout=8)
         if r2.status_code == 200:
             j2 = r2.json(); j2["_source"] = "open-meteo"
             return j2
@@ -219,7 +397,7 @@ def reverse_geocode(lat: float, lon: float) -> Optional[str]:
     try:
         params = {"format": "jsonv2", "lat": lat, "lon": lon, "zoom": 10, "addressdetails": 1}
         headers = {"User-Agent": "ELEC5620-DOLMA-Demo/1.0"}
-        r = httpx.get("https://nominatim.openstreetmap.org/reverse", params=params, headers=headers, timeout=6)
+        r = _http_get("https://nominatim.openstreetmap.org/reverse", params=params, headers=headers, timeout=6)
         if r.status_code == 200:
             j = r.json(); addr = j.get("address", {}) if isinstance(j, dict) else {}
             city = addr.get("city") or addr.get("town") or addr.get("village") or addr.get("municipality") or addr.get("county")
@@ -269,95 +447,374 @@ def build_weather_tips(temp: Optional[float], cond_text: Optional[str], wind: Op
     return " ".join(tips)
 
 
-# formats date for Sydney
+# formats date in the user's timezone
 def _fmt_date_only(dt_iso: str) -> str:
-    tz = ZoneInfo("Australia/Sydney")
-    dt = datetime.fromisoformat(dt_iso.replace("Z", "+00:00")).astimezone(tz)
-    return dt.strftime("%A, %d %B %Y")
+    return timeutils.fmt_date_only(dt_iso)
 
-# format time for Sydney
+# format time in the user's timezone
 def _fmt_time_range(start_iso: str, end_iso: str) -> str:
-    tz = ZoneInfo("Australia/Sydney")
-    s = datetime.fromisoformat(start_iso.replace("Z", "+00:00")).astimezone(tz)
-    e = datetime.fromisoformat(end_iso.replace("Z", "+00:00")).astimezone(tz)
-    # remove leading zero from hour
-    st = s.strftime("%I:%M %p").lstrip("0")
-    et = e.strftime("%I:%M %p").lstrip("0")
-    return f"{st} – {et}"
-
-# converts ISO 8601 string to a short human-readable datetime in Sydney
+    return timeutils.fmt_time_range(start_iso, end_iso)
+
+# converts ISO 8601 string to a short human-readable datetime in the user's timezone
 def _fmt(dt_iso: str) -> str:
-    tz = ZoneInfo("Australia/Sydney")
-    dt = datetime.fromisoformat(dt_iso.replace("Z", "+00:00")).astimezone(tz)
-    # example: 'Mon, 3 Nov 2:00 PM'
-    return dt.strftime("%a, %-d %b %-I:%M %p")
+    return timeutils.fmt_short(dt_iso)
 
 # converts ISO 8601 string to tz-aware datetime for Google Calendar updates.
-def _to_sydney_datetime(dt_iso: str):
-    tz = ZoneInfo("Australia/Sydney")
-    if isinstance(dt_iso, str) and "T" in dt_iso:
-        return datetime.fromisoformat(dt_iso.replace("Z", "+00:00")).astimezone(tz)
-    return dt_iso  # return as-is if already datetime
+def _to_local_datetime(dt_iso: str):
+    return timeutils.to_zone(dt_iso)
+
+
+
+# looks a goal up by id, falling back to a unique title match; returns (goal, error reply)
+def _find_goal(goal_id: Optional[str], goal_title: Optional[str]):
+    goal_id = (goal_id or "").strip()
+    goal_title = (goal_title or "").strip()
+    goal = None
+
+    if goal_id:
+        goal = storage_get_goal(goal_id)
+        if not goal and not goal_title:
+            goal_title = goal_id
+
+    if not goal and goal_title:
+        title_norm = goal_title.lower()
+        candidates = [
+            g for g in storage_list_goals()
+            if title_norm in (g.get("title") or "").lower()
+        ]
+        if len(candidates) == 1:
+            goal = candidates[0]
+        elif len(candidates) > 1:
+            suggestions = [
+                f"• {c.get('title', 'Untitled')} (ID: {c.get('id', '')[:6]})"
+                for c in candidates[:5]
+            ]
+            return None, (
+                "I found multiple goals matching that description:\n"
+                + "\n".join(suggestions)
+                + "\nCould you let me know which one you meant (by title or ID)?"
+            )
+
+    if not goal:
+        if goal_title:
+            return None, f"I couldn't find a goal that matches '{goal_title}'. Could you clarify the title?"
+        return None, "I couldn't find a goal with that ID. Could you double-check it?"
+    return goal, None
+
+
+# session plan for a goal around the user's calendar, from now (or start) until the goal's target date
+def _goal_plan(goal: dict, options: dict, start: Optional[datetime] = None) -> dict:
+    now = start or timeutils.now()
+    end = goal_planner.plan_end(goal, timeutils.current_zone(), now)
+    if end <= now:
+        raise ValueError("That goal's target date has already passed.")
+    events = find_events(now, end, max_results=2500)
+    busy = scheduling.IntervalIndex(scheduling.intervals_from_events(events)).busy()
+    free = scheduling.free_windows(
+        now,
+        end,
+        busy,
+        day_start=int(options.get("day_start_hour", scheduling.DAY_START_HOUR)),
+        day_end=int(options.get("day_end_hour", scheduling.DAY_END_HOUR)),
+    )
+    preferred = options.get("preferred_hour")
+    return goal_planner.plan_sessions(
+        goal,
+        free,
+        now,
+        end,
+        session_minutes=options.get("session_minutes"),
+        sessions_per_week=options.get("sessions_per_week"),
+        preferred_hour=float(preferred) if preferred is not None else None,
+    )
 
 
+# _goal_plan for the chat tool: (plan, None), or (None, reply) when there's nothing to schedule
+def _goal_plan_or_reply(goal: dict, options: dict, start: datetime):
+    try:
+        plan = _goal_plan(goal, options, start)
+    except ValueError as e:
+        return None, jsonify({"reply": str(e)})
+    except Exception as e:
+        return None, (jsonify({"reply": f"could not plan sessions: {e}"}), 500)
+    if not plan["sessions"]:
+        return None, jsonify({"reply": "I couldn't find any free time before the target date for sessions."})
+    return plan, None
+
+
+def _goal_plan_preview(plan: dict, note: str = "", action_id: Optional[str] = None):
+    sessions = plan["sessions"]
+    unit = plan["unit"]
+
+    def amount(value: float) -> str:
+        return f"{_format_decimal(round(value, 2))} {unit}".strip()
+
+    lines = [f"• {_fmt(s.start.isoformat())} – {timeutils.fmt_clock(s.end)} ({amount(s.amount)})" for s in sessions[:10]]
+    if len(sessions) > 10:
+        lines.append(f"…and {len(sessions) - 10} more, the last on {_fmt_date_only(sessions[-1].start.isoformat())}")
+    reply_md = note + (
+        f"Plan for '{plan['title']}': {len(sessions)} session(s) of up to {plan['session_minutes']} min "
+        f"covering {amount(plan['remaining'] - plan['unplanned_amount'])} of {amount(plan['remaining'])} remaining.\n\n"
+        + "\n".join(lines)
+    )
+    if plan["unscheduled"]:
+        reply_md += f"\n\nI couldn't fit {plan['unscheduled']} more session(s) before the target date."
+    reply_md += "\n\nAdd these to your calendar?"
+    return jsonify({
+        "reply": f"I can schedule {len(sessions)} session(s) for '{plan['title']}'.",
+        "reply_md": reply_md,
+        "cta": "add sessions?",
+        "action_id": action_id,
+    })
 
-@app.get("/api/google/status")
+
+# ids and etags of previewed events, so a confirm writes exactly these and only if unchanged
+def _event_snapshot(events: list) -> list:
+    seen = set()
+    snapshot = []
+    for ev in events:
+        if ev.get("id") and ev["id"] not in seen:
+            seen.add(ev["id"])
+            snapshot.append({"id": ev["id"], "etag": ev.get("etag")})
+    return snapshot
+
+
+def _skipped_note(errors: dict) -> str:
+    if not errors:
+        return ""
+    changed = sum(1 for msg in errors.values() if msg == "changed since the preview")
+    note = f" {len(errors)} could not be changed"
+    if changed:
+        note += f" ({changed} changed since the preview, so I left them alone)"
+    return note + "."
+
+
+# applies confirmed field changes to previewed calendar events in one conditional batch
+def _apply_event_updates(items: list, updates: dict, query: str):
+    # ensure proper datetime conversion
+    updates_clean = {}
+    for k, v in updates.items():
+        if k in ("start_time", "end_time"):
+            updates_clean[k] = _to_local_datetime(v)
+        else:
+            updates_clean[k] = v
+
+    try:
+        updated, errors = patch_calendar_events(items, **updates_clean)
+    except Exception as e:
+        return jsonify({"reply": f"Could not update events matching '{query}': {e}"}), 500
+    for eid, msg in errors.items():
+        print(f"Failed to update event {eid}: {msg}")
+
+    if not updated:
+        return jsonify({"reply": f"Could not update events matching '{query}'.{_skipped_note(errors)}"})
+    return jsonify({"reply": f"Updated {len(updated)} event(s).{_skipped_note(errors)}"})
+
+
+# deletes previewed calendar events in one conditional batch
+def _apply_event_deletes(items: list, query: str):
+    try:
+        deleted, errors = delete_calendar_events(items)
+    except Exception as e:
+        return jsonify({"reply": f"Could not delete events matching '{query}': {e}"}), 500
+
+    if not deleted:
+        return jsonify({"reply": f"Could not delete events matching '{query}'.{_skipped_note(errors)}"})
+    return jsonify({"reply": f"Deleted {len(deleted)} event(s) matching '{query}'.{_skipped_note(errors)}"})
+
+
+# conflicts, busy/free windows and suggested slots for a range; other calendars come from freeBusy
+def _calendar_availability(
+    preset: Optional[str] = None,
+    time_min: Optional[str] = None,
+    time_max: Optional[str] = None,
+    duration_minutes: Optional[int] = None,
+    calendars: Optional[list] = None,
+    day_start: int = scheduling.DAY_START_HOUR,
+    day_end: int = scheduling.DAY_END_HOUR,
+    limit: int = 5,
+):
+    window = date_ranges.resolve(preset, time_min, time_max) or date_ranges.preset_range("next_7_days")
+    if window.end <= window.start:
+        raise ValueError("The end of the range must be after its start.")
+    if not (0 <= day_start < day_end <= 24):
+        raise ValueError("Working hours must satisfy 0 <= day_start < day_end <= 24.")
+    if duration_minutes is not None and not (5 <= duration_minutes <= 24 * 60):
+        raise ValueError("Duration must be between 5 minutes and 24 hours.")
+    events = find_events(window.start, window.end, max_results=250)
+    extra_busy = []
+    others = [c for c in (calendars or []) if c and c != "primary"]
+    if others:
+        for busy in free_busy(window.start, window.end, others).values():
+            extra_busy.extend(busy)
+    result = scheduling.availability(
+        events,
+        window.start,
+        window.end,
+        duration_minutes=duration_minutes,
+        extra_busy=extra_busy,
+        day_start=day_start,
+        day_end=day_end,
+        limit=limit,
+    )
+    result["range"] = {"start": window.start.isoformat(), "end": window.end.isoformat(), "label": window.header}
+    return result
+
+
+@api.get("/api/google/status")
 def google_status():
-    return jsonify({"connected": is_connected()})
+    return jsonify({"connected": is_connected(), "connecting": google_oauth.connecting()})
 
-@app.get("/api/google/login")
+@api.get("/api/google/login")
 def google_login():
-    flow = Flow.from_client_secrets_file(
-        GOOGLE_CLIENT_SECRETS_FILE,
-        scopes=GOOGLE_SCOPES,
-        redirect_uri=REDIRECT_URI,
-    )
-    authorization_url, state = flow.authorization_url(
-        access_type="offline",
-        include_granted_scopes="true",
-        prompt="consent",
-    )
-    session["oauth_state"] = state
+    # deployments whose frontend is an allowed CORS origin come back to it; others to FRONTEND_URL
+    return_to = _origin_from_url(request.args.get("return_to"))
+    if return_to not in _cors_origins():
+        return_to = FRONTEND_URL.rstrip("/")
+    try:
+        authorization_url = google_oauth.begin(request.url_root, return_to)
+    except google_oauth.OAuthError as e:
+        return jsonify({"error": str(e)}), 503
     return redirect(authorization_url)
 
-@app.get("/api/google/oauth2callback")
+@api.get("/api/google/oauth2callback")
 def google_oauth2callback():
-    state = session.get("oauth_state")
-    if not state:
-        return "Missing OAuth state. Try connecting again.", 400
-    flow = Flow.from_client_secrets_file(
-        GOOGLE_CLIENT_SECRETS_FILE,
-        scopes=GOOGLE_SCOPES,
-        redirect_uri=REDIRECT_URI,
-        state=state,
-    )
-    flow.fetch_token(authorization_response=request.url)
-    creds = flow.credentials
-    save_creds(creds)
-    return redirect(f"{FRONTEND_URL}/settings?google=connected")
+    try:
+        return_to = google_oauth.complete(request.args.get("state"), request.args.get("code"), request.args.get("error"))
+    except google_oauth.OAuthError as e:
+        return str(e), 400
+    # the token exchange finishes on a job worker; the settings page polls /api/google/status
+    return redirect(f"{return_to}/settings?google=connecting")
 
-@app.post("/api/google/disconnect")
+@api.post("/api/google/disconnect")
 def google_disconnect():
     try:
-        for candidate in ("token.json", "backend/token.json"):
-            try:
-                if os.path.exists(candidate):
-                    os.remove(candidate)
-            except Exception:
-                pass
+        google_oauth.disconnect()
         return jsonify({"ok": True})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
-@app.get("/api/goals")
+def _goals_etag(revision: int) -> str:
+    # Same user, store revision and query always yields identical JSON; revisions are per user,
+    # so the user is part of the hash. Compressed responses send it weak (compression.py), so
+    # requests are matched with weak comparison.
+    key = tenancy.current_user().encode() + b"?" + (request.query_string or b"")
+    return f"g{revision}-{hashlib.sha1(key).hexdigest()[:12]}"
+
+
+# goal lists are per session: shared caches must not store or revalidate them for others
+_GOALS_CACHE_CONTROL = "private, no-cache"
+
+
+@api.get("/api/goals")
 def api_list_goals():
-    status = request.args.get("status")
-    goals = storage_list_goals(status=status)
-    return jsonify({"goals": goals})
+    revision = storage_revision()
+    etag = _goals_etag(revision)
+    if request.if_none_match.contains_weak(etag):
+        not_modified = Response(status=304)
+        not_modified.set_etag(etag)
+        not_modified.headers["Cache-Control"] = _GOALS_CACHE_CONTROL
+        not_modified.vary.add("Cookie")
+        return not_modified
+
+    args = request.args
+    fields = [f.strip() for f in args.get("fields", "").split(",") if f.strip()] or None
+    sort = (args.get("sort") or "").strip() or None
+    descending = False
+    if sort and sort.startswith("-"):
+        sort, descending = sort[1:], True
+    if (args.get("order") or "").lower() == "desc":
+        descending = True
+    try:
+        limit = int(args["limit"]) if args.get("limit") else None
+        progress_min = int(args["progress_min"]) if args.get("progress_min") else None
+        progress_max = int(args["progress_max"]) if args.get("progress_max") else None
+    except ValueError:
+        return jsonify({"error": "limit, progress_min and progress_max must be integers."}), 400
+    try:
+        result = storage_query_goals(
+            status=args.get("status"),
+            fields=fields,
+            sort=sort,
+            descending=descending,
+            limit=limit,
+            cursor=args.get("cursor"),
+            due_before=args.get("due_before") or None,
+            due_after=args.get("due_after") or None,
+            progress_min=progress_min,
+            progress_max=progress_max,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result["revision"] = revision
+    resp = jsonify(result)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = _GOALS_CACHE_CONTROL
+    resp.vary.add("Cookie")
+    return resp
+
+
+@api.get("/api/goals/changes")
+def api_goal_changes():
+    try:
+        since = int(request.args.get("since", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "since must be an integer revision."}), 400
+    changes = storage_changes_since(since)
+    if request.args.get("include") == "goals" and changes["changed"]:
+        goals = [storage_get_goal(gid) for gid in changes["changed"]]
+        changes["goals"] = [g for g in goals if g]
+    return jsonify(changes)
+
+
+@api.get("/api/goals/<goal_id>/history")
+def api_goal_history(goal_id: str):
+    try:
+        limit = int(request.args.get("limit", 20))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Limit must be an integer."}), 400
+    try:
+        page = storage_list_goal_history(goal_id, cursor=request.args.get("cursor"), limit=limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if page is None:
+        return jsonify({"error": "Goal not found."}), 404
+    return jsonify(page)
+
 
+@api.get("/api/goals/insights")
+def api_goal_insights():
+    import goal_analytics  # pulls in numpy, so only loaded once insights are asked for
+    result = goal_analytics.insights(status=(request.args.get("state") or "").strip() or None)
+    return jsonify(result)
 
-@app.post("/api/goals")
+
+@api.get("/api/calendar/free")
+def api_calendar_free():
+    if not is_connected():
+        return jsonify({"error": "Google Calendar is not connected."}), 409
+    try:
+        duration = request.args.get("duration")
+        result = _calendar_availability(
+            preset=request.args.get("preset"),
+            time_min=request.args.get("time_min"),
+            time_max=request.args.get("time_max"),
+            duration_minutes=int(duration) if duration else None,
+            calendars=[c.strip() for c in request.args.get("calendars", "").split(",") if c.strip()],
+            day_start=int(request.args.get("day_start", scheduling.DAY_START_HOUR)),
+            day_end=int(request.args.get("day_end", scheduling.DAY_END_HOUR)),
+            limit=int(request.args.get("limit", 5)),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"could not fetch availability: {e}"}), 502
+    return jsonify(result)
+
+
+@api.post("/api/goals")
+@idempotency.idempotent
 def api_create_goal():
     data = request.get_json(force=True, silent=True) or {}
     try:
@@ -375,7 +832,8 @@ def api_create_goal():
         return jsonify({"error": str(e)}), 400
 
 
-@app.patch("/api/goals/<goal_id>")
+@api.patch("/api/goals/<goal_id>")
+@idempotency.idempotent
 def api_update_goal(goal_id: str):
     data = request.get_json(force=True, silent=True) or {}
     kwargs = {}
@@ -414,8 +872,12 @@ def api_update_goal(goal_id: str):
             was_completed_before = prev_status == "completed" or prev_progress == 100
             if is_now_completed and not was_completed_before:
                 goal_title = goal.get("title") or "Goal"
-                system_message = f"I’ve sent the confirmation email—'{goal_title}' is now complete. Fantastic work!"
-                print("EMAIL SENT to USER - GOAL COMPLETED")
+                notifications.goal_completed(goal)
+                # the email is queued, and skipped entirely without SMTP settings
+                if notifications.email_enabled():
+                    system_message = f"A confirmation email is on its way—'{goal_title}' is now complete. Fantastic work!"
+                else:
+                    system_message = f"'{goal_title}' is now complete. Fantastic work!"
 
         payload = dict(goal)
         if system_message:
@@ -425,7 +887,7 @@ def api_update_goal(goal_id: str):
         return jsonify({"error": str(e)}), 400
 
 
-@app.delete("/api/goals/<goal_id>")
+@api.delete("/api/goals/<goal_id>")
 def api_delete_goal(goal_id: str):
     goal = storage_get_goal(goal_id)
     if not goal:
@@ -434,16 +896,21 @@ def api_delete_goal(goal_id: str):
     if not deleted:
         return jsonify({"error": "Goal not found."}), 404
     goal_title = goal.get("title") or "Goal"
-    print("EMAIL SENT to USER - GOAL DELETED")
+    notifications.goal_deleted(goal)
+    if notifications.email_enabled():
+        system_message = f"A quick note is on its way by email—'{goal_title}' has been removed from your list."
+    else:
+        system_message = f"'{goal_title}' has been removed from your list."
     return jsonify({
         "ok": True,
-        "system_message": f"I’ve emailed a quick note—'{goal_title}' has been removed from your list."
+        "system_message": system_message,
     })
     
 
 
 
-@app.post("/api/chat")
+@api.post("/api/chat")
+@idempotency.idempotent
 def chat():
     data = request.get_json(force=True, silent=True) or {}
     user_message = data.get("message")
@@ -453,9 +920,18 @@ def chat():
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
 
-    sydney_now = _current_sydney_datetime()
-    today_label = sydney_now.strftime("%A, %d %B %Y")
-    current_year = sydney_now.year
+    local_now = _current_local_datetime()
+    today_label = local_now.strftime("%A, %d %B %Y")
+    current_year = local_now.year
+    zone_name = timeutils.current_zone_name()
+    zone_note = f"The user's timezone is {zone_name} (currently {timeutils.offset_label(local_now)}). "
+    upcoming = timeutils.next_transition(timeutils.zone_profile(zone_name), local_now)
+    if upcoming and upcoming[0] - local_now < timedelta(days=60):
+        changes_at = upcoming[0].astimezone(local_now.tzinfo)
+        zone_note += (
+            f"Clocks change on {changes_at.strftime('%A, %d %B %Y')}; use offset "
+            f"{timeutils.offset_label(changes_at)} for times from then on. "
+        )
 
     system_prompt = (
         "You are DOLMA, a friendly and intelligent personal assistant. "
@@ -467,11 +943,13 @@ def chat():
         "Do not add or remove events without explicit consent; summarize details first and ask for confirmation. "
         "Be proactive about the user's goals: suggest milestones and check-ins. "
         "Use the goal tools to list, create, or update goals, but always provide a clear preview and obtain explicit approval before saving changes. "
-        f"It is currently {today_label} in Sydney, Australia—include the year ({current_year}) whenever you mention a date. "
+        f"It is currently {today_label} in {zone_name}—include the year ({current_year}) whenever you mention a date. "
+        + zone_note +
         "When tracking goals, capture the user's target totals (distance, pages, savings, etc.) and progress in real units so you can talk about what is done and what remains. "
         "You can obtain weather for the user's location and provide schedule suggestios based on conditions. "
         "If user grants location, use it to personalize recommendations. "
         "When adding or updating events: You may note real overlaps, but never infer or assume conflicts between back-to-back events. Only flag a conflict if an event’s start_time is strictly earlier than another event’s end_time and its end_time is strictly later than that event’s start_time. Do not propose reschedules or suggest alternatives automatically; just continue with the user’s requested change. "
+        "Use find_free_time to check for conflicts, free time or open slots instead of working them out from event text. "
     )
 
     trimmed_history = [m for m in conversation if m.get("role") in ("user", "assistant")][-6:]
@@ -500,6 +978,29 @@ def chat():
     wants_weather = any(k in text_l for k in ["weather", "forecast", "temperature", "rain", "sunny"]) \
         or any(k in user_message for k in ["天气", "气温", "下雨", "预报"]) if isinstance(user_message, str) else False
 
+    # repeated questions against unchanged goals/calendar/weather skip the model entirely;
+    # confirmations depend on session state, so nothing is cached while one is pending
+    if not pending_actions.has_pending() and not data.get("no_cache"):
+        cell = None
+        if wants_weather:
+            cell = response_cache.weather_cell(lat, lon, get_client_ip(request))
+        cache_key = response_cache.cache.make_key(
+            user_message,
+            goal_revision=storage_revision(),
+            local_date=local_now.date().isoformat(),
+            zone=zone_name,
+            weather=cell,
+            history=trimmed_history,
+        )
+        cached = response_cache.cache.get(cache_key)
+        if cached is not None:
+            resp = jsonify(cached)
+            resp.headers["X-Cache"] = "HIT"
+            return resp
+        g.response_cache_key = cache_key
+        g.response_cache_started = time.perf_counter()
+        g.response_cache_ttl = response_cache.WEATHER_TTL_SECONDS if wants_weather else None
+
     extras = {}
     if wants_weather:
         if lat is None or lon is None:
@@ -548,19 +1049,22 @@ def chat():
                 })
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            tools=calendar_tools,
-            tool_choice="auto",
-            max_completion_tokens=250,
-        )
+        with admission.upstream_slot():
+            response = openai_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                tools=calendar_tools,
+                tool_choice="auto",
+                max_completion_tokens=250,
+            )
         msg = response.choices[0].message
 
         if getattr(msg, "tool_calls", None):
             for call in msg.tool_calls:
                 func_name = call.function.name
                 args = json.loads(call.function.arguments or "{}")
+                if func_name not in response_cache.CACHEABLE_TOOLS or args.get("confirm"):
+                    g.pop("response_cache_key", None)
                 
                 # checks Google Calendar connection for calendar-related functions
                 if func_name in {
@@ -568,8 +1072,11 @@ def chat():
                     "create_event",
                     "update_event",
                     "delete_event",
-                    "optimize_schedule"
+                    "find_free_time",
+                    "optimize_schedule",
+                    "plan_goal_sessions",
                 } and not is_connected():
+                    g.pop("response_cache_key", None)
                     return jsonify({
                                     "reply": "I can’t access your calendar yet. Please connect your Google Calendar using Settings, then ask me again.",
                                 }), 200
@@ -590,60 +1097,80 @@ def chat():
                             return jsonify({"reply": "i need title, start_time, and end_time for each event."})
 
                         # build preview lines
+                        formatted = []
+                        for ev in incoming_batch:
+                            formatted.append((
+                                ev.get("summary") or "(no title)",
+                                _fmt_date_only(ev["start_time"]),
+                                _fmt_time_range(ev["start_time"], ev["end_time"]),
+                            ))
                         lines = []
-                        for i, ev in enumerate(incoming_batch, start=1):
-                            title = ev.get("summary") or "(no title)"
-                            date_str = _fmt_date_only(ev["start_time"])
-                            time_str = _fmt_time_range(ev["start_time"], ev["end_time"])
-                            lines.append(f"{i}. {title} — {date_str}, {time_str}")
-
-                        # stash for the confirm turn
-                        session["pending_creates"] = incoming_batch
+                        for i, ((title, date_str, time_str), ev) in enumerate(zip(formatted, incoming_batch), start=1):
+                            line = f"{i}. {title} — {date_str}, {time_str}"
+                            if ev.get("recurrence"):
+                                line += f" (repeats {recurrence.describe(ev['recurrence'])})"
+                            if ev.get("location"):
+                                line += f" @ {ev['location']}"
+                            if ev.get("attendees"):
+                                line += f" with {', '.join(map(str, ev['attendees']))}"
+                            lines.append(line)
+
+                        # stash server-side for the confirm turn
+                        action_id = pending_actions.put("create_event", incoming_batch)
 
                         payload = {
                             "reply": "please review the event details below.",
                             "reply_md": "please review the event details below:\n\n" + "\n".join(lines),
                             "cta": "add this now?",
+                            "action_id": action_id,
                         }
 
                         # single item also gets structured fields
                         if len(incoming_batch) == 1:
-                            ev = incoming_batch[0]
+                            title, date_str, time_str = formatted[0]
                             payload["items"] = [
-                                {"label": "title", "value": ev.get("summary") or "(no title)"},
-                                {"label": "date",  "value": _fmt_date_only(ev["start_time"])},
-                                {"label": "time",  "value": _fmt_time_range(ev["start_time"], ev["end_time"])},
+                                {"label": "title", "value": title},
+                                {"label": "date",  "value": date_str},
+                                {"label": "time",  "value": time_str},
                             ]
+                            single = incoming_batch[0]
+                            if single.get("recurrence"):
+                                payload["items"].append({"label": "repeats", "value": recurrence.describe(single["recurrence"])})
+                            if single.get("location"):
+                                payload["items"].append({"label": "location", "value": single["location"]})
+                            if single.get("attendees"):
+                                payload["items"].append({"label": "attendees", "value": ", ".join(map(str, single["attendees"]))})
 
                         return jsonify(payload)
 
                     # confirm step
-                    batch = incoming_batch or session.pop("pending_creates", [])
+                    stashed = pending_actions.take("create_event", args.get("action_id"))
+                    batch = incoming_batch or stashed or []
                     if not batch:
                         return jsonify({"reply": "there are no pending events to add. please tell me the details again."})
 
                     try:
                         added = []
                         for ev in batch:
-                            start_dt = datetime.fromisoformat(ev["start_time"].replace("Z", "+00:00"))
-                            end_dt = datetime.fromisoformat(ev["end_time"].replace("Z", "+00:00"))
+                            start_dt = timeutils.parse_iso(ev["start_time"])
+                            end_dt = timeutils.parse_iso(ev["end_time"])
                             created = create_calendar_event(
                                 summary=ev["summary"],
                                 description=ev.get("description", ""),
                                 start_time=start_dt,
                                 end_time=end_dt,
+                                location=ev.get("location"),
+                                attendees=ev.get("attendees"),
+                                recurrence=ev.get("recurrence"),
+                                reminders=ev.get("reminders"),
                             )
                             # plain quotes, simple line
                             added.append(f'- "{created.get("summary","(no title)")}”')
 
-                        # clear stash
-                        session.pop("pending_creates", None)
-
                         success_text = "added:\n" + "\n".join(added)
                         return jsonify({"reply": success_text, "reply_md": success_text})
 
                     except Exception as e:
-                        session.pop("pending_creates", None)
                         err = f"could not create one or more events: {e}"
                         return jsonify({"reply": err, "reply_md": err}), 500
 
@@ -654,43 +1181,13 @@ def chat():
                     time_max_s = (args.get("time_max") or "").strip() or None
                     max_results = args.get("max_results") or 50
 
-                    # compute range in Australia/Sydney
-                    tz = ZoneInfo("Australia/Sydney")
-                    now_local = _current_sydney_datetime().astimezone(tz)
-
-                    if preset:
-                        # day bounds
-                        start_local = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
-                        end_local   = now_local.replace(hour=23, minute=59, second=59, microsecond=999000)
-
-                        if preset == "today":
-                            pass  # already today
-                            header = _fmt_date_only(start_local.isoformat())
-                        elif preset == "tomorrow":
-                            start_local = (now_local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-                            end_local   = (now_local + timedelta(days=1)).replace(hour=23, minute=59, second=59, microsecond=999000)
-                            header = _fmt_date_only(start_local.isoformat())
-                            header = _fmt_date_only(start_local.isoformat())
-                        elif preset == "this_week":
-                            monday = (now_local - timedelta(days=now_local.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
-                            sunday = (monday + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999000)
-                            start_local, end_local = monday, sunday
-                            header = f"{_fmt_date_only(start_local.isoformat())} → {_fmt_date_only(end_local.isoformat())}"
-                        elif preset == "next_week":
-                            monday = (now_local - timedelta(days=now_local.weekday())).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=7)
-                            sunday = (monday + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999000)
-                            start_local, end_local = monday, sunday
-                            header = f"{_fmt_date_only(start_local.isoformat())} → {_fmt_date_only(end_local.isoformat())}"
-                        else:
-                            return jsonify({"reply": "Unknown preset. use 'today', 'tomorrow', 'this_week', or 'next_week'."})
-
-                        start_dt, end_dt = start_local, end_local
-                    else:
-                        if not (time_min_s and time_max_s):
-                            return jsonify({"reply": "i need start date and end date or an instructon like 'today'."})
-                        start_dt = datetime.fromisoformat(time_min_s.replace("Z", "+00:00"))
-                        end_dt   = datetime.fromisoformat(time_max_s.replace("Z", "+00:00"))
-                        header = f"{_fmt_date_only(start_dt.isoformat())} → {_fmt_date_only(end_dt.isoformat())}"
+                    try:
+                        window = date_ranges.resolve(preset, time_min_s, time_max_s)
+                    except ValueError as e:
+                        return jsonify({"reply": str(e)})
+                    if window is None:
+                        return jsonify({"reply": "i need start date and end date or an instructon like 'today'."})
+                    start_dt, end_dt, header = window
 
                     try:
                         items = find_events(start_dt, end_dt, max_results=max_results)
@@ -700,27 +1197,18 @@ def chat():
                     if not items:
                         return jsonify({"reply": f"No events for {header}."})
 
-                    lines = []
+                    lines = timeutils.format_event_lines(items, fallback_day=start_dt.isoformat())
                     compact = []
                     for ev in items:
-                        eid = ev.get("id")
-                        title = ev.get("summary") or "(no title)"
-                        start = (ev.get("start") or {}).get("dateTime") or (ev.get("start") or {}).get("date")
-                        end   = (ev.get("end")   or {}).get("dateTime") or (ev.get("end")   or {}).get("date")
-                        loc   = ev.get("location") or ""
-                        try:
-                            if start and end and "T" in start and "T" in end:
-                                date_str = _fmt_date_only(start)
-                                time_str = _fmt_time_range(start, end)
-                                line = f'• {title} — {date_str}, {time_str}'
-                            else:
-                                date_str = _fmt_date_only(start or end or start_dt.isoformat())
-                                line = f'• {title} — {date_str} (all day)'
-                        except Exception:
-                            line = f'• {title}'
-
-                        lines.append(line)
-                        compact.append({"id": eid, "title": title, "start": start, "end": end, "location": loc})
+                        start, end = timeutils.event_bounds(ev)
+                        compact.append({
+                            "id": ev.get("id"),
+                            "title": ev.get("summary") or "(no title)",
+                            "start": start,
+                            "end": end,
+                            "location": ev.get("location") or "",
+                            "recurring_event_id": ev.get("recurringEventId"),
+                        })
 
                     reply_text = f"Events for {header}:\n" + "\n".join(lines)
                     return jsonify({"reply": reply_text, "reply_md": reply_text, "events": compact})
@@ -736,28 +1224,15 @@ def chat():
                     time_max_s = (args.get("time_max") or "").strip() or None
                     confirm = args.get("confirm", False)
 
-                    tz = ZoneInfo("Australia/Sydney")
-                    now = _current_sydney_datetime().astimezone(tz)
-
-                    # compute range
-                    if preset == "today":
-                        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                        end = now.replace(hour=23, minute=59, second=59, microsecond=999000)
-                    elif preset == "tomorrow":
-                        start = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-                        end   = (now + timedelta(days=1)).replace(hour=23, minute=59, second=59, microsecond=999000)
-                    elif preset == "this_week":
-                        start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
-                        end = (start + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999000)
-                    elif preset == "next_week":
-                        start = (now - timedelta(days=now.weekday()) + timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
-                        end = (start + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999000)
-                    elif time_min_s and time_max_s:
-                        start = datetime.fromisoformat(time_min_s.replace("Z", "+00:00"))
-                        end = datetime.fromisoformat(time_max_s.replace("Z", "+00:00"))
-                    else:
-                        start = now - timedelta(days=30)
-                        end = now + timedelta(days=30)
+                    # a confirmed preview deletes exactly the events the user saw
+                    pending = pending_actions.take("delete_event", args.get("action_id")) if confirm else None
+                    if pending:
+                        return _apply_event_deletes(pending, query)
+
+                    try:
+                        start, end, _ = date_ranges.resolve(preset, time_min_s, time_max_s, around_days=30)
+                    except ValueError as e:
+                        return jsonify({"reply": str(e)})
 
                     try:
                         items = find_events(start, end, max_results=100)
@@ -776,37 +1251,18 @@ def chat():
 
                     # handle no confirmaton
                     if not confirm:
-                        lines = []
-                        for i, ev in enumerate(matches[:10], start=1):
-                            title = ev.get("summary") or "(no title)"
-                            s = (ev.get("start") or {}).get("dateTime") or (ev.get("start") or {}).get("date")
-                            e = (ev.get("end") or {}).get("dateTime") or (ev.get("end") or {}).get("date")
-                            try:
-                                if s and e and "T" in s:
-                                    lines.append(f"{i}. {title} — {_fmt_date_only(s)}, {_fmt_time_range(s, e)}")
-                                else:
-                                    lines.append(f"{i}. {title}")
-                            except Exception:
-                                lines.append(f"{i}. {title}")
+                        lines = timeutils.format_event_lines(matches[:10], numbered=True)
+                        action_id = pending_actions.put("delete_event", _event_snapshot(matches))
 
                         return jsonify({
                             "reply": f"Found {len(matches)} event(s) matching '{query}'.",
                             "reply_md": "Found these events:\n\n" + "\n".join(lines) + "\n\nDelete them?",
-                            "cta": "delete now?"
+                            "cta": "delete now?",
+                            "action_id": action_id,
                         })
 
-                    # handle confirm delete
-                    deleted = 0
-                    for ev in matches:
-                        try:
-                            delete_calendar_event(ev["id"])
-                            deleted += 1
-                        except Exception:
-                            pass
-
-                    if deleted == 0:
-                        return jsonify({"reply": f"Could not delete events matching '{query}'."})
-                    return jsonify({"reply": f"Deleted {deleted} event(s) matching '{query}'."})
+                    # handle confirm delete without a preview
+                    return _apply_event_deletes(_event_snapshot(matches), query)
                 
                 # handles when prompted to update one or more events
                 elif func_name == "update_event":
@@ -819,28 +1275,15 @@ def chat():
                     time_max_s = (args.get("time_max") or "").strip() or None
                     confirm = args.get("confirm", False)
 
-                    tz = ZoneInfo("Australia/Sydney")
-                    now = _current_sydney_datetime().astimezone(tz)
-
-                    # range for presets
-                    if preset == "today":
-                        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                        end = now.replace(hour=23, minute=59, second=59, microsecond=999000)
-                    elif preset == "tomorrow":
-                        start = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-                        end = (now + timedelta(days=1)).replace(hour=23, minute=59, second=59, microsecond=999000)
-                    elif preset == "this_week":
-                        start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
-                        end = (start + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999000)
-                    elif preset == "next_week":
-                        start = (now - timedelta(days=now.weekday()) + timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
-                        end = (start + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999000)
-                    elif time_min_s and time_max_s:
-                        start = datetime.fromisoformat(time_min_s.replace("Z", "+00:00"))
-                        end = datetime.fromisoformat(time_max_s.replace("Z", "+00:00"))
-                    else:
-                        start = now - timedelta(days=30)
-                        end = now + timedelta(days=30)
+                    # a confirmed preview already knows its events and changes; no second lookup
+                    pending = pending_actions.take("update_event", args.get("action_id")) if confirm else None
+                    if pending:
+                        return _apply_event_updates(pending["items"], pending["updates"], query)
+
+                    try:
+                        start, end, _ = date_ranges.resolve(preset, time_min_s, time_max_s, around_days=30)
+                    except ValueError as e:
+                        return jsonify({"reply": str(e)})
 
                     try:
                         events = find_events(start, end, max_results=100)
@@ -865,52 +1308,201 @@ def chat():
 
                     # preview step
                     if not confirm:
-                        lines, ids = [], []
-                        for ev in matches[:10]:
-                            ids.append(ev.get("id"))
-                            title = ev.get("summary") or "(no title)"
-                            s = (ev.get("start") or {}).get("dateTime") or (ev.get("start") or {}).get("date")
-                            e = (ev.get("end") or {}).get("dateTime") or (ev.get("end") or {}).get("date")
-                            time_str = _fmt_time_range(s, e) if s and e and "T" in s else ""
-                            lines.append(f"• {title} — {time_str}".strip())
+                        lines = timeutils.format_event_lines(matches[:10], include_date=False)
 
                         update_desc = ", ".join(f"{k} → {_fmt(v) if 'T' in str(v) else v}" for k, v in updates.items())
+                        action_id = pending_actions.put("update_event", {
+                            "items": _event_snapshot(matches),
+                            "updates": updates,
+                        })
 
                         return jsonify({
                             "reply": f"Found {len(matches)} event(s) matching '{query}'.",
                             "reply_md": "Found:\n" + "\n".join(lines) +
                                         f"\n\nProposed updates: {update_desc}\nApply now? (yes/no)",
-                            "event_ids": ids
+                            "action_id": action_id,
                         })
 
-                    # confirm step
-                    ids = args.get("event_ids") or []
-                    updated = 0
-
-                    for ev in matches:
-                        eid = ev.get("id")
-                        if ids and eid not in ids:
-                            continue
-
-                        # ensure proper datetime conversion
-                        updates_clean = {}
-                        for k, v in updates.items():
-                            if k in ("start_time", "end_time"):
-                                updates_clean[k] = _to_sydney_datetime(v)
-                            else:
-                                updates_clean[k] = v
+                    # confirm step without a preview
+                    return _apply_event_updates(_event_snapshot(matches), updates, query)
 
+                
+                # handles free time / conflict questions
+                elif func_name == "find_free_time":
+                    try:
+                        duration = args.get("duration_minutes")
+                        result = _calendar_availability(
+                            preset=(args.get("preset") or "").strip() or None,
+                            time_min=(args.get("time_min") or "").strip() or None,
+                            time_max=(args.get("time_max") or "").strip() or None,
+                            duration_minutes=int(duration) if duration else None,
+                            calendars=args.get("calendars") or None,
+                            day_start=int(args.get("day_start_hour", scheduling.DAY_START_HOUR)),
+                            day_end=int(args.get("day_end_hour", scheduling.DAY_END_HOUR)),
+                        )
+                    except ValueError as e:
+                        return jsonify({"reply": str(e)})
+                    except Exception as e:
+                        return jsonify({"reply": f"could not check your availability: {e}"}), 500
+
+                    parts = []
+                    if result["conflicts"]:
+                        parts.append("Overlapping events:\n" + "\n".join(
+                            f"• {c['first']['title']} and {c['second']['title']} — {_fmt(c['second']['start'])}"
+                            for c in result["conflicts"][:10]
+                        ))
+                    if "slots" in result:
+                        if result["slots"]:
+                            parts.append("Suggested slots:\n" + "\n".join(
+                                f"• {_fmt(s['start'])} – {_fmt_time_range(s['start'], s['end']).split(' – ')[1]}"
+                                for s in result["slots"]
+                            ))
+                        else:
+                            parts.append("I couldn't find a free slot that long in that range.")
+                    else:
+                        parts.append("Free time:\n" + "\n".join(
+                            f"• {_fmt(w['start'])} – {_fmt_time_range(w['start'], w['end']).split(' – ')[1]}"
+                            for w in result["free"][:10]
+                        ) if result["free"] else "You're fully booked in that range.")
+                    reply_text = f"Availability for {result['range']['label']}:\n\n" + "\n\n".join(parts)
+                    return jsonify({"reply": reply_text, "reply_md": reply_text, "availability": result})
+
+                # handles rearranging the calendar to clear overlaps
+                elif func_name == "optimize_schedule":
+                    if args.get("confirm"):
+                        pending = pending_actions.take("optimize_schedule", args.get("action_id"))
+                        if not pending:
+                            return jsonify({"reply": "There's no proposed schedule to apply. Ask me to optimise your schedule first."})
+                        changes = [
+                            {"id": c["id"], "start": timeutils.parse_iso(c["start"]), "end": timeutils.parse_iso(c["end"])}
+                            for c in pending
+                        ]
                         try:
-                            update_calendar_event(eid, **updates_clean)
-                            updated += 1
+                            errors = reschedule_events(changes)
                         except Exception as e:
-                            print(f"Failed to update event {eid}: {e}")
+                            return jsonify({"reply": f"could not update your calendar: {e}"}), 500
+                        moved = len(changes) - len(errors)
+                        reply_text = f"Moved {moved} event(s)."
+                        if errors:
+                            reply_text += f" {len(errors)} could not be moved."
+                        return jsonify({"reply": reply_text, "reply_md": reply_text})
 
-                    if updated == 0:
-                        return jsonify({"reply": f"Could not update events matching '{query}'."})
-                    return jsonify({"reply": f"Updated {updated} event(s)."})
+                    try:
+                        window = (
+                            date_ranges.resolve(
+                                (args.get("preset") or "").strip() or None,
+                                (args.get("time_min") or "").strip() or None,
+                                (args.get("time_max") or "").strip() or None,
+                            )
+                            or date_ranges.preset_range("this_week")
+                        )
+                        # never move anything into the past
+                        start = max(window.start, timeutils.now())
+                        events = find_events(window.start, window.end, max_results=250)
+                        goal_titles = [
+                            g["title"] for g in storage_query_goals(status="active", fields=("title",))["goals"]
+                        ]
+                        result = schedule_optimizer.optimise(
+                            events,
+                            start,
+                            window.end,
+                            goal_titles=goal_titles,
+                            keep=args.get("keep") or (),
+                            only=args.get("only") or (),
+                            day_start=int(args.get("day_start_hour", scheduling.DAY_START_HOUR)),
+                            day_end=int(args.get("day_end_hour", scheduling.DAY_END_HOUR)),
+                            buffer_minutes=int(args.get("buffer_minutes", scheduling.SLOT_BUFFER_MINUTES)),
+                        )
+                    except ValueError as e:
+                        return jsonify({"reply": str(e)})
+                    except Exception as e:
+                        return jsonify({"reply": f"could not optimise your schedule: {e}"}), 500
+
+                    if not result["changes"]:
+                        if result["unresolved"]:
+                            reply_text = "Some events overlap but there's no free time to move them to within your working hours."
+                        else:
+                            reply_text = f"Nothing to change for {window.header} — no overlapping events I can move."
+                        return jsonify({"reply": reply_text, "reply_md": reply_text})
+
+                    action_id = pending_actions.put("optimize_schedule", [
+                        {"id": c["id"], "start": c["to"]["start"], "end": c["to"]["end"]} for c in result["changes"]
+                    ])
+                    lines = [f"• {c['title']}: {_fmt(c['from']['start'])} → {_fmt(c['to']['start'])}" for c in result["changes"]]
+                    reply_md = f"Proposed changes for {window.header}:\n\n" + "\n".join(lines)
+                    if result["unresolved"]:
+                        reply_md += "\n\nStill overlapping (no room to move): " + ", ".join(u["title"] for u in result["unresolved"])
+                    reply_md += "\n\nApply these changes?"
+                    return jsonify({
+                        "reply": f"I can clear {result['conflicts_before'] - result['conflicts_after']} overlap(s) by moving {len(result['changes'])} event(s).",
+                        "reply_md": reply_md,
+                        "cta": "apply changes?",
+                        "changes": result["changes"],
+                        "action_id": action_id,
+                    })
+
+                # handles turning a goal into scheduled calendar sessions
+                elif func_name == "plan_goal_sessions":
+                    pending = None
+                    if args.get("confirm"):
+                        pending = pending_actions.take("plan_goal_sessions", args.get("action_id"))
+                        goal = storage_get_goal(pending["goal_id"]) if pending else None
+                        if not goal:
+                            return jsonify({"reply": "There's no session plan waiting. Ask me to plan a goal first."})
+                        options = pending["options"]
+                    else:
+                        goal, error = _find_goal(args.get("goal_id"), args.get("goal_title"))
+                        if error:
+                            return jsonify({"reply": error})
+                        options = {
+                            k: args[k]
+                            for k in ("session_minutes", "sessions_per_week", "preferred_hour", "day_start_hour", "day_end_hour")
+                            if args.get(k) is not None
+                        }
+
+                    calendar_generation = response_cache.cache.calendar_generation()
+                    now = timeutils.now()
+                    note = ""
+                    if pending:
+                        if pending["calendar_generation"] == calendar_generation:
+                            # nothing was written to the calendar since the preview: reuse its plan
+                            plan = pending["plan"]
+                        else:
+                            # re-plan from the preview's start time: slots are rounded from it, so
+                            # planning from now would move them whenever a quarter hour passed
+                            plan, reply = _goal_plan_or_reply(goal, options, pending["anchor"])
+                            if reply:
+                                return reply
+                        if goal_planner.fingerprint(plan["sessions"]) != pending["fingerprint"]:
+                            note = "Your calendar changed since the last preview, so here's an updated plan.\n\n"
+                        elif plan["sessions"][0].start < now:
+                            note = "Some of the previewed times have already passed, so here's an updated plan.\n\n"
+
+                    if not pending or note:
+                        # first preview, or the previewed plan no longer holds: show a plan from now
+                        plan, reply = _goal_plan_or_reply(goal, options, now)
+                        if reply:
+                            return reply
+                        action_id = pending_actions.put("plan_goal_sessions", {
+                            "goal_id": goal["id"],
+                            "options": options,
+                            "fingerprint": goal_planner.fingerprint(plan["sessions"]),
+                            "plan": plan,
+                            "anchor": now,
+                            "calendar_generation": calendar_generation,
+                        })
+                        return _goal_plan_preview(plan, note, action_id)
+
+                    specs = goal_planner.session_events(plan, lambda v: _format_decimal(round(v, 2)))
+                    try:
+                        created, errors = create_calendar_events(specs)
+                    except Exception as e:
+                        return jsonify({"reply": f"could not add the sessions: {e}"}), 500
+                    reply_text = f"Added {len(created)} session(s) for '{plan['title']}' to your calendar."
+                    if errors:
+                        reply_text += f" {len(errors)} could not be added."
+                    return jsonify({"reply": reply_text, "reply_md": reply_text})
 
-                
                 # goal handling
                 elif func_name == "create_goal":
                     title = (args.get("title") or "").strip()
@@ -964,59 +1556,20 @@ def chat():
                             target_period=target_period or None,
                             progress_value=starting_progress_num,
                         )
-                        goals = storage_list_goals()
                         return jsonify({
                             "reply": f"All set! I saved '{goal['title']}' with progress at {goal['progress']}%.",
-                            "goals": goals,
+                            "goal": goal,
+                            "delta_token": storage_revision(),
                         })
                     except ValueError as e:
                         return jsonify({"reply": f"I couldn't save that goal: {e}"})
 
                 elif func_name == "update_goal":
-                    goal_id = (args.get("goal_id") or "").strip()
-                    goal_title = (args.get("goal_title") or args.get("title") or "").strip()
-                    goal = None
-                    resolved_id = None
-
-                    if goal_id:
-                        goal = storage_get_goal(goal_id)
-                        if goal:
-                            resolved_id = goal_id
-                        elif not goal_title:
-                            goal_title = goal_id
-
-                    if not goal and goal_title:
-                        title_norm = goal_title.lower()
-                        candidates = [
-                            g for g in storage_list_goals()
-                            if title_norm in (g.get("title") or "").lower()
-                        ]
-                        if len(candidates) == 1:
-                            goal = candidates[0]
-                            resolved_id = goal.get("id")
-                        elif len(candidates) > 1:
-                            suggestions = [
-                                f"• {c.get('title', 'Untitled')} (ID: {c.get('id', '')[:6]})"
-                                for c in candidates[:5]
-                            ]
-                            return jsonify({
-                                "reply": "I found multiple goals matching that description:\n"
-                                + "\n".join(suggestions)
-                                + "\nCould you let me know which one you meant (by title or ID)?"
-                            })
-
-                    if not goal:
-                        if goal_title:
-                            return jsonify({
-                                "reply": f"I couldn't find a goal that matches '{goal_title}'. Could you clarify the title?"
-                            })
-                        return jsonify({
-                            "reply": "I couldn't find a goal with that ID. Could you double-check it?"
-                        })
-
-                    if not goal_id and resolved_id:
-                        args["goal_id"] = resolved_id
-                        goal_id = resolved_id
+                    goal, error = _find_goal(args.get("goal_id"), args.get("goal_title") or args.get("title"))
+                    if error:
+                        return jsonify({"reply": error})
+                    goal_id = goal.get("id")
+                    args["goal_id"] = goal_id
 
                     proposed_changes = []
                     kwargs = {}
@@ -1101,17 +1654,20 @@ def chat():
 
                     try:
                         updated = storage_update_goal(goal_id, **kwargs)
-                        goals = storage_list_goals()
                         return jsonify({
                             "reply": f"Done! '{updated['title']}' is now at {updated['progress']}% ({updated['status']}).",
-                            "goals": goals,
+                            "goal": updated,
+                            "delta_token": storage_revision(),
                         })
                     except ValueError as e:
                         return jsonify({"reply": f"I couldn't update that goal: {e}"})
 
                 elif func_name == "list_goals":
                     status_filter = (args.get("status") or "").strip() or None
-                    goals = storage_list_goals(status=status_filter)
+                    goals = storage_query_goals(
+                        status=status_filter,
+                        fields=("title", "progress", "status", "target_date", "target_value", "progress_value", "target_unit"),
+                    )["goals"]
                     if not goals:
                         if status_filter:
                             return jsonify({
@@ -1123,15 +1679,35 @@ def chat():
 
                     lines = [f"• {_compose_goal_progress(goal)}" for goal in goals]
                     reply = "Here’s what I found:\n" + "\n".join(lines)
-                    return jsonify({"reply": reply, "goals": goals})
+                    return jsonify({"reply": reply, "delta_token": storage_revision()})
+
+                elif func_name == "goal_insights":
+                    import goal_analytics
+                    result = goal_analytics.insights(status=(args.get("state") or "").strip() or None)
+                    items = result["goals"]
+                    if not items:
+                        if args.get("state"):
+                            return jsonify({"reply": "None of your goals match that right now."})
+                        return jsonify({"reply": "You don’t have any goals saved yet. Ready to set one up?"})
+                    # riskiest first so the reply leads with what needs attention
+                    rank = {"overdue": 0, "at_risk": 1, "on_track": 2, "ahead": 3, "no_deadline": 4, "inactive": 5, "complete": 6}
+                    items = sorted(items, key=lambda item: (rank.get(item["state"], 9), item.get("days_left") or 0))
+                    lines = [f"• {_compose_goal_insight(item)}" for item in items]
+                    flagged = result["summary"].get("at_risk_total", 0)
+                    intro = (
+                        f"{flagged} goal{'s' if flagged != 1 else ''} need{'s' if flagged == 1 else ''} attention:"
+                        if flagged else "Here’s how you’re tracking:"
+                    )
+                    return jsonify({"reply": intro + "\n" + "\n".join(lines), "delta_token": result["revision"]})
 
         reply = (msg.content or "").strip()
         if not reply or reply in ("...", "…", "Ok", "Okay"):
-            regen = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages + [{"role": "user", "content": "Please elaborate."}],
-                max_completion_tokens=250,
-            )
+            with admission.upstream_slot():
+                regen = openai_client().chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages + [{"role": "user", "content": "Please elaborate."}],
+                    max_completion_tokens=250,
+                )
             reply = (regen.choices[0].message.content or "").strip()
 
         result = {"reply": reply}
@@ -1139,13 +1715,88 @@ def chat():
             result.update(extras)
         return jsonify(result)
 
+    except admission.Rejected as e:
+        return _rejection_response(e)
     except Exception as e:
         print("Error:", e)
         return jsonify({"error": str(e)}), 500
 
-@app.get("/api/health")
+@api.get("/api/events/stream")
+def events_stream():
+    raw_last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(raw_last_id) if raw_last_id else None
+    except ValueError:
+        last_event_id = None
+    try:
+        sub = event_bus.bus.subscribe(last_event_id)
+    except event_bus.TooManySubscribers as e:
+        resp = jsonify({"error": str(e)})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "30"
+        return resp
+
+    def generate():
+        try:
+            yield from event_bus.stream(sub)
+        finally:
+            event_bus.bus.unsubscribe(sub)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api.get("/api/reminders")
+def api_reminders():
+    try:
+        limit = max(1, min(int(request.args.get("limit", 20)), 200))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer."}), 400
+    return jsonify({"upcoming": reminders.upcoming(limit), "outbox": reminders.outbox()})
+
+
+@api.delete("/api/reminders/outbox")
+def api_clear_reminder_outbox():
+    reminders.clear_outbox()
+    return jsonify({"ok": True})
+
+
+@api.get("/api/metrics")
+def metrics():
+    return jsonify({
+        "response_cache": response_cache.stats(),
+        "admission": admission.stats(),
+        "idempotency": idempotency.stats(),
+        "pending_actions": pending_actions.stats(),
+        "jobs": jobs.stats(),
+        "reminders": reminders.stats(),
+        "compression": compression.stats(),
+    })
+
+@api.get("/api/health")
 def health():
     return jsonify({"ok": True})
 
+def create_app() -> Flask:
+    """
+    Builds the app. `flask run` finds this factory by name. Background workers start on the
+    first request (_start_workers); OpenAI, Google and HTTP clients are imported and created
+    on first use, so a cold start only pays for Flask and the local modules.
+    """
+    app = Flask(__name__)
+    app.json = json_provider.FastJSONProvider(app)
+    CORS(app, supports_credentials=True)
+    app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-change-me")
+    if TRUSTED_PROXIES:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+    # before the blueprint, so it compresses the body the blueprint's hooks leave behind
+    compression.init_app(app)
+    app.register_blueprint(api)
+    response_cache.configure_embeddings(_embed)
+    return app
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
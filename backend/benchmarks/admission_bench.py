@@ -0,0 +1,82 @@
+"""
+Load benchmark for admission.py.
+
+Fires a burst of concurrent chat-shaped requests (each holding an upstream slot for a simulated
+OpenAI call) with and without admission control, and reports latency percentiles for the
+requests that were served plus how many were shed.
+
+Usage (from the backend directory):
+
+    python benchmarks/admission_bench.py
+    python benchmarks/admission_bench.py --clients 200 --upstream-ms 300 --upstream-limit 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import admission  # noqa: E402
+
+
+def run(clients: int, upstream_ms: float, gated: bool, limit: int, queue: int, deadline: float) -> Tuple[List[float], int]:
+    counters = admission._Counters()
+    chat_gate = admission.Gate(limit * 2, queue, deadline, counters, "chat")
+    upstream = admission.Gate(limit, limit * 2, 60.0, counters, "openai")
+    unbounded = threading.Semaphore(limit)  # the upstream itself only serves `limit` calls at once
+    served: List[float] = []
+    shed = [0]
+    lock = threading.Lock()
+    start_line = threading.Barrier(clients)
+
+    def request() -> None:
+        start_line.wait()
+        started = time.perf_counter()
+        try:
+            if gated:
+                with chat_gate.slot(), upstream.slot():
+                    time.sleep(upstream_ms / 1000.0)
+            else:
+                with unbounded:
+                    time.sleep(upstream_ms / 1000.0)
+        except admission.Rejected:
+            with lock:
+                shed[0] += 1
+            return
+        with lock:
+            served.append((time.perf_counter() - started) * 1000.0)
+
+    threads = [threading.Thread(target=request) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return served, shed[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Admission control load benchmark.")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--upstream-ms", type=float, default=200.0)
+    parser.add_argument("--upstream-limit", type=int, default=admission.OPENAI_MAX_CONCURRENT)
+    parser.add_argument("--queue", type=int, default=admission.CHAT_MAX_QUEUE)
+    parser.add_argument("--deadline", type=float, default=admission.CHAT_QUEUE_DEADLINE_SECONDS)
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} {'served':>7} {'shed':>5} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for gated in (False, True):
+        served, shed = run(args.clients, args.upstream_ms, gated, args.upstream_limit, args.queue, args.deadline)
+        served.sort()
+        p99 = served[min(len(served) - 1, int(len(served) * 0.99))] if served else 0.0
+        print(
+            f"{'admission' if gated else 'none':>10} {len(served):>7} {shed:>5} "
+            f"{statistics.median(served) if served else 0.0:>8.0f} {p99:>8.0f} {max(served, default=0.0):>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Micro-benchmark for the JSON goal store in goals.py.
+
+Generates synthetic goals.json datasets of increasing size and history depth,
+then measures latency, peak RSS and bytes written for each store operation.
+Every dataset runs in a fresh interpreter so peak RSS numbers are not polluted
+by earlier (smaller or larger) runs.
+
+Usage (from the backend directory):
+
+    python benchmarks/goal_store_bench.py
+    python benchmarks/goal_store_bench.py --sizes 100 1000 10000 100000 1000000 --history 0 50
+    python benchmarks/goal_store_bench.py --json goal_store_report.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OPERATIONS = ("create_goal", "get_goal", "update_goal", "list_goals", "delete_goal")
+STATUSES = ("active", "active", "active", "completed", "archived")
+UNITS = ("km", "pages", "$", "minutes", None)
+
+
+def _synthetic_goal(idx: int, history_depth: int, rng: random.Random) -> Dict:
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=idx)
+    target_value = float(rng.randint(10, 500))
+    progress_value = float(rng.randint(0, int(target_value)))
+    history = [
+        {
+            "timestamp": (created + timedelta(hours=h)).isoformat(),
+            "note": f"Logged session {h} for goal {idx}",
+        }
+        for h in range(history_depth)
+    ]
+    return {
+        "id": uuid4().hex,
+        "title": f"Synthetic goal {idx}",
+        "description": "Generated by goal_store_bench for scaling measurements.",
+        "target_date": (created + timedelta(days=rng.randint(7, 365))).date().isoformat(),
+        "progress": int(round(min(progress_value / target_value, 1.0) * 100)),
+        "status": rng.choice(STATUSES),
+        "created_at": created.isoformat(),
+        "updated_at": created.isoformat(),
+        "history": history,
+        "target_value": target_value,
+        "target_unit": rng.choice(UNITS),
+        "target_period": None,
+        "progress_value": progress_value,
+    }
+
+
+def generate_dataset(path: str, size: int, history_depth: int, seed: int = 5620) -> List[str]:
+    rng = random.Random(seed)
+    goals = [_synthetic_goal(i, history_depth, rng) for i in range(size)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(goals, f, indent=2)
+    return [g["id"] for g in goals]
+
+
+def _bytes_written() -> Optional[int]:
+    # Linux only: cumulative bytes passed to write(2) by this process.
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run_dataset(size: int, history_depth: int, iterations: int) -> Dict:
+    """Runs inside a child interpreter with GOALS_FILE pointing at a scratch dataset."""
+    goal_ids = generate_dataset(os.environ["GOALS_FILE"], size, history_depth)
+
+    sys.path.insert(0, BACKEND_DIR)
+    import goals as store
+
+    rng = random.Random(size)
+    samples: Dict[str, Dict[str, List[float]]] = {
+        op: {"latency_ms": [], "bytes_written": []} for op in OPERATIONS
+    }
+    baseline_rss = _peak_rss_kb()
+    peak_rss: Dict[str, int] = {}
+
+    def measure(op: str, fn) -> object:
+        before_bytes = _bytes_written()
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000.0
+        after_bytes = _bytes_written()
+        samples[op]["latency_ms"].append(elapsed)
+        if before_bytes is not None and after_bytes is not None:
+            samples[op]["bytes_written"].append(float(after_bytes - before_bytes))
+        peak_rss[op] = max(peak_rss.get(op, 0), _peak_rss_kb())
+        return result
+
+    for i in range(iterations):
+        created = measure(
+            "create_goal",
+            lambda: store.create_goal(
+                title=f"Bench goal {i}",
+                description="created by benchmark",
+                target_date="2026-12-31",
+                target_value=100,
+                target_unit="km",
+                progress_value=0,
+            ),
+        )
+        measure("get_goal", lambda: store.get_goal(rng.choice(goal_ids)))
+        measure(
+            "update_goal",
+            lambda: store.update_goal(
+                rng.choice(goal_ids), progress_value=rng.randint(0, 50), note=f"bench note {i}"
+            ),
+        )
+        measure("list_goals", lambda: store.list_goals(status="active"))
+        measure("delete_goal", lambda: store.delete_goal(created["id"]))
+
+    ops = {}
+    for op, data in samples.items():
+        latencies = sorted(data["latency_ms"])
+        written = data["bytes_written"]
+        ops[op] = {
+            "mean_ms": statistics.fmean(latencies),
+            "p50_ms": latencies[len(latencies) // 2],
+            "max_ms": latencies[-1],
+            "bytes_written": statistics.fmean(written) if written else None,
+            "peak_rss_kb": peak_rss.get(op, baseline_rss),
+        }
+
+    return {
+        "size": size,
+        "history_depth": history_depth,
+        "iterations": iterations,
+        "file_bytes": os.path.getsize(os.environ["GOALS_FILE"]),
+        "baseline_rss_kb": baseline_rss,
+        "operations": ops,
+    }
+
+
+def _iterations_for(size: int, requested: int) -> int:
+    # Each write rewrites the whole file, so keep the largest datasets bounded.
+    if size >= 1_000_000:
+        return min(requested, 2)
+    if size >= 100_000:
+        return min(requested, 3)
+    return requested
+
+
+def run_in_child(size: int, history_depth: int, iterations: int) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="goal-bench-") as scratch:
+        env = dict(os.environ)
+        env["GOALS_FILE"] = os.path.join(scratch, "goals.json")
+        proc = subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--child",
+                str(size),
+                str(history_depth),
+                str(iterations),
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _scaling_exponent(small: Dict, large: Dict, op: str) -> Optional[float]:
+    # Slope on a log-log plot: ~0 is constant time, ~1 is linear in the goal count.
+    t_small = small["operations"][op]["mean_ms"]
+    t_large = large["operations"][op]["mean_ms"]
+    if t_small <= 0 or t_large <= 0 or large["size"] == small["size"]:
+        return None
+    return math.log(t_large / t_small) / math.log(large["size"] / small["size"])
+
+
+def _fmt_bytes(value: Optional[float]) -> str:
+    if value is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(value) < 1024 or unit == "GB":
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024.0
+    return f"{value:.1f}GB"
+
+
+def print_report(results: List[Dict]) -> None:
+    header = f"{'goals':>9} {'hist':>5} {'operation':<12} {'mean ms':>10} {'p50 ms':>10} {'max ms':>10} {'written':>10} {'peak RSS':>10}"
+    print(header)
+    print("-" * len(header))
+    for res in results:
+        for op in OPERATIONS:
+            stats = res["operations"][op]
+            print(
+                f"{res['size']:>9} {res['history_depth']:>5} {op:<12} "
+                f"{stats['mean_ms']:>10.3f} {stats['p50_ms']:>10.3f} {stats['max_ms']:>10.3f} "
+                f"{_fmt_bytes(stats['bytes_written']):>10} {_fmt_bytes(stats['peak_rss_kb'] * 1024):>10}"
+            )
+        print()
+
+    print("Scaling exponents (log-log slope of mean latency vs goal count):")
+    by_depth: Dict[int, List[Dict]] = {}
+    for res in results:
+        by_depth.setdefault(res["history_depth"], []).append(res)
+    for depth, runs in sorted(by_depth.items()):
+        runs.sort(key=lambda r: r["size"])
+        for op in OPERATIONS:
+            slopes = [
+                _scaling_exponent(a, b, op) for a, b in zip(runs, runs[1:])
+            ]
+            text = ", ".join("n/a" if s is None else f"{s:.2f}" for s in slopes) or "n/a"
+            print(f"  history={depth:<4} {op:<12} {text}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Scaling benchmark for the goals.py JSON store.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 20])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="Also write the raw report to this file.")
+    parser.add_argument("--child", nargs=3, type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        size, depth, iterations = args.child
+        print(json.dumps(_run_dataset(size, depth, iterations)))
+        return
+
+    results = []
+    for depth in args.history:
+        for size in args.sizes:
+            iterations = _iterations_for(size, args.iterations)
+            print(f"running size={size} history={depth} iterations={iterations} ...", file=sys.stderr)
+            results.append(run_in_child(size, depth, iterations))
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
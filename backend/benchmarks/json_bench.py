@@ -0,0 +1,107 @@
+"""
+Serialisation and compression benchmark for large goal lists.
+
+Builds synthetic goals with progress histories and, for each list size, reports:
+  - CPU time to build a JSON response with Flask's stdlib provider vs json_provider.FastJSONProvider
+  - bytes on the wire as identity, gzip and (if installed) brotli
+  - goals.json size and encode/parse time, indented (old format) vs compact
+
+Usage (from the backend directory):
+
+    python benchmarks/json_bench.py
+    python benchmarks/json_bench.py --goals 100 1000 5000 --history 30
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import compression  # noqa: E402
+import fastjson  # noqa: E402
+import json_provider  # noqa: E402
+
+
+def make_goals(n: int, history: int, rng: random.Random) -> List[Dict]:
+    goals = []
+    for i in range(n):
+        target = rng.choice([10, 50, 100, 5000])
+        goals.append({
+            "id": f"{rng.getrandbits(128):032x}",
+            "title": f"Goal {i} – {rng.choice(['Run', 'Read', 'Save', 'Practise piano', 'Meditate'])}",
+            "description": "Keep going a little every day. " * rng.randint(0, 4),
+            "target_date": f"2027-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "progress": rng.randint(0, 100),
+            "status": rng.choice(["active", "active", "completed"]),
+            "target_value": target,
+            "target_unit": rng.choice(["km", "pages", "$", "sessions"]),
+            "progress_value": round(rng.uniform(0, target), 2),
+            "created_at": "2026-01-05T09:30:00+00:00",
+            "updated_at": "2026-10-01T18:12:44.123456+00:00",
+            "history": [
+                {"at": f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}T08:00:00+00:00",
+                 "progress_value": round(rng.uniform(0, target), 2), "note": rng.choice([None, "felt good", "short one"])}
+                for _ in range(history)
+            ],
+        })
+    return goals
+
+
+def best_ms(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        fn()
+        best = min(best, time.process_time() - started)
+    return best * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JSON serialisation and compression benchmark.")
+    parser.add_argument("--goals", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--history", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    stdlib_app, fast_app = Flask("stdlib"), Flask("fast")
+    stdlib_app.json = DefaultJSONProvider(stdlib_app)
+    fast_app.json = json_provider.FastJSONProvider(fast_app)
+    print(f"orjson: {'yes' if fastjson.orjson else 'no (stdlib fallback)'}; brotli: {'yes' if compression.brotli else 'no'}\n")
+
+    print(f"{'goals':>6} | {'stdlib ms':>9} {'fast ms':>8} {'speedup':>7} | {'identity':>10} {'gzip':>9} {'br':>9} | "
+          f"{'disk indent':>11} {'disk compact':>12} {'write ms':>13} {'read ms':>13}")
+    rng = random.Random(args.seed)
+    for n in args.goals:
+        payload = {"goals": make_goals(n, args.history, rng), "revision": 1}
+        with stdlib_app.app_context():
+            stdlib_ms = best_ms(lambda: stdlib_app.json.response(payload).get_data(), args.repeat)
+        with fast_app.app_context():
+            fast_ms = best_ms(lambda: fast_app.json.response(payload).get_data(), args.repeat)
+            body = fast_app.json.response(payload).get_data()
+        gz = len(compression.compress(body, "gzip"))
+        br = f"{len(compression.compress(body, 'br')):>9}" if compression.brotli else f"{'-':>9}"
+
+        goals = payload["goals"]
+        indented = json.dumps(goals, indent=2).encode("utf-8")
+        compact = fastjson.dumps_bytes(goals)
+        write_old = best_ms(lambda: json.dumps(goals, indent=2).encode("utf-8"), args.repeat)
+        write_new = best_ms(lambda: fastjson.dumps_bytes(goals), args.repeat)
+        read_old = best_ms(lambda: json.loads(indented), args.repeat)
+        read_new = best_ms(lambda: fastjson.loads(compact), args.repeat)
+        print(
+            f"{n:>6} | {stdlib_ms:>9.1f} {fast_ms:>8.1f} {stdlib_ms / max(fast_ms, 1e-6):>6.1f}x | "
+            f"{len(body):>10} {gz:>9} {br} | {len(indented):>11} {len(compact):>12} "
+            f"{write_old:>6.1f}->{write_new:<6.1f} {read_old:>6.1f}->{read_new:<6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
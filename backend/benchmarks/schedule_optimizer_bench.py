@@ -0,0 +1,76 @@
+"""
+Benchmark for schedule_optimizer.py on synthetic calendars.
+
+Generates a week of random events (every seventh one with another attendee, so fixed) and
+reports solve time, moves and overlaps before/after for each size.
+
+Usage (from the backend directory):
+
+    python benchmarks/schedule_optimizer_bench.py
+    python benchmarks/schedule_optimizer_bench.py --events 50 200 400 --budget-ms 250
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schedule_optimizer  # noqa: E402
+import timeutils  # noqa: E402
+
+
+def synthetic_week(count: int, seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    monday = datetime(2025, 11, 3, tzinfo=timeutils.get_zone("Australia/Sydney"))
+    events = []
+    for i in range(count):
+        start = monday + timedelta(days=rng.randint(0, 6), hours=7, minutes=15 * rng.randint(0, 56))
+        end = start + timedelta(minutes=15 * rng.randint(1, 4))
+        event = {
+            "id": f"ev{i}",
+            "summary": f"{'Run' if i % 10 == 0 else 'Task'} {i}",
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": end.isoformat()},
+        }
+        if i % 7 == 0:
+            event["attendees"] = [{"email": "someone@example.com"}, {"email": "me@example.com", "self": True}]
+        events.append(event)
+    return events
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Schedule optimiser benchmark.")
+    parser.add_argument("--events", type=int, nargs="+", default=[50, 100, 200, 400])
+    parser.add_argument("--budget-ms", type=int, default=schedule_optimizer.TIME_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    tz = timeutils.get_zone("Australia/Sydney")
+    week_start = datetime(2025, 11, 3, tzinfo=tz)
+    week_end = week_start + timedelta(days=7)
+
+    print(f"{'events':>7} {'median ms':>10} {'moved':>6} {'unresolved':>11} {'overlaps':>14} {'iterations':>11}")
+    for count in args.events:
+        timings = []
+        result = {}
+        for run in range(args.runs):
+            events = synthetic_week(count, seed=run)
+            started = time.perf_counter()
+            result = schedule_optimizer.optimise(
+                events, week_start, week_end, goal_titles=["run"], budget_ms=args.budget_ms
+            )
+            timings.append((time.perf_counter() - started) * 1000.0)
+        overlaps = f"{result['conflicts_before']} -> {result['conflicts_after']}"
+        print(
+            f"{count:>7} {statistics.median(timings):>10.1f} {len(result['changes']):>6} "
+            f"{len(result['unresolved']):>11} {overlaps:>14} {result['iterations']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Cold-start benchmark for the backend process.
+
+Starts fresh interpreters that build the app with create_app() and serve one /api/health
+request, and reports the time to that first response. The "eager" row also imports the
+OpenAI, Google and numpy libraries up front, as app.py used to at module load. The slowest
+top-level imports come from `python -X importtime`.
+
+Usage (from the backend directory):
+
+    python benchmarks/startup_bench.py
+    python benchmarks/startup_bench.py --runs 10 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import List, Tuple
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_EAGER = "import openai, httpx, numpy, google_auth_oauthlib.flow, googleapiclient.discovery\n"
+_SERVE = """import time
+started = time.perf_counter()
+{preload}import app
+resp = app.create_app().test_client().get("/api/health")
+assert resp.status_code == 200
+print((time.perf_counter() - started) * 1000.0)
+"""
+
+
+def _env(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env["GOALS_FILE"] = os.path.join(workdir, "goals.json")
+    env["USER_DATA_DIR"] = os.path.join(workdir, "user_data")
+    env["JOBS_DB"] = os.path.join(workdir, "jobs.sqlite3")
+    return env
+
+
+def first_response_ms(eager: bool, runs: int, workdir: str) -> List[float]:
+    code = _SERVE.format(preload=_EAGER if eager else "")
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=BACKEND, env=_env(workdir), capture_output=True, text=True, check=True
+        )
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def slowest_imports(workdir: str, top: int) -> List[Tuple[int, str]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND, env=_env(workdir), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # two spaces of indent marks a module imported directly by app.py
+        if name.startswith("   ") and not name.startswith("    "):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backend cold-start benchmark.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'mode':>6} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+        for eager in (True, False):
+            timings = first_response_ms(eager, args.runs, workdir)
+            print(f"{'eager' if eager else 'lazy':>6} {statistics.median(timings):>10.0f} {min(timings):>8.0f} {max(timings):>8.0f}")
+        print("\nslowest imports under app.py (python -X importtime, cumulative):")
+        for cumulative, name in slowest_imports(workdir, args.top):
+            print(f"{cumulative / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Micro-benchmark for event-list formatting in timeutils.py.
+
+Compares the original per-call helpers (new ZoneInfo + fromisoformat on every call, as
+app.py did before timeutils existed) against timeutils.format_event_lines over a page
+of synthetic Google Calendar events.
+
+Usage (from the backend directory):
+
+    python benchmarks/time_format_bench.py
+    python benchmarks/time_format_bench.py --events 10000 --repeat 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import timeutils  # noqa: E402
+
+
+def synthetic_events(count: int, seed: int = 5620) -> List[Dict]:
+    rng = random.Random(seed)
+    base = datetime(2025, 11, 3, 8, 0, tzinfo=timezone(timedelta(hours=11)))
+    events = []
+    for i in range(count):
+        start = base + timedelta(minutes=30 * rng.randint(0, 24 * 2 * 60))
+        if i % 20 == 0:
+            events.append({
+                "id": f"ev{i}",
+                "summary": f"All-day {i}",
+                "start": {"date": start.date().isoformat()},
+                "end": {"date": (start.date() + timedelta(days=1)).isoformat()},
+            })
+            continue
+        end = start + timedelta(minutes=30 * rng.randint(1, 6))
+        stamp = "%Y-%m-%dT%H:%M:%S%z" if i % 3 else "%Y-%m-%dT%H:%M:%SZ"
+        events.append({
+            "id": f"ev{i}",
+            "summary": f"Event {i}",
+            "start": {"dateTime": start.astimezone(timezone.utc).strftime(stamp) if i % 3 == 0 else start.isoformat()},
+            "end": {"dateTime": end.astimezone(timezone.utc).strftime(stamp) if i % 3 == 0 else end.isoformat()},
+        })
+    return events
+
+
+# --- the helpers as they were written in app.py before timeutils ---
+
+def _legacy_fmt_date_only(dt_iso: str) -> str:
+    tz = ZoneInfo("Australia/Sydney")
+    dt = datetime.fromisoformat(dt_iso.replace("Z", "+00:00")).astimezone(tz)
+    return dt.strftime("%A, %d %B %Y")
+
+
+def _legacy_fmt_time_range(start_iso: str, end_iso: str) -> str:
+    tz = ZoneInfo("Australia/Sydney")
+    s = datetime.fromisoformat(start_iso.replace("Z", "+00:00")).astimezone(tz)
+    e = datetime.fromisoformat(end_iso.replace("Z", "+00:00")).astimezone(tz)
+    st = s.strftime("%I:%M %p").lstrip("0")
+    et = e.strftime("%I:%M %p").lstrip("0")
+    return f"{st} – {et}"
+
+
+def legacy_lines(events: List[Dict]) -> List[str]:
+    lines = []
+    for ev in events:
+        title = ev.get("summary") or "(no title)"
+        start = (ev.get("start") or {}).get("dateTime") or (ev.get("start") or {}).get("date")
+        end = (ev.get("end") or {}).get("dateTime") or (ev.get("end") or {}).get("date")
+        try:
+            if start and end and "T" in start and "T" in end:
+                lines.append(f"• {title} — {_legacy_fmt_date_only(start)}, {_legacy_fmt_time_range(start, end)}")
+            else:
+                lines.append(f"• {title} — {_legacy_fmt_date_only(start or end)} (all day)")
+        except Exception:
+            lines.append(f"• {title}")
+    return lines
+
+
+def _time(fn, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Event formatting micro-benchmark.")
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events)
+
+    legacy = _time(lambda: legacy_lines(events), args.repeat)
+    timeutils.parse_iso.cache_clear()
+    timeutils._local_from_iso.cache_clear()
+    cold = _time(lambda: timeutils.format_event_lines(events), 1)
+    warm = _time(lambda: timeutils.format_event_lines(events), args.repeat)
+
+    mismatches = sum(a != b for a, b in zip(legacy_lines(events), timeutils.format_event_lines(events)))
+
+    print(f"events: {args.events}, repeat: {args.repeat}")
+    print(f"{'variant':<28} {'median ms':>10} {'per event us':>14}")
+    for name, samples in (
+        ("legacy per-call helpers", legacy),
+        ("format_event_lines (cold)", cold),
+        ("format_event_lines (warm)", warm),
+    ):
+        median = statistics.median(samples)
+        print(f"{name:<28} {median:>10.2f} {median * 1000 / args.events:>14.2f}")
+    print(f"speedup (cold): {statistics.median(legacy) / statistics.median(cold):.1f}x")
+    print(f"speedup (warm): {statistics.median(legacy) / statistics.median(warm):.1f}x")
+    print(f"lines differing from legacy output: {mismatches}")
+    print(f"parse_iso cache: {timeutils.parse_iso.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
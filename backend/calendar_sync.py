@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import fastjson
+
+# Incremental syncs run at most this often per user; DOLMA's own calendar writes force the next one.
+SYNC_INTERVAL_SECONDS = float(os.getenv("GOOGLE_SYNC_INTERVAL", "30"))
+SYNC_PAGE_SIZE = 2500
+# A sync reads at most this many pages; a calendar bigger than that is expanded by Google instead.
+MAX_SYNC_PAGES = int(os.getenv("GOOGLE_MAX_SYNC_PAGES", "20"))
+
+
+class SyncTooLarge(RuntimeError):
+    pass
+
+
+def _status(exc: Exception) -> Optional[int]:
+    return getattr(getattr(exc, "resp", None), "status", None)
+
+
+class EventStore:
+    """
+    One user's primary calendar as Google stores it: recurring masters, their exceptions (moved,
+    edited and cancelled instances) and single events, unexpanded. Kept in memory and in a JSON
+    file next to the user's token, and brought up to date with events.list sync tokens, so a
+    quiet calendar costs one small round trip per SYNC_INTERVAL_SECONDS instead of a full read.
+
+    Exceptions are listed wherever they were moved to, so local expansion always knows which
+    original slots they replace.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.items: Dict[str, Dict] = {}
+        self.sync_token: Optional[str] = None
+        self.synced_at = 0.0
+        self.stale = True
+        self._loaded = False
+
+    def _load(self) -> None:
+        self._loaded = True
+        try:
+            with open(self.path, "rb") as f:
+                data = fastjson.loads(f.read())
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and isinstance(data.get("items"), list):
+            self.items = {ev["id"]: ev for ev in data["items"] if ev.get("id")}
+            self.sync_token = data.get("sync_token")
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(fastjson.dumps_bytes({"sync_token": self.sync_token, "items": list(self.items.values())}))
+        os.replace(tmp_path, self.path)
+
+    def _apply(self, items: List[Dict]) -> None:
+        for ev in items:
+            if not ev.get("id"):
+                continue
+            if ev.get("status") == "cancelled" and not ev.get("recurringEventId"):
+                self.items.pop(ev["id"], None)
+            else:
+                # cancelled instances stay: they are the exdates of their series
+                self.items[ev["id"]] = ev
+
+    def _pages(self, service, **params) -> Tuple[List[Dict], Optional[str]]:
+        items: List[Dict] = []
+        page_token = None
+        for _ in range(MAX_SYNC_PAGES):
+            r = service.events().list(
+                calendarId="primary",
+                singleEvents=False,
+                showDeleted=True,
+                maxResults=SYNC_PAGE_SIZE,
+                pageToken=page_token,
+                **params,
+            ).execute()
+            items.extend(r.get("items", []))
+            page_token = r.get("nextPageToken")
+            if not page_token:
+                return items, r.get("nextSyncToken")
+        raise SyncTooLarge(f"calendar has more than {MAX_SYNC_PAGES * SYNC_PAGE_SIZE} items to sync")
+
+    def sync(self, service) -> None:
+        with self.lock:
+            if not self._loaded:
+                self._load()
+            if self.sync_token and not self.stale and time.time() - self.synced_at < SYNC_INTERVAL_SECONDS:
+                return
+            token = None
+            if self.sync_token:
+                try:
+                    items, token = self._pages(service, syncToken=self.sync_token)
+                    self._apply(items)
+                except Exception as e:
+                    if _status(e) != 410:
+                        raise
+                    # sync token expired: start over with a full read
+                    self.sync_token = None
+            if not self.sync_token:
+                items, token = self._pages(service)
+                self.items = {}
+                self._apply(items)
+            self.sync_token = token
+            self.synced_at = time.time()
+            self.stale = False
+            self._save()
+
+    def events(self) -> List[Dict]:
+        with self.lock:
+            return list(self.items.values())
+
+    def mark_stale(self) -> None:
+        self.stale = True
+
+    def clear(self) -> None:
+        with self.lock:
+            self.items = {}
+            self.sync_token = None
+            self.stale = True
+            self._loaded = True
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
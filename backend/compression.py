@@ -0,0 +1,112 @@
+import gzip
+import os
+import threading
+from typing import Dict, Optional
+
+from flask import Flask, Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("RESPONSE_COMPRESSION", "1").lower() in ("1", "true", "yes")
+# Bodies smaller than this go out as-is; the encoding overhead isn't worth it.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/css", "application/javascript")
+
+_lock = threading.Lock()
+_stats = {"compressed": 0, "bytes_in": 0, "bytes_out": 0, "gzip": 0, "br": 0}
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    # "gzip;q=0.8, br" -> {"gzip": 0.8, "br": 1.0}
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """
+    Picks br (when the brotli package is installed) or gzip from an Accept-Encoding header,
+    by q-value with br winning ties.
+    """
+    if not header:
+        return None
+    accepted = _accepted(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    scored = [(accepted.get(name, wildcard), name) for name in candidates]
+    scored = [(q, name) for q, name in scored if q > 0]
+    if not scored:
+        return None
+    best = max(q for q, _ in scored)
+    return next(name for q, name in scored if q == best)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compress_response(resp: Response) -> Response:
+    resp.vary.add("Accept-Encoding")
+    if (
+        resp.direct_passthrough
+        or resp.is_streamed
+        or resp.status_code < 200
+        or resp.status_code in (204, 304)
+        or "Content-Encoding" in resp.headers
+        or resp.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return resp
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return resp
+    body = resp.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return resp
+    packed = compress(body, encoding)
+    resp.set_data(packed)
+    resp.headers["Content-Encoding"] = encoding
+    # the encoded bytes differ from the identity ones, so the validator can only be weak
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+    with _lock:
+        _stats["compressed"] += 1
+        _stats[encoding] += 1
+        _stats["bytes_in"] += len(body)
+        _stats["bytes_out"] += len(packed)
+    return resp
+
+
+def init_app(app: Flask) -> None:
+    """
+    Registers the compression hook. after_request hooks run in reverse order of registration,
+    so call this before registering blueprints to compress the final response body.
+    """
+    if COMPRESSION_ENABLED:
+        app.after_request(_compress_response)
+
+
+def stats() -> Dict:
+    with _lock:
+        stats = dict(_stats)
+    stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else None
+    stats["brotli_available"] = brotli is not None
+    return stats
@@ -0,0 +1,129 @@
+import re
+from datetime import date, datetime, time, timedelta, tzinfo
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+
+import timeutils
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+FIXED_PRESETS = ("today", "tomorrow", "this_week", "next_week", "this_month", "next_month")
+MAX_RELATIVE_DAYS = 366
+PRESET_HELP = "today, tomorrow, this_week, next_week, this_month, next_month, next_<N>_days or a weekday name"
+
+_NEXT_DAYS = re.compile(r"^next_(\d+)_days?$")
+_END_OF_DAY = time(23, 59, 59, 999000)
+
+
+class DateRange(NamedTuple):
+    start: datetime
+    end: datetime
+    header: str
+
+
+def normalise_preset(preset: Optional[str]) -> str:
+    # 'Next 3 days', 'next-week' and 'next_week' all resolve the same way
+    return re.sub(r"[\s\-]+", "_", (preset or "").strip().lower())
+
+
+def _day_start(day: date, tz: Optional[tzinfo]) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=tz)
+
+
+def _day_end(day: date, tz: Optional[tzinfo]) -> datetime:
+    return datetime.combine(day, _END_OF_DAY, tzinfo=tz)
+
+
+def _window(first: date, last: date, tz: Optional[tzinfo]) -> DateRange:
+    start = _day_start(first, tz)
+    end = _day_end(last, tz)
+    if first == last:
+        header = timeutils.fmt_date_only(start, tz)
+    else:
+        header = f"{timeutils.fmt_date_only(start, tz)} → {timeutils.fmt_date_only(end, tz)}"
+    return DateRange(start, end, header)
+
+
+def _month_bounds(year: int, month: int):
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return first, following - timedelta(days=1)
+
+
+@lru_cache(maxsize=16)
+def _day_table(today: date, zone_name: str) -> Dict[str, DateRange]:
+    """
+    Every fixed preset and weekday window for one local day in one zone. Built once per
+    (day, zone); a new key appears at local midnight so stale windows are never served.
+    """
+    tz = timeutils.zone_profile(zone_name).tz
+    monday = today - timedelta(days=today.weekday())
+    this_month = _month_bounds(today.year, today.month)
+    next_month = _month_bounds(today.year + today.month // 12, today.month % 12 + 1)
+    table = {
+        "today": _window(today, today, tz),
+        "tomorrow": _window(today + timedelta(days=1), today + timedelta(days=1), tz),
+        "this_week": _window(monday, monday + timedelta(days=6), tz),
+        "next_week": _window(monday + timedelta(days=7), monday + timedelta(days=13), tz),
+        "this_month": _window(*this_month, tz),
+        "next_month": _window(*next_month, tz),
+    }
+    for offset in range(7):
+        # a weekday name means its next occurrence, today included
+        day = today + timedelta(days=offset)
+        window = _window(day, day, tz)
+        table[WEEKDAYS[day.weekday()]] = window
+        table[f"next_{WEEKDAYS[day.weekday()]}"] = window if offset else _window(day + timedelta(days=7), day + timedelta(days=7), tz)
+    return table
+
+
+@lru_cache(maxsize=64)
+def _next_days(today: date, zone_name: str, days: int) -> DateRange:
+    # 'next 3 days' covers today and the two days after it
+    return _window(today, today + timedelta(days=days - 1), timeutils.zone_profile(zone_name).tz)
+
+
+def local_today(zone_name: Optional[str] = None) -> date:
+    return datetime.now(timeutils.zone_profile(zone_name or timeutils.current_zone_name()).tz).date()
+
+
+def preset_range(preset: str, zone_name: Optional[str] = None, today: Optional[date] = None) -> DateRange:
+    """
+    Window and header for a named preset. Raises ValueError for anything unrecognised.
+    """
+    key = normalise_preset(preset)
+    zone_name = zone_name or timeutils.current_zone_name()
+    today = today or local_today(zone_name)
+    window = _day_table(today, zone_name).get(key)
+    if window is not None:
+        return window
+    match = _NEXT_DAYS.match(key)
+    if match and 1 <= int(match.group(1)) <= MAX_RELATIVE_DAYS:
+        return _next_days(today, zone_name, int(match.group(1)))
+    raise ValueError(f"Unknown preset '{preset}'. Use {PRESET_HELP}.")
+
+
+def resolve(
+    preset: Optional[str] = None,
+    time_min: Optional[str] = None,
+    time_max: Optional[str] = None,
+    *,
+    around_days: Optional[int] = None,
+    zone_name: Optional[str] = None,
+) -> Optional[DateRange]:
+    """
+    Range for a calendar tool call: a preset wins, then an explicit RFC3339 time_min/time_max
+    pair, then (if around_days is set) now ± around_days. Returns None when nothing applies.
+    """
+    zone_name = zone_name or timeutils.current_zone_name()
+    if normalise_preset(preset):
+        return preset_range(preset, zone_name)
+    tz = timeutils.zone_profile(zone_name).tz
+    if time_min and time_max:
+        start = timeutils.parse_iso(time_min)
+        end = timeutils.parse_iso(time_max)
+        return DateRange(start, end, f"{timeutils.fmt_date_only(start, tz)} → {timeutils.fmt_date_only(end, tz)}")
+    if around_days is not None:
+        now = datetime.now(tz)
+        start, end = now - timedelta(days=around_days), now + timedelta(days=around_days)
+        return DateRange(start, end, f"{timeutils.fmt_date_only(start, tz)} → {timeutils.fmt_date_only(end, tz)}")
+    return None
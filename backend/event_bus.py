@@ -0,0 +1,148 @@
+import json
+import os
+import queue
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+import tenancy
+
+# Recent events kept for Last-Event-ID resume.
+REPLAY_BUFFER_SIZE = max(1, int(os.getenv("EVENT_REPLAY_BUFFER", "500")))
+# Pending events per subscriber before it is considered too slow and told to resync.
+SUBSCRIBER_QUEUE_SIZE = max(1, int(os.getenv("EVENT_SUBSCRIBER_QUEUE", "100")))
+MAX_SUBSCRIBERS = max(1, int(os.getenv("EVENT_MAX_SUBSCRIBERS", "200")))
+HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+
+class TooManySubscribers(RuntimeError):
+    pass
+
+
+class Subscription:
+    def __init__(self, user: str) -> None:
+        self.user = user
+        self.queue: "queue.Queue[Dict]" = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.resync_reason: Optional[str] = None
+
+    def offer(self, event: Dict) -> None:
+        if self.resync_reason or event.get("user") != self.user:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Backpressure: drop instead of blocking publishers; the client resyncs.
+            self.resync_reason = "overflow"
+
+    def next_event(self, timeout: float) -> Optional[Dict]:
+        if self.resync_reason:
+            reason, self.resync_reason = self.resync_reason, None
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            return {"id": None, "type": "resync", "data": {"reason": reason}}
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """
+    In-process publish/subscribe hub. Publishers never block; each subscriber gets a bounded
+    queue and recent events are buffered so a reconnecting client can resume from its last id.
+    Events are scoped to a user and only delivered to that user's subscriptions.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._buffer: Deque[Dict] = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self._subscribers: List[Subscription] = []
+        self._listeners: List[Callable[[Dict], None]] = []
+
+    def add_listener(self, callback: Callable[[Dict], None]) -> None:
+        # in-process hooks (e.g. cache invalidation) run synchronously on publish; keep them quick
+        with self._lock:
+            self._listeners.append(callback)
+
+    def publish(self, event_type: str, data: Dict, user: Optional[str] = None) -> Dict:
+        with self._lock:
+            event = {
+                "id": self._next_id,
+                "type": event_type,
+                "user": user or tenancy.current_user(),
+                "data": data,
+                "ts": datetime.now(timezone.utc).isoformat(),
+            }
+            self._next_id += 1
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+        for sub in subscribers:
+            sub.offer(event)
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print("event listener failed:", e)
+        return event
+
+    def subscribe(self, last_event_id: Optional[int] = None, user: Optional[str] = None) -> Subscription:
+        sub = Subscription(user or tenancy.current_user())
+        with self._lock:
+            if len(self._subscribers) >= MAX_SUBSCRIBERS:
+                raise TooManySubscribers("Too many open event streams.")
+            if last_event_id is not None:
+                oldest = self._buffer[0]["id"] if self._buffer else self._next_id
+                if last_event_id < oldest - 1 or last_event_id >= self._next_id:
+                    sub.resync_reason = "expired"
+                else:
+                    for event in self._buffer:
+                        if event["id"] > last_event_id:
+                            sub.offer(event)
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+def format_sse(event: Dict) -> str:
+    lines = []
+    if event.get("id") is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event.get('data'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def stream(sub: Subscription, heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+    """
+    Yields SSE frames for a subscription, with comment heartbeats so proxies keep the
+    connection open. The caller must unsubscribe when the generator closes.
+    """
+    yield f"retry: {int(heartbeat * 1000)}\n\n"
+    while True:
+        event = sub.next_event(timeout=heartbeat)
+        if event is None:
+            yield ": heartbeat\n\n"
+            continue
+        yield format_sse(event)
+
+
+bus = EventBus()
+
+
+def publish(event_type: str, data: Dict, user: Optional[str] = None) -> Dict:
+    return bus.publish(event_type, data, user=user)
+
+
+def add_listener(callback: Callable[[Dict], None]) -> None:
+    bus.add_listener(callback)
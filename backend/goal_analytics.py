@@ -0,0 +1,183 @@
+import os
+from functools import lru_cache
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import goals
+import tenancy
+import timeutils
+
+# Days without an update after which an unfinished goal is reported as stalled.
+STALE_DAYS = float(os.getenv("GOAL_STALE_DAYS", "14"))
+# A goal is only "ahead" when it leads the straight-line schedule by this fraction of its target.
+AHEAD_MARGIN = 0.05
+# Pace is measured over at least this many days so a goal created this morning isn't "infinitely fast".
+MIN_ELAPSED_DAYS = 1.0
+INSIGHTS_CACHE_SIZE = int(os.getenv("GOAL_INSIGHTS_CACHE_SIZE", "256"))
+
+_DAY = 86400.0
+# insight results keyed by user, store revision, zone and local date; a goal write bumps the revision
+_CACHE: "tenancy.LRUCache[Dict]" = tenancy.LRUCache(INSIGHTS_CACHE_SIZE)
+
+
+def _epoch_days(value: Optional[str]) -> float:
+    if not value:
+        return np.nan
+    try:
+        return timeutils.parse_iso(value).timestamp() / _DAY
+    except (TypeError, ValueError):
+        return np.nan
+
+
+@lru_cache(maxsize=4096)
+def _deadline_days(value: Optional[str], tz) -> float:
+    # target dates are local calendar days; the deadline is the end of that day
+    if not value:
+        return np.nan
+    try:
+        day = date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return np.nan
+    return datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz).timestamp() / _DAY
+
+
+def _number(value) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+def _columns(rows: List[Dict], tz) -> Dict[str, np.ndarray]:
+    """
+    Goal fields as parallel arrays. Goals without a numeric target are measured in percent.
+    Last activity is the later of the last update and the last history note.
+    """
+    n = len(rows)
+    target = np.empty(n)
+    done = np.empty(n)
+    created = np.empty(n)
+    deadline = np.empty(n)
+    active = np.empty(n)
+    for i, g in enumerate(rows):
+        t = _number(g.get("target_value"))
+        if t > 0:
+            target[i] = t
+            done[i] = max(_number(g.get("progress_value")), 0.0) if g.get("progress_value") is not None else 0.0
+        else:
+            target[i] = 100.0
+            done[i] = _number(g.get("progress")) if g.get("progress") is not None else 0.0
+        created[i] = _epoch_days(g.get("created_at"))
+        deadline[i] = _deadline_days(g.get("target_date"), tz)
+        last = (g.get("last_history") or {}).get("timestamp") if isinstance(g.get("last_history"), dict) else None
+        active[i] = np.fmax(_epoch_days(g.get("updated_at")), _epoch_days(last))
+    return {
+        "target": target,
+        "done": np.nan_to_num(done),
+        "created": created,
+        "deadline": deadline,
+        "active": active,
+        "open": np.array([(g.get("status") or "active").lower() == "active" for g in rows], dtype=bool),
+    }
+
+
+def compute(rows: List[Dict], now: datetime) -> List[Dict]:
+    """
+    Pace, projected finish, required daily rate and risk for every goal in one vectorised pass.
+    Pace is the average since the goal was created; required rate is what's left over the days
+    until the target date. A goal is at risk when it is active, unfinished and that pace won't
+    reach the target in time (or the date has passed).
+    """
+    if not rows:
+        return []
+    tz = timeutils.current_zone()
+    cols = _columns(rows, tz)
+    today = now.timestamp() / _DAY
+    target, done, created, deadline = cols["target"], cols["done"], cols["created"], cols["deadline"]
+
+    remaining = np.maximum(target - done, 0.0)
+    finished = remaining <= 0
+    elapsed = np.maximum(today - np.where(np.isnan(created), today, created), MIN_ELAPSED_DAYS)
+    pace = done / elapsed
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eta_days = np.where(pace > 0, remaining / pace, np.inf)
+        days_left = deadline - today
+        has_deadline = ~np.isnan(deadline)
+        overdue = has_deadline & (days_left <= 0) & ~finished
+        required = np.where(has_deadline & (days_left > 0), remaining / days_left, np.nan)
+        span = deadline - created
+        expected = np.where(
+            has_deadline & (span > 0), target * np.clip((today - created) / span, 0.0, 1.0), np.nan
+        )
+    idle = today - np.where(np.isnan(cols["active"]), created, cols["active"])
+    stalled = cols["open"] & ~finished & (idle >= STALE_DAYS)
+    at_risk = cols["open"] & ~finished & has_deadline & (overdue | (eta_days > days_left))
+    ahead = has_deadline & ~finished & (done - expected >= AHEAD_MARGIN * target)
+
+    state = np.full(len(rows), "on_track", dtype=object)
+    state[~has_deadline] = "no_deadline"
+    state[ahead] = "ahead"
+    state[at_risk] = "at_risk"
+    state[overdue] = "overdue"
+    state[~cols["open"] & ~finished] = "inactive"
+    state[finished] = "complete"
+
+    # plain lists for the per-goal projection; indexing numpy scalars row by row is the slow part
+    eta_list = eta_days.tolist()
+    columns = zip(
+        rows, state.tolist(), at_risk.tolist(), stalled.tolist(), done.tolist(), target.tolist(),
+        remaining.tolist(), pace.tolist(), required.tolist(), expected.tolist(), days_left.tolist(), idle.tolist(),
+    )
+    results = []
+    for i, (g, st, risk, stale, d, t, rem, p, req, exp, left, idle_days) in enumerate(columns):
+        projected = None
+        if rem > 0 and eta_list[i] != float("inf"):
+            projected = (now + timedelta(days=eta_list[i])).astimezone(tz).date().isoformat()
+        measured_in_units = _number(g.get("target_value")) > 0
+        results.append({
+            "id": g.get("id"),
+            "title": g.get("title") or "Untitled goal",
+            "unit": (g.get("target_unit") or "").strip() if measured_in_units else "%",
+            "target_date": g.get("target_date"),
+            "state": st,
+            "at_risk": risk,
+            "stalled": stale,
+            "done": d,
+            "target": t,
+            "remaining": rem,
+            "pace_per_day": round(p, 4),
+            "required_per_day": None if req != req else round(req, 4),
+            "expected_by_now": None if exp != exp else round(exp, 4),
+            "days_left": None if left != left else round(left, 1),
+            "idle_days": None if idle_days != idle_days else round(idle_days, 1),
+            "projected_completion": projected,
+        })
+    return results
+
+
+def _summarise(items: List[Dict]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for item in items:
+        counts[item["state"]] = counts.get(item["state"], 0) + 1
+    counts["at_risk_total"] = sum(1 for item in items if item["at_risk"])
+    counts["stalled"] = sum(1 for item in items if item["stalled"])
+    return counts
+
+
+def insights(status: Optional[str] = None) -> Dict:
+    """
+    Insights for the current user's goals, computed once per store revision and local day.
+    """
+    revision = goals.store_revision()
+    local_now = timeutils.now()
+    key = f"{tenancy.current_user()}:{revision}:{timeutils.current_zone_name()}:{local_now.date().isoformat()}"
+
+    def build() -> Dict:
+        items = compute(goals.list_goals(), local_now)
+        return {"revision": revision, "as_of": local_now.isoformat(), "goals": items, "summary": _summarise(items)}
+
+    result = _CACHE.get_or_create(key, build)
+    if status:
+        wanted = status.lower()
+        items = [item for item in result["goals"] if item["state"] == wanted or (wanted == "at_risk" and item["at_risk"])]
+        return {**result, "goals": items}
+    return result
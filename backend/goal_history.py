@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+from typing import Dict, List, Optional
+
+# Raw history entries kept per goal before older ones are rolled up.
+HISTORY_RETAIN = max(1, int(os.getenv("GOAL_HISTORY_RETAIN", "50")))
+# Aggregates kept per goal once raw entries have been compacted: daily ones, with days past
+# the limit folded into one "earlier" aggregate so every entry is still counted.
+HISTORY_MAX_ROLLUPS = max(2, int(os.getenv("GOAL_HISTORY_MAX_ROLLUPS", "365")))
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+_ENTRIES_FILE = "entries.jsonl"
+_ROLLUPS_FILE = "rollups.json"
+
+
+def _goal_dir(base_dir: str, goal_id: str) -> str:
+    # goal ids are uuid4 hex strings; guard against path tricks from the API layer
+    safe_id = "".join(ch for ch in goal_id if ch.isalnum())
+    return os.path.join(base_dir, safe_id)
+
+
+def _read_entries(goal_dir: str) -> List[Dict]:
+    path = os.path.join(goal_dir, _ENTRIES_FILE)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def _read_rollups(goal_dir: str) -> List[Dict]:
+    path = os.path.join(goal_dir, _ROLLUPS_FILE)
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            if isinstance(data, list):
+                return data
+    except Exception:
+        pass
+    return []
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _roll_up(entries: List[Dict], rollups: List[Dict]) -> List[Dict]:
+    """
+    Fold entries into per-day aggregates, merging with any existing aggregate for the same day.
+    Rollups stay ordered oldest first.
+    """
+    by_date = {r.get("date"): r for r in rollups}
+    order = [r.get("date") for r in rollups]
+    for entry in entries:
+        day = (entry.get("timestamp") or "")[:10] or "unknown"
+        rollup = by_date.get(day)
+        if rollup is None:
+            rollup = {
+                "rollup": "daily",
+                "date": day,
+                "count": 0,
+                "first_note": entry.get("note"),
+                "last_note": entry.get("note"),
+                "timestamp": entry.get("timestamp"),
+            }
+            by_date[day] = rollup
+            order.append(day)
+        rollup["count"] += 1
+        rollup["last_note"] = entry.get("note")
+        rollup["timestamp"] = entry.get("timestamp")
+    merged = [by_date[day] for day in sorted(set(order))]
+    if len(merged) > HISTORY_MAX_ROLLUPS:
+        keep = HISTORY_MAX_ROLLUPS - 1
+        merged = [_fold(merged[:-keep])] + merged[-keep:]
+    return merged
+
+
+def _fold(rollups: List[Dict]) -> Dict:
+    # history_count and the paged rows must keep agreeing, so old days are merged, not dropped
+    first, last = rollups[0], rollups[-1]
+    return {
+        "rollup": "earlier",
+        "since": first.get("since") or first.get("date"),
+        "date": last.get("date"),
+        "count": sum(r.get("count", 0) for r in rollups),
+        "first_note": first.get("first_note"),
+        "last_note": last.get("last_note"),
+        "timestamp": last.get("timestamp"),
+    }
+
+
+def compact(base_dir: str, goal_id: str) -> None:
+    """
+    Keep the newest HISTORY_RETAIN raw entries and roll everything older into daily aggregates.
+    """
+    goal_dir = _goal_dir(base_dir, goal_id)
+    entries = _read_entries(goal_dir)
+    if len(entries) <= HISTORY_RETAIN:
+        return
+    overflow, kept = entries[:-HISTORY_RETAIN], entries[-HISTORY_RETAIN:]
+    rollups = _roll_up(overflow, _read_rollups(goal_dir))
+    _write_atomic(os.path.join(goal_dir, _ROLLUPS_FILE), json.dumps(rollups))
+    _write_atomic(
+        os.path.join(goal_dir, _ENTRIES_FILE),
+        "".join(json.dumps(e) + "\n" for e in kept),
+    )
+
+
+def append_entries(base_dir: str, goal_id: str, entries: List[Dict], total_count: int) -> None:
+    """
+    Append entries to the goal's raw segment. total_count is the goal's history count after
+    the append; compaction runs every HISTORY_RETAIN appends so rewrites stay amortised O(1).
+    """
+    if not entries:
+        return
+    goal_dir = _goal_dir(base_dir, goal_id)
+    os.makedirs(goal_dir, exist_ok=True)
+    with open(os.path.join(goal_dir, _ENTRIES_FILE), "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    if total_count // HISTORY_RETAIN != (total_count - len(entries)) // HISTORY_RETAIN:
+        compact(base_dir, goal_id)
+
+
+def read_page(
+    base_dir: str,
+    goal_id: str,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Dict:
+    """
+    Return one page of history, newest first: raw entries followed by daily rollups.
+    The cursor is an opaque offset into that sequence.
+    """
+    try:
+        offset = max(0, int(cursor)) if cursor else 0
+    except (TypeError, ValueError):
+        raise ValueError("Invalid history cursor.")
+    limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+
+    goal_dir = _goal_dir(base_dir, goal_id)
+    combined = list(reversed(_read_entries(goal_dir))) + list(reversed(_read_rollups(goal_dir)))
+    page = combined[offset:offset + limit]
+    next_offset = offset + len(page)
+    return {
+        "entries": page,
+        "next_cursor": str(next_offset) if next_offset < len(combined) else None,
+    }
+
+
+def delete_history(base_dir: str, goal_id: str) -> None:
+    goal_dir = _goal_dir(base_dir, goal_id)
+    if os.path.isdir(goal_dir):
+        shutil.rmtree(goal_dir, ignore_errors=True)
@@ -0,0 +1,181 @@
+import hashlib
+import math
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import scheduling
+import timeutils
+
+DEFAULT_SESSION_MINUTES = 60
+DEFAULT_SESSIONS_PER_WEEK = 3
+DEFAULT_PLAN_DAYS = 28
+MAX_SESSIONS = 500
+# units whose remaining amount is itself time, converted to minutes
+TIME_UNITS = {
+    "min": 1, "mins": 1, "minute": 1, "minutes": 1,
+    "h": 60, "hr": 60, "hrs": 60, "hour": 60, "hours": 60,
+}
+
+
+class PlannedSession(NamedTuple):
+    start: datetime
+    end: datetime
+    amount: float
+
+
+def remaining_amount(goal: Dict) -> Optional[float]:
+    target = goal.get("target_value")
+    if not isinstance(target, (int, float)) or target <= 0:
+        return None
+    done = goal.get("progress_value")
+    done = float(done) if isinstance(done, (int, float)) else 0.0
+    return max(float(target) - done, 0.0)
+
+
+def plan_end(goal: Dict, tz: Optional[tzinfo], now: datetime) -> datetime:
+    # end of the target day, or DEFAULT_PLAN_DAYS from now for open-ended goals
+    target = (goal.get("target_date") or "").strip()
+    if target:
+        try:
+            day = date.fromisoformat(target[:10])
+            return datetime.combine(day, time(23, 59, 59), tzinfo=tz)
+        except ValueError:
+            pass
+    return now + timedelta(days=DEFAULT_PLAN_DAYS)
+
+
+def _best_slot_per_day(
+    free: Sequence[scheduling.Window],
+    need: timedelta,
+    tz: Optional[tzinfo],
+    preferred_hour: Optional[float],
+    buffer: timedelta,
+) -> List[scheduling.Window]:
+    """
+    One slot per local day: within each day's free windows, the start closest to
+    preferred_hour (or the earliest, padded by the buffer when the gap allows).
+    """
+    best: Dict[date, tuple] = {}
+    for w_start, w_end in free:
+        if w_end - w_start < need:
+            continue
+        day = w_start.astimezone(tz).date() if tz else w_start.date()
+        latest = w_end - need
+        earliest = scheduling.round_up(w_start + buffer, scheduling.SLOT_STEP_MINUTES)
+        if earliest > latest:
+            earliest = w_start
+        if preferred_hour is None:
+            start, distance = earliest, 0.0
+        else:
+            wanted = datetime.combine(day, time.min, tzinfo=tz) + timedelta(hours=preferred_hour)
+            start = min(max(wanted, earliest), latest)
+            distance = abs((start - wanted).total_seconds())
+        current = best.get(day)
+        if current is None or (distance, start) < current[0]:
+            best[day] = ((distance, start), (start, start + need))
+    return [slot for _, (_, slot) in sorted(best.items())]
+
+
+def plan_sessions(
+    goal: Dict,
+    free: Sequence[scheduling.Window],
+    start: datetime,
+    end: datetime,
+    *,
+    session_minutes: Optional[int] = None,
+    sessions_per_week: Optional[int] = None,
+    preferred_hour: Optional[float] = None,
+    buffer_minutes: int = scheduling.SLOT_BUFFER_MINUTES,
+    max_sessions: int = MAX_SESSIONS,
+) -> Dict:
+    """
+    Spreads the goal's remaining amount over evenly spaced sessions in the free windows
+    between start and end (at most one per day). Time-based units (minutes, hours) fix the
+    number of sessions; other units use sessions_per_week and split the amount evenly.
+    Linear in the number of free windows plus sessions, so multi-month plans stay cheap.
+    """
+    remaining = remaining_amount(goal)
+    if remaining is None:
+        raise ValueError("That goal has no numeric target to plan towards.")
+    if remaining <= 0:
+        raise ValueError("That goal is already complete.")
+    if end <= start:
+        raise ValueError("The goal's target date has already passed.")
+
+    tz = timeutils.current_zone()
+    unit = (goal.get("target_unit") or "").strip()
+    minutes_per_unit = TIME_UNITS.get(unit.lower())
+    session_minutes = max(15, min(int(session_minutes or DEFAULT_SESSION_MINUTES), 8 * 60))
+    days = max(1, math.ceil((end - start).total_seconds() / 86400))
+
+    if minutes_per_unit:
+        wanted = math.ceil(remaining * minutes_per_unit / session_minutes)
+    else:
+        per_week = max(1, min(int(sessions_per_week or DEFAULT_SESSIONS_PER_WEEK), 7))
+        wanted = max(1, math.ceil(days * per_week / 7))
+    wanted = min(wanted, max_sessions)
+
+    need = timedelta(minutes=session_minutes)
+    day_slots = _best_slot_per_day(free, need, tz, preferred_hour, timedelta(minutes=buffer_minutes))
+    if len(day_slots) > wanted:
+        # evenly spaced picks across the available days
+        step = len(day_slots) / wanted
+        chosen = [day_slots[int((i + 0.5) * step)] for i in range(wanted)]
+    else:
+        chosen = day_slots
+
+    sessions: List[PlannedSession] = []
+    if chosen:
+        if minutes_per_unit:
+            per_session = session_minutes / minutes_per_unit
+            left = remaining
+            for s, e in chosen:
+                amount = min(per_session, left)
+                if amount <= 0:
+                    break
+                if amount < per_session:
+                    e = s + timedelta(minutes=max(15, math.ceil(amount * minutes_per_unit)))
+                sessions.append(PlannedSession(s, e, amount))
+                left -= amount
+        else:
+            per_session = remaining / len(chosen)
+            sessions = [PlannedSession(s, e, per_session) for s, e in chosen]
+
+    planned = sum(s.amount for s in sessions)
+    return {
+        "goal_id": goal.get("id"),
+        "title": goal.get("title") or "Goal",
+        "unit": unit,
+        "remaining": remaining,
+        "session_minutes": session_minutes,
+        "sessions": sessions,
+        "unscheduled": max(0, wanted - len(sessions)),
+        "unplanned_amount": max(0.0, remaining - planned),
+    }
+
+
+def fingerprint(sessions: Sequence[PlannedSession]) -> str:
+    # identifies a plan so a confirm can tell whether the calendar moved under it
+    digest = hashlib.sha1()
+    for s in sessions:
+        digest.update(f"{s.start.isoformat()}|{s.end.isoformat()};".encode())
+    return digest.hexdigest()[:16]
+
+
+def session_events(plan: Dict, format_amount) -> List[Dict]:
+    """
+    Calendar event specs for a plan, tagged with the goal id so other tools (e.g. the
+    schedule optimiser) recognise them as goal blocks.
+    """
+    total = len(plan["sessions"])
+    events = []
+    for i, s in enumerate(plan["sessions"], start=1):
+        amount = format_amount(s.amount)
+        events.append({
+            "summary": f"{plan['title']} ({amount} {plan['unit']})".replace(" )", ")"),
+            "description": f"Session {i} of {total} towards '{plan['title']}'. Planned by DOLMA.",
+            "start_time": s.start,
+            "end_time": s.end,
+            "goal_id": plan["goal_id"],
+        })
+    return events
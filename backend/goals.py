@@ -1,26 +1,150 @@
+import base64
+import bisect
 import json
 import os
 import threading
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from uuid import uuid4
 
+import event_bus
+import fastjson
+import goal_history
+import tenancy
+
 GOALS_FILE = os.getenv("GOALS_FILE", os.path.join(os.path.dirname(__file__), "goals.json"))
-_LOCK = threading.Lock()
+GOAL_HISTORY_DIR = os.getenv("GOAL_HISTORY_DIR")
+# Per-user goal indexes kept in memory; cold users are reloaded from disk on demand.
+GOAL_STORE_CACHE_SIZE = int(os.getenv("GOAL_STORE_CACHE_SIZE", "256"))
 
+SORT_KEYS = ("created_at", "target_date", "updated_at", "progress")
+GOAL_FIELDS = (
+    "id", "title", "description", "target_date", "progress", "status", "created_at", "updated_at",
+    "history_count", "last_history", "target_value", "target_unit", "target_period", "progress_value",
+)
+MAX_PAGE_SIZE = 500
+# Number of per-goal change records kept for /api/goals/changes before clients must resync.
+CHANGE_LOG_LIMIT = max(1, int(os.getenv("GOALS_CHANGE_LOG_LIMIT", "1000")))
 
-def _ensure_file() -> None:
-    if not os.path.exists(GOALS_FILE):
-        with open(GOALS_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f)
 
+class _GoalIndex:
+    """
+    In-memory view of the goal file: goals in file order, an id lookup and lazily built
+    sorted orders per SORT_KEYS entry. Reloaded only when the file's stat signature changes,
+    so reads stop re-parsing JSON and get_goal is a dict lookup.
 
-def _read_goals() -> List[Dict]:
-    if not os.path.exists(GOALS_FILE):
-        return []
+    Also tracks the store revision and change log persisted in the sidecar meta file.
+    One index (with its own lock) exists per user, so users never contend on a file.
+    """
+
+    def __init__(self, path: str, history_dir: str, user: str) -> None:
+        self.path = path
+        self.history_dir = history_dir
+        self.user = user
+        self.lock = threading.Lock()
+        self.signature: Optional[Tuple] = None
+        self.goals: List[Dict] = []
+        self.by_id: Dict[str, Dict] = {}
+        self.orders: Dict[str, Tuple[List, List[Tuple], List[Dict], List[Dict]]] = {}
+        self.revision = 0
+        self.floor = 0
+        self.changes: List[Dict] = []
+
+    def _stat_signature(self) -> Optional[Tuple]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (self.path, st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def load(self) -> List[Dict]:
+        signature = self._stat_signature()
+        if signature != self.signature:
+            self.replace(_load_file(self.path) if signature else [], signature)
+            self._load_meta()
+        return self.goals
+
+    def _load_meta(self) -> None:
+        meta = _read_meta(self.path)
+        self.revision = int(meta.get("revision", 0))
+        self.floor = int(meta.get("floor", 0))
+        self.changes = meta.get("changes") or []
+        file_stamp = list(self.signature[1:3]) if self.signature else None
+        if meta.get("file") != file_stamp:
+            # goal file changed behind our back (manual edit, restore): clients must resync
+            self.revision += 1
+            self.floor = self.revision
+            self.changes = []
+            self._save_meta()
+
+    def _save_meta(self) -> None:
+        _write_meta(self.path, {
+            "revision": self.revision,
+            "floor": self.floor,
+            "file": list(self.signature[1:3]) if self.signature else None,
+            "changes": self.changes,
+        })
+
+    def record(self, changed: Iterable[str], deleted: Iterable[str]) -> None:
+        self.revision += 1
+        self.changes.extend({"rev": self.revision, "id": gid, "op": "upsert"} for gid in changed)
+        self.changes.extend({"rev": self.revision, "id": gid, "op": "delete"} for gid in deleted)
+        if len(self.changes) > CHANGE_LOG_LIMIT:
+            self.changes = self.changes[-CHANGE_LOG_LIMIT:]
+            self.floor = self.changes[0]["rev"] - 1
+        self._save_meta()
+
+    def replace(self, goals: List[Dict], signature: Optional[Tuple]) -> None:
+        self.signature = signature
+        self.goals = goals
+        self.by_id = {g.get("id"): g for g in goals}
+        self.orders = {}
+
+    def order(self, key: str) -> Tuple[List, List[Tuple], List[Dict], List[Dict]]:
+        """
+        Returns (sorted keys, sorted (key, id) pairs, goals sorted by key then id, goals missing
+        the key sorted by id) for bisect range lookups and cursor positions.
+        """
+        cached = self.orders.get(key)
+        if cached is None:
+            present = [g for g in self.goals if g.get(key) is not None]
+            missing = [g for g in self.goals if g.get(key) is None]
+            # id breaks ties so every goal has one fixed position for cursors to resume from
+            present.sort(key=lambda g: (g.get(key), g.get("id") or ""))
+            missing.sort(key=lambda g: g.get("id") or "")
+            pairs = [(g.get(key), g.get("id") or "") for g in present]
+            cached = ([p[0] for p in pairs], pairs, present, missing)
+            self.orders[key] = cached
+        return cached
+
+
+_STORES: "tenancy.LRUCache[_GoalIndex]" = tenancy.LRUCache(GOAL_STORE_CACHE_SIZE)
+
+
+@contextmanager
+def _store() -> Iterator[_GoalIndex]:
+    """
+    Goal index for the current user, locked and pinned in the cache for the with block. The
+    default user keeps the legacy GOALS_FILE location; everyone else gets goals.json under
+    their own directory in tenancy.USER_DATA_DIR.
+    """
+    user = tenancy.current_user()
+    if user == tenancy.DEFAULT_USER:
+        path = GOALS_FILE
+        history_dir = GOAL_HISTORY_DIR or f"{os.path.splitext(GOALS_FILE)[0]}_history"
+    else:
+        base = tenancy.user_dir(user)
+        path = os.path.join(base, "goals.json")
+        history_dir = os.path.join(base, "goals_history")
+    with _STORES.pinned(path, lambda: _GoalIndex(path, history_dir, user)) as index, index.lock:
+        yield index
+
+
+def _load_file(path: str) -> List[Dict]:
     try:
-        with open(GOALS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(path, "rb") as f:
+            data = fastjson.loads(f.read())
             if isinstance(data, list):
                 return data
     except Exception:
@@ -28,11 +152,53 @@ def _read_goals() -> List[Dict]:
     return []
 
 
-def _write_goals(goals: List[Dict]) -> None:
-    tmp_path = f"{GOALS_FILE}.tmp"
+def _meta_path(path: str) -> str:
+    return f"{os.path.splitext(path)[0]}.meta.json"
+
+
+def _read_meta(path: str) -> Dict:
+    try:
+        with open(_meta_path(path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+            if isinstance(data, dict):
+                return data
+    except Exception:
+        pass
+    return {}
+
+
+def _write_meta(path: str, meta: Dict) -> None:
+    tmp_path = f"{_meta_path(path)}.tmp"
     with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(goals, f, indent=2)
-    os.replace(tmp_path, GOALS_FILE)
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(path))
+
+
+def _read_goals(index: _GoalIndex) -> List[Dict]:
+    # Shallow copy: callers may append/filter the list, but must copy a goal before mutating it.
+    return list(index.load())
+
+
+def _write_goals(
+    index: _GoalIndex,
+    goals: List[Dict],
+    changed: Iterable[str] = (),
+    deleted: Iterable[str] = (),
+) -> None:
+    os.makedirs(os.path.dirname(index.path) or ".", exist_ok=True)
+    tmp_path = f"{index.path}.tmp"
+    # compact: indentation made the file ~40% larger and slower to encode and parse
+    with open(tmp_path, "wb") as f:
+        f.write(fastjson.dumps_bytes(goals))
+    os.replace(tmp_path, index.path)
+    index.replace(goals, index._stat_signature())
+    changed, deleted = list(changed), list(deleted)
+    index.record(changed, deleted)
+    event_bus.publish("goals", {
+        "revision": index.revision,
+        "goals": [_project(index.by_id[gid]) for gid in changed if gid in index.by_id],
+        "deleted": deleted,
+    }, user=index.user)
 
 
 def _coerce_number(value: Union[str, int, float, None]) -> Optional[float]:
@@ -71,21 +237,215 @@ def _recompute_progress(goal: Dict) -> None:
             goal["status"] = "completed"
 
 
+def _summarise_history(goal: Dict) -> Dict:
+    """
+    Goals written before history moved to goal_history still carry an inline list.
+    Present them with the same history_count/last_history shape as migrated goals.
+    """
+    legacy = goal.get("history")
+    if not isinstance(legacy, list):
+        return goal
+    summary = {k: v for k, v in goal.items() if k != "history"}
+    summary["history_count"] = len(legacy)
+    summary["last_history"] = legacy[-1] if legacy else None
+    return summary
+
+
+def _migrate_history(index: _GoalIndex, goal: Dict) -> bool:
+    """
+    Move an inline legacy history list into segment storage. Returns True when the goal changed.
+    """
+    legacy = goal.pop("history", None)
+    if not isinstance(legacy, list):
+        goal.setdefault("history_count", 0)
+        goal.setdefault("last_history", None)
+        return legacy is not None
+    goal_history.append_entries(index.history_dir, goal["id"], legacy, len(legacy))
+    goal["history_count"] = len(legacy)
+    goal["last_history"] = legacy[-1] if legacy else None
+    return True
+
+
+def _project(goal: Dict, fields: Optional[Iterable[str]] = None) -> Dict:
+    summary = _summarise_history(goal)
+    if not fields:
+        return dict(summary)
+    projected = {"id": summary.get("id")}
+    for field in fields:
+        if field in summary:
+            projected[field] = summary[field]
+    return projected
+
+
 def list_goals(status: Optional[str] = None) -> List[Dict]:
-    with _LOCK:
-        goals = _read_goals()
+    with _store() as index:
+        goals = _read_goals(index)
     if status:
         status_lower = status.lower()
         goals = [g for g in goals if g.get("status", "").lower() == status_lower]
-    return goals
+    return [_project(g) for g in goals]
 
 
 def get_goal(goal_id: str) -> Optional[Dict]:
-    with _LOCK:
-        goals = _read_goals()
-    for goal in goals:
-        if goal.get("id") == goal_id:
-            return goal
+    with _store() as index:
+        index.load()
+        goal = index.by_id.get(goal_id)
+    return _project(goal) if goal else None
+
+
+def store_revision() -> int:
+    """
+    Monotonically increasing revision of the goal store, persisted across restarts.
+    """
+    with _store() as index:
+        index.load()
+        return index.revision
+
+
+def changes_since(since: int) -> Dict:
+    """
+    Goal ids upserted or deleted after revision `since`. When `since` is older than the
+    retained change log, returns reset=True and the caller should refetch the full list.
+    """
+    with _store() as index:
+        index.load()
+        revision = index.revision
+        if since < index.floor or since > revision:
+            return {"revision": revision, "reset": True, "changed": [], "deleted": []}
+        latest: Dict[str, str] = {}
+        for change in index.changes:
+            if change["rev"] > since:
+                latest[change["id"]] = change["op"]
+    return {
+        "revision": revision,
+        "reset": False,
+        "changed": [gid for gid, op in latest.items() if op == "upsert"],
+        "deleted": [gid for gid, op in latest.items() if op == "delete"],
+    }
+
+
+def _range_ids(index: _GoalIndex, key: str, low=None, high=None, high_inclusive: bool = True) -> set:
+    # [low, high] (or [low, high) when not high_inclusive) range over the sorted index for key.
+    keys, _, ordered, _ = index.order(key)
+    start = bisect.bisect_left(keys, low) if low is not None else 0
+    if high is None:
+        stop = len(keys)
+    else:
+        stop = bisect.bisect_right(keys, high) if high_inclusive else bisect.bisect_left(keys, high)
+    return {g.get("id") for g in ordered[start:stop]}
+
+
+def _encode_cursor(goal: Dict, sort_key: str) -> str:
+    raw = json.dumps([goal.get(sort_key), goal.get("id") or ""], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple:
+    try:
+        value, goal_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid goals cursor.")
+    if not isinstance(goal_id, str):
+        raise ValueError("Invalid goals cursor.")
+    return value, goal_id
+
+
+def _resume_at(index: _GoalIndex, sort_key: str, descending: bool, cursor: str) -> int:
+    """
+    Position in the ordered goals (present ones, then missing ones) just past the cursor's
+    (sort value, id). Found by bisect, so it holds when goals were added or deleted since.
+    """
+    value, goal_id = _decode_cursor(cursor)
+    _, pairs, present, missing = index.order(sort_key)
+    if value is None:
+        return len(present) + bisect.bisect_right([g.get("id") or "" for g in missing], goal_id)
+    try:
+        if descending:
+            return len(present) - bisect.bisect_left(pairs, (value, goal_id))
+        return bisect.bisect_right(pairs, (value, goal_id))
+    except TypeError:
+        # value of a different type than this sort key's (e.g. a cursor from another sort)
+        raise ValueError("Invalid goals cursor.")
+
+
+def query_goals(
+    *,
+    status: Optional[str] = None,
+    fields: Optional[Iterable[str]] = None,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    due_before: Optional[str] = None,
+    due_after: Optional[str] = None,
+    progress_min: Optional[int] = None,
+    progress_max: Optional[int] = None,
+) -> Dict:
+    """
+    Filtered, sorted and paginated view over the goal index.
+    Goals missing the sort key always come last; ties are broken by id. The cursor is an
+    opaque token for the last goal returned, so pages neither skip nor repeat goals when
+    others are added or deleted in between. due_before is exclusive, due_after inclusive.
+    """
+    sort_key = sort or "created_at"
+    if sort_key not in SORT_KEYS:
+        raise ValueError(f"Cannot sort by '{sort}'. Use one of: {', '.join(SORT_KEYS)}.")
+    if fields:
+        fields = [f for f in fields if f]
+        unknown = [f for f in fields if f not in GOAL_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown goal field(s): {', '.join(unknown)}.")
+    if limit is not None:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    with _store() as index:
+        index.load()
+        _, _, present, missing = index.order(sort_key)
+        ordered = list(reversed(present)) + missing if descending else present + missing
+        start = _resume_at(index, sort_key, descending, cursor) if cursor else 0
+
+        allowed = None
+        if due_before is not None or due_after is not None:
+            allowed = _range_ids(index, "target_date", due_after, due_before, high_inclusive=False)
+        if progress_min is not None or progress_max is not None:
+            progress_ids = _range_ids(index, "progress", progress_min, progress_max)
+            allowed = progress_ids if allowed is None else allowed & progress_ids
+
+    status_lower = status.lower() if status else None
+    matches = [
+        (pos, g) for pos, g in enumerate(ordered)
+        if (allowed is None or g.get("id") in allowed)
+        and (status_lower is None or (g.get("status") or "").lower() == status_lower)
+    ]
+    first = bisect.bisect_left(matches, start, key=lambda m: m[0])
+    rest = matches[first:]
+    page = [g for _, g in (rest[:limit] if limit is not None else rest)]
+    return {
+        "goals": [_project(g, fields) for g in page],
+        "next_cursor": _encode_cursor(page[-1], sort_key) if page and len(page) < len(rest) else None,
+        "total": len(matches),
+    }
+
+
+def list_goal_history(goal_id: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> Optional[Dict]:
+    """
+    Page through a goal's history, newest first. Returns None when the goal does not exist.
+    """
+    with _store() as index:
+        goals = _read_goals(index)
+        for idx, goal in enumerate(goals):
+            if goal.get("id") != goal_id:
+                continue
+            if isinstance(goal.get("history"), list):
+                goal = dict(goal)
+                _migrate_history(index, goal)
+                goals[idx] = goal
+                _write_goals(index, goals, changed=[goal_id])
+            page = goal_history.read_page(
+                index.history_dir, goal_id, cursor=cursor, limit=limit or goal_history.DEFAULT_PAGE_SIZE
+            )
+            page["total"] = goal.get("history_count", 0)
+            return page
     return None
 
 
@@ -128,7 +488,8 @@ def create_goal(
         "status": status,
         "created_at": now,
         "updated_at": now,
-        "history": [],
+        "history_count": 0,
+        "last_history": None,
         "target_value": target_value_num,
         "target_unit": (target_unit or "").strip() or None,
         "target_period": (target_period or "").strip() or None,
@@ -137,10 +498,10 @@ def create_goal(
 
     _recompute_progress(goal)
 
-    with _LOCK:
-        goals = _read_goals()
+    with _store() as index:
+        goals = _read_goals(index)
         goals.append(goal)
-        _write_goals(goals)
+        _write_goals(index, goals, changed=[goal["id"]])
 
     return goal
 
@@ -160,12 +521,13 @@ def update_goal(
     note: Optional[str] = None,
 ) -> Dict:
     allowed_status = {"active", "completed", "archived"}
-    with _LOCK:
-        goals = _read_goals()
+    with _store() as index:
+        goals = _read_goals(index)
         for idx, goal in enumerate(goals):
             if goal.get("id") != goal_id:
                 continue
 
+            goal = dict(goal)
             modified = False
             if title is not None and title.strip() and title.strip() != goal.get("title"):
                 goal["title"] = title.strip()
@@ -224,12 +586,15 @@ def update_goal(
                     goal["status"] = status_lower
                     modified = True
 
+            migrated = _migrate_history(index, goal)
             if note:
                 entry = {
                     "timestamp": datetime.now(timezone.utc).isoformat(),
                     "note": note.strip(),
                 }
-                goal.setdefault("history", []).append(entry)
+                goal["history_count"] = goal.get("history_count", 0) + 1
+                goal["last_history"] = entry
+                goal_history.append_entries(index.history_dir, goal_id, [entry], goal["history_count"])
                 modified = True
 
             if modified:
@@ -237,20 +602,22 @@ def update_goal(
                     _recompute_progress(goal)
                 goal["updated_at"] = datetime.now(timezone.utc).isoformat()
                 goals[idx] = goal
-                _write_goals(goals)
+                _write_goals(index, goals, changed=[goal_id])
+            elif migrated:
+                # persist the migrated copy, or the inline history is appended again next time
+                goals[idx] = goal
+                _write_goals(index, goals, changed=[goal_id])
             return goal
 
     raise ValueError(f"Goal with id '{goal_id}' not found.")
 
 
 def delete_goal(goal_id: str) -> bool:
-    with _LOCK:
-        goals = _read_goals()
+    with _store() as index:
+        goals = _read_goals(index)
         new_goals = [g for g in goals if g.get("id") != goal_id]
         if len(new_goals) == len(goals):
             return False
-        _write_goals(new_goals)
+        _write_goals(index, new_goals, deleted=[goal_id])
+        goal_history.delete_history(index.history_dir, goal_id)
     return True
-
-
-_ensure_file()
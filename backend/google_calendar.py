@@ -1,62 +1,250 @@
 from __future__ import annotations
 import os
-from typing import Optional
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Optional
 
-from zoneinfo import ZoneInfo
+from typing import List, Dict, Tuple
 
-from typing import List, Dict
+import calendar_sync
+import event_bus
+import recurrence
+import tenancy
+import timeutils
 
-DEFAULT_TZ = os.getenv("USER_TIMEZONE", "UTC")
+# the Google client libraries are imported where they're first needed; together they cost
+# a noticeable share of startup and most requests never talk to Google
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
+# Expand recurring series locally instead of asking Google for every instance.
+EXPAND_RECURRING_LOCALLY = os.getenv("GOOGLE_EXPAND_RECURRING_LOCALLY", "1").lower() in ("1", "true", "yes")
+# Google's recommended maximum number of calls per batch request.
+BATCH_LIMIT = 50
+
 TOKEN_PATH = "token.json"
+SYNC_PATH = "calendar_sync.json"
+# Per-user credential managers (and their cached service objects) kept in memory.
+CREDENTIAL_CACHE_SIZE = int(os.getenv("GOOGLE_CREDENTIAL_CACHE_SIZE", "256"))
+
+def _publish_event_change(action: str, event: Dict) -> None:
+    _event_store().mark_stale()
+    event_bus.publish("calendar", {
+        "action": action,
+        "id": event.get("id"),
+        "summary": event.get("summary"),
+        "start": (event.get("start") or {}).get("dateTime") or (event.get("start") or {}).get("date"),
+        "end": (event.get("end") or {}).get("dateTime") or (event.get("end") or {}).get("date"),
+        # earliest override, so reminders.py honours reminders set on the event
+        "reminder_minutes": max(
+            (o.get("minutes") or 0 for o in ((event.get("reminders") or {}).get("overrides") or [])), default=None
+        ),
+    })
+
+
+def _token_path(user: str) -> str:
+    # the default user keeps the legacy single-tenant token.json
+    if user == tenancy.DEFAULT_USER:
+        return TOKEN_PATH
+    return os.path.join(tenancy.user_dir(user), "token.json")
 
-def load_creds() -> Optional[Credentials]:
-    if os.path.exists(TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+
+def load_creds(token_path: Optional[str] = None) -> Optional[Credentials]:
+    token_path = token_path or _token_path(tenancy.current_user())
+    if os.path.exists(token_path):
+        from google.oauth2.credentials import Credentials
+        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
         return creds
     return None
 
 def save_creds(creds: Credentials) -> None:
-    with open(TOKEN_PATH, "w") as f:
-        f.write(creds.to_json())
+    manager = _manager()
+    manager.write(creds)
+    manager.set(creds)
 
 
-# Returns calendar service object that lets you interact with Google Calendar API
-def get_calendar_service():
-    creds = load_creds()
-    if not creds:
-        raise RuntimeError("Not connected to Google yet because no token.json file found.")
-
-    if not creds.valid:
-        if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            save_creds(creds)
-        else:
-            raise RuntimeError("Stored credentials are invalid; please reconnect Google.")
+def clear_creds() -> None:
+    manager = _manager()
+    if os.path.exists(manager.token_path):
+        os.remove(manager.token_path)
+    manager.set(None)
+    _event_store().clear()
 
-    return build("calendar", "v3", credentials=creds)
 
-# function to check if app is connected to Google Calendar
-def is_connected() -> bool:
-    creds = load_creds()
-    if not creds:
-        return False
-    if creds.valid:
-        return True
-    if creds.expired and creds.refresh_token:
+# How often the background thread checks token.json and the expiry clock.
+TOKEN_WATCH_SECONDS = float(os.getenv("GOOGLE_TOKEN_WATCH_SECONDS", "5"))
+# Refresh this long before the access token expires so requests never wait on it.
+TOKEN_REFRESH_MARGIN = timedelta(seconds=int(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN", "300")))
+
+
+class _CredentialManager:
+    """
+    Holds one user's Google credentials in memory. A shared daemon thread watches the token file
+    for external changes and refreshes the access token shortly before it expires, so is_connected() is a
+    flag lookup and request threads only refresh (single-flight) if the background one fell behind.
+    """
+
+    def __init__(self, token_path: str) -> None:
+        self.token_path = token_path
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._creds: Optional[Credentials] = None
+        self._stamp: Optional[tuple] = None
+        self._connected = False
+        self._loaded = False
+        self._version = 0
+        self._local = threading.local()
+
+    def _file_stamp(self) -> Optional[tuple]:
         try:
-            creds.refresh(Request())
-            save_creds(creds)
-            return True
+            st = os.stat(self.token_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _apply(self, creds: Optional[Credentials], stamp: Optional[tuple]) -> None:
+        with self._lock:
+            self._creds = creds
+            self._stamp = stamp
+            self._connected = bool(creds and (creds.valid or creds.refresh_token))
+            self._loaded = True
+            self._version += 1
+
+    def set(self, creds: Optional[Credentials]) -> None:
+        self._apply(creds, self._file_stamp())
+        _ensure_watcher()
+
+    def write(self, creds: Credentials) -> None:
+        os.makedirs(os.path.dirname(self.token_path) or ".", exist_ok=True)
+        with open(self.token_path, "w") as f:
+            f.write(creds.to_json())
+
+    def _reload(self) -> None:
+        stamp = self._file_stamp()
+        try:
+            creds = load_creds(self.token_path) if stamp else None
         except Exception:
+            creds = None
+        self._apply(creds, stamp)
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            with self._refresh_lock:
+                if not self._loaded:
+                    self._reload()
+        _ensure_watcher()
+
+    def _needs_refresh(self, creds: Credentials) -> bool:
+        if not creds.refresh_token:
             return False
-    return False
+        if not creds.valid:
+            return True
+        # google-auth stores expiry as naive UTC
+        return creds.expiry is not None and creds.expiry - TOKEN_REFRESH_MARGIN <= datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def _refresh(self, stale: Credentials) -> Optional[Credentials]:
+        with self._refresh_lock:
+            current = self._creds
+            # refresh() updates the shared object in place, so identity can't tell us whether
+            # another thread already refreshed while we waited; its freshness can
+            if current is not None and current.valid and not self._needs_refresh(current):
+                return current
+            from google.auth.transport.requests import Request
+            try:
+                stale.refresh(Request())
+            except Exception:
+                with self._lock:
+                    self._connected = False
+                return None
+            self.write(stale)
+            self._apply(stale, self._file_stamp())
+            return stale
+
+    def tick(self) -> None:
+        if self._file_stamp() != self._stamp:
+            self._reload()
+        creds = self._creds
+        if creds is not None and self._needs_refresh(creds):
+            self._refresh(creds)
+
+    def is_connected(self) -> bool:
+        self._ensure_loaded()
+        return self._connected
+
+    def credentials(self) -> Credentials:
+        self._ensure_loaded()
+        creds = self._creds
+        if not creds:
+            raise RuntimeError("Not connected to Google yet because no token.json file found.")
+        if not creds.valid:
+            if creds.refresh_token:
+                creds = self._refresh(creds)
+            if not creds or not creds.valid:
+                raise RuntimeError("Stored credentials are invalid; please reconnect Google.")
+        return creds
+
+    def service(self):
+        # httplib2 transports are not thread-safe, so cache one service object per thread
+        creds = self.credentials()
+        cached = getattr(self._local, "service", None)
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
+        from googleapiclient.discovery import build
+        service = build("calendar", "v3", credentials=creds, cache_discovery=False)
+        self._local.service = (self._version, service)
+        return service
+
+
+_MANAGERS: "tenancy.LRUCache[_CredentialManager]" = tenancy.LRUCache(CREDENTIAL_CACHE_SIZE)
+_WATCHER: Optional[threading.Thread] = None
+_WATCHER_LOCK = threading.Lock()
+
+
+_STORES: "tenancy.LRUCache[calendar_sync.EventStore]" = tenancy.LRUCache(CREDENTIAL_CACHE_SIZE)
+
+
+def _event_store() -> calendar_sync.EventStore:
+    user = tenancy.current_user()
+    # the default user keeps its copy beside the legacy token.json
+    path = SYNC_PATH if user == tenancy.DEFAULT_USER else os.path.join(tenancy.user_dir(user), SYNC_PATH)
+    return _STORES.get_or_create(path, lambda: calendar_sync.EventStore(path))
+
+
+def _manager() -> _CredentialManager:
+    token_path = _token_path(tenancy.current_user())
+    return _MANAGERS.get_or_create(token_path, lambda: _CredentialManager(token_path))
+
+
+def _watch() -> None:
+    # one thread services every hot user instead of a thread per user
+    while True:
+        time.sleep(TOKEN_WATCH_SECONDS)
+        for manager in _MANAGERS.values():
+            try:
+                manager.tick()
+            except Exception as e:
+                print(f"Credential watcher error: {e}")
+
+
+def _ensure_watcher() -> None:
+    global _WATCHER
+    if _WATCHER is None or not _WATCHER.is_alive():
+        with _WATCHER_LOCK:
+            if _WATCHER is None or not _WATCHER.is_alive():
+                _WATCHER = threading.Thread(target=_watch, name="google-creds", daemon=True)
+                _WATCHER.start()
+
+
+# Returns calendar service object that lets you interact with Google Calendar API
+def get_calendar_service():
+    return _manager().service()
+
+# function to check if app is connected to Google Calendar
+def is_connected() -> bool:
+    return _manager().is_connected()
 
 # function to create event for Google Calendar
 # function to create event for Google Calendar
@@ -69,27 +257,38 @@ def create_calendar_event(
     attendees=None,      # type = list[str] emails
     recurrence=None,     # type = list[str]
     reminders=None,      # type = list[{"method": str, "minutes": int}]
-    DEFAULT_TZ="Australia/Sydney",
+    time_zone=None,      # IANA name; defaults to the request's zone
 ):
     service = get_calendar_service()
+    event = _event_body(
+        summary, description, start_time, end_time,
+        location=location, attendees=attendees, recurrence=recurrence, reminders=reminders, time_zone=time_zone,
+    )
+    created_event = service.events().insert(calendarId="primary", body=event).execute()
+    print("Created event:", created_event.get("htmlLink"))
+    _publish_event_change("created", created_event)
+    return created_event
+
 
-    # ensure timezone on datetimes
-    if start_time.tzinfo is None:
-        start_time = start_time.replace(tzinfo=ZoneInfo(DEFAULT_TZ))
-    if end_time.tzinfo is None:
-        end_time = end_time.replace(tzinfo=ZoneInfo(DEFAULT_TZ))
+def _event_body(
+    summary,
+    description,
+    start_time,
+    end_time,
+    location=None,
+    attendees=None,
+    recurrence=None,
+    reminders=None,
+    time_zone=None,
+    goal_id=None,
+) -> Dict:
+    time_zone = time_zone or timeutils.current_zone_name()
 
     event = {
         "summary": summary,
         "description": description or "",
-        "start": {
-            "dateTime": start_time.isoformat(),
-            "timeZone": str(start_time.tzinfo) if start_time.tzinfo else DEFAULT_TZ,
-        },
-        "end": {
-            "dateTime": end_time.isoformat(),
-            "timeZone": str(end_time.tzinfo) if end_time.tzinfo else DEFAULT_TZ,
-        },
+        "start": _event_time(start_time, time_zone),
+        "end": _event_time(end_time, time_zone),
     }
 
     if location:
@@ -112,9 +311,51 @@ def create_calendar_event(
         if cleaned:
             event["reminders"] = {"useDefault": False, "overrides": cleaned}
 
-    created_event = service.events().insert(calendarId="primary", body=event).execute()
-    print("Created event:", created_event.get("htmlLink"))
-    return created_event
+    if goal_id:
+        event["extendedProperties"] = {"private": {"goal_id": goal_id}}
+
+    return event
+
+
+# inserts many events in batched HTTP round trips; specs use create_calendar_event's argument names
+def create_calendar_events(specs: List[Dict]) -> Tuple[List[Dict], List[str]]:
+    service = get_calendar_service()
+    created: Dict[str, Dict] = {}
+    errors: Dict[str, str] = {}
+
+    def _done(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = str(exception)
+        else:
+            created[request_id] = response
+
+    for i in range(0, len(specs), BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=_done)
+        for j, spec in enumerate(specs[i:i + BATCH_LIMIT], start=i):
+            body = _event_body(
+                spec["summary"], spec.get("description"), spec["start_time"], spec["end_time"],
+                location=spec.get("location"), attendees=spec.get("attendees"), recurrence=spec.get("recurrence"),
+                reminders=spec.get("reminders"), time_zone=spec.get("time_zone"), goal_id=spec.get("goal_id"),
+            )
+            batch.add(service.events().insert(calendarId="primary", body=body), request_id=str(j))
+        batch.execute()
+
+    ordered = [created[k] for k in sorted(created, key=int)]
+    for event in ordered:
+        _publish_event_change("created", event)
+    return ordered, [errors[k] for k in sorted(errors, key=int)]
+
+
+# naive datetimes are wall-clock times in time_zone; offset-only datetimes keep their instant
+# but are labelled with the IANA zone so Google expands recurrences correctly
+def _event_time(value: datetime, time_zone: str) -> Dict:
+    zone = timeutils.zone_profile(time_zone)
+    if value.tzinfo is None and zone.tz is not None:
+        value = value.replace(tzinfo=zone.tz)
+    return {
+        "dateTime": value.isoformat(),
+        "timeZone": getattr(value.tzinfo, "key", None) or zone.name,
+    }
 
 
 # function to get event details from Google Calendar by event_id
@@ -123,7 +364,22 @@ def get_event(event_id: str):
     return service.events().get(calendarId="primary", eventId=event_id).execute()
 
 
-def find_events(time_min, time_max, max_results: int = 50):
+def find_events(time_min, time_max, max_results: int = 50, expand_locally: Optional[bool] = None):
+    """
+    Events overlapping [time_min, time_max) in start order, one item per occurrence.
+    By default they come from the user's synced copy of the calendar (calendar_sync.py), with
+    recurring series kept as masters and expanded here (recurrence.py), so a quiet calendar
+    costs one incremental sync instead of re-reading every series; rules the expander does not
+    support, and calendars too big to sync, fall back to Google's singleEvents expansion.
+    """
+    expand_locally = EXPAND_RECURRING_LOCALLY if expand_locally is None else expand_locally
+    if expand_locally:
+        try:
+            store = _event_store()
+            store.sync(get_calendar_service())
+            return recurrence.expand_events(store.events(), time_min, time_max, limit=max_results)
+        except (recurrence.UnsupportedRule, calendar_sync.SyncTooLarge):
+            pass
     service = get_calendar_service()
     r = service.events().list(
         calendarId="primary",
@@ -135,30 +391,138 @@ def find_events(time_min, time_max, max_results: int = 50):
     ).execute()
     return r.get("items", [])
 
-def delete_calendar_event(event_id):
+
+# busy windows per calendar from the freeBusy API, for checks across calendars that are not listed event by event
+def free_busy(time_min, time_max, calendar_ids=None) -> Dict[str, List[tuple]]:
     service = get_calendar_service()
-    service.events().delete(calendarId="primary", eventId=event_id).execute()
-    return True
+    ids = [cid for cid in (calendar_ids or ["primary"]) if cid]
+    body = {
+        "timeMin": time_min.isoformat(),
+        "timeMax": time_max.isoformat(),
+        "timeZone": timeutils.current_zone_name(),
+        "items": [{"id": cid} for cid in ids],
+    }
+    r = service.freebusy().query(body=body).execute()
+    busy = {}
+    for cid, info in (r.get("calendars") or {}).items():
+        if info.get("errors"):
+            continue
+        busy[cid] = [
+            (timeutils.parse_iso(b["start"]), timeutils.parse_iso(b["end"]))
+            for b in info.get("busy") or []
+            if b.get("start") and b.get("end")
+        ]
+    return busy
+
+# moves several events in one batched HTTP round trip; changes are {"id", "start", "end"} with datetimes
+def reschedule_events(changes: List[Dict]) -> Dict[str, str]:
+    service = get_calendar_service()
+    time_zone = timeutils.current_zone_name()
+    errors: Dict[str, str] = {}
+    updated: List[Dict] = []
+
+    def _done(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = str(exception)
+        else:
+            updated.append(response)
+
+    for i in range(0, len(changes), BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=_done)
+        for change in changes[i:i + BATCH_LIMIT]:
+            body = {"start": _event_time(change["start"], time_zone), "end": _event_time(change["end"], time_zone)}
+            batch.add(service.events().patch(calendarId="primary", eventId=change["id"], body=body), request_id=change["id"])
+        batch.execute()
+
+    for event in updated:
+        _publish_event_change("updated", event)
+    return errors
+
+
+# runs (request_id, request) pairs in batches of BATCH_LIMIT; returns responses and errors by id
+def _run_batch(service, requests: List[Tuple[str, object]]) -> Tuple[Dict[str, Dict], Dict[str, Exception]]:
+    responses: Dict[str, Dict] = {}
+    errors: Dict[str, Exception] = {}
+
+    def _done(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = exception
+        else:
+            responses[request_id] = response or {}
+
+    # BatchHttpRequest.add raises on a repeated request_id; the first request for an id wins
+    first: Dict[str, object] = {}
+    for request_id, req in requests:
+        first.setdefault(request_id, req)
+    unique = list(first.items())
+    for i in range(0, len(unique), BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=_done)
+        for request_id, req in unique[i:i + BATCH_LIMIT]:
+            batch.add(req, request_id=request_id)
+        batch.execute()
+    return responses, errors
 
-def update_calendar_event(event_id, summary=None, description=None, location=None, start_time=None, end_time=None):
+
+def _conditional(req, etag: Optional[str]):
+    # Google answers 412 instead of applying the write if the event changed since etag was read
+    if etag:
+        req.headers["If-Match"] = etag
+    return req
+
+
+def _status(exc: Exception) -> Optional[int]:
+    from googleapiclient.errors import HttpError
+    return getattr(getattr(exc, "resp", None), "status", None) if isinstance(exc, HttpError) else None
+
+
+def _describe_error(exc: Exception) -> str:
+    if _status(exc) == 412:
+        return "changed since the preview"
+    return str(exc)
+
+
+# deletes previewed events ({"id", "etag"}) in batched round trips without re-reading them;
+# returns the deleted ids and an error message per id that was left alone
+def delete_calendar_events(items: List[Dict]) -> Tuple[List[str], Dict[str, str]]:
     service = get_calendar_service()
-    event = service.events().get(calendarId="primary", eventId=event_id).execute()
+    requests = [
+        (item["id"], _conditional(service.events().delete(calendarId="primary", eventId=item["id"]), item.get("etag")))
+        for item in items
+    ]
+    responses, failures = _run_batch(service, requests)
+    deleted = list(responses)
+    errors: Dict[str, str] = {}
+    for event_id, exc in failures.items():
+        if _status(exc) == 410:
+            deleted.append(event_id)  # already gone
+        else:
+            errors[event_id] = _describe_error(exc)
+    for event_id in deleted:
+        _publish_event_change("deleted", {"id": event_id})
+    return deleted, errors
+
 
+# patches previewed events ({"id", "etag"}) with the same field changes in batched round trips
+def patch_calendar_events(items: List[Dict], summary=None, description=None, location=None, start_time=None, end_time=None) -> Tuple[List[Dict], Dict[str, str]]:
+    service = get_calendar_service()
+    time_zone = timeutils.current_zone_name()
+    body: Dict = {}
     if summary:
-        event["summary"] = summary
+        body["summary"] = summary
     if description:
-        event["description"] = description
+        body["description"] = description
     if location:
-        event["location"] = location
+        body["location"] = location
     if start_time:
-        if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=ZoneInfo(DEFAULT_TZ))
-        event["start"]["dateTime"] = start_time.isoformat()
+        body["start"] = _event_time(start_time, time_zone)
     if end_time:
-        if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=ZoneInfo(DEFAULT_TZ))
-        event["end"]["dateTime"] = end_time.isoformat()
-
-    updated_event = service.events().update(calendarId="primary", eventId=event_id, body=event).execute()
-    print("Updated event:", updated_event.get("htmlLink"))
-    return updated_event
+        body["end"] = _event_time(end_time, time_zone)
+    requests = [
+        (item["id"], _conditional(service.events().patch(calendarId="primary", eventId=item["id"], body=body), item.get("etag")))
+        for item in items
+    ]
+    responses, failures = _run_batch(service, requests)
+    updated = [responses[item["id"]] for item in items if item["id"] in responses]
+    for event in updated:
+        _publish_event_change("updated", event)
+    return updated, {event_id: _describe_error(exc) for event_id, exc in failures.items()}
@@ -0,0 +1,167 @@
+import json
+import os
+import secrets
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import event_bus
+import jobs
+import pending_actions
+import tenancy
+import timeutils
+from google_calendar import SCOPES, clear_creds, save_creds
+
+GOOGLE_CLIENT_SECRETS_FILE = os.getenv("GOOGLE_CLIENT_SECRETS_FILE", "credentials.json")
+# Comma-separated callback URLs, one per deployment; the one on the host serving the login is used.
+# Unset: the redirect_uris registered in the client secrets file, then the local dev server.
+GOOGLE_REDIRECT_URIS = [u.strip() for u in os.getenv("GOOGLE_OAUTH_REDIRECT_URIS", "").split(",") if u.strip()]
+DEFAULT_REDIRECT_URI = "http://localhost:5000/api/google/oauth2callback"
+# Token exchange is one HTTP call to Google; a second attempt covers a dropped connection.
+EXCHANGE_ATTEMPTS = 2
+# Logins in progress, one per user, for as long as a user may take on Google's consent screen.
+LOGIN_TTL_SECONDS = 15 * 60
+LOGIN_MAX_PENDING = 5000
+
+
+class OAuthError(ValueError):
+    pass
+
+
+# kept apart from the chat confirmations, so an abandoned login doesn't count as a pending
+# chat action (which turns off the chat response cache)
+_logins = pending_actions.PendingStore(maxsize=LOGIN_MAX_PENDING, ttl=LOGIN_TTL_SECONDS)
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=4)
+def _load_config(path: str, stamp: Optional[Tuple[int, int]]) -> Dict:
+    if stamp is None:
+        raise OAuthError(f"Google client secrets not found at {path}.")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def client_config() -> Dict:
+    """
+    Parsed client secrets, read once and re-read only if the file changes (a stat per call).
+    """
+    return _load_config(GOOGLE_CLIENT_SECRETS_FILE, _stamp(GOOGLE_CLIENT_SECRETS_FILE))
+
+
+def redirect_uris() -> List[str]:
+    if GOOGLE_REDIRECT_URIS:
+        return GOOGLE_REDIRECT_URIS
+    try:
+        config = client_config()
+    except OAuthError:
+        return [DEFAULT_REDIRECT_URI]
+    registered = (config.get("web") or config.get("installed") or {}).get("redirect_uris") or []
+    return registered or [DEFAULT_REDIRECT_URI]
+
+
+def redirect_uri_for(request_root: str) -> str:
+    # request_root is the URL the login was served from, e.g. "https://dolma.example.com/"
+    origin = urlparse(request_root)
+    for uri in redirect_uris():
+        parsed = urlparse(uri)
+        if (parsed.scheme, parsed.netloc) == (origin.scheme, origin.netloc):
+            return uri
+    return redirect_uris()[0]
+
+
+def _flow(redirect_uri: str, code_verifier: str):
+    # Flow wraps a per-login requests session, so one is built per call; what's shared is the
+    # parsed client config. Imported here to keep google_auth_oauthlib off the startup path.
+    from google_auth_oauthlib.flow import Flow
+    return Flow.from_client_config(
+        client_config(),
+        scopes=SCOPES,
+        redirect_uri=redirect_uri,
+        code_verifier=code_verifier,
+        autogenerate_code_verifier=False,
+    )
+
+
+def begin(request_root: str, return_to: str) -> str:
+    """
+    Starts a login for the current user and returns Google's authorization URL. The state and
+    PKCE verifier stay on the server (_logins); the browser only carries the state.
+    """
+    state = secrets.token_urlsafe(32)
+    verifier = secrets.token_urlsafe(64)
+    redirect_uri = redirect_uri_for(request_root)
+    url, _ = _flow(redirect_uri, verifier).authorization_url(
+        state=state,
+        access_type="offline",
+        include_granted_scopes="true",
+        prompt="consent",
+    )
+    _logins.put("google_oauth", {
+        "state": state,
+        "verifier": verifier,
+        "redirect_uri": redirect_uri,
+        "return_to": return_to,
+    })
+    return url
+
+
+def complete(state: Optional[str], code: Optional[str], error: Optional[str]) -> str:
+    """
+    Checks the callback against the pending login and queues the token exchange, so the browser
+    is redirected without waiting on Google. Returns the frontend URL the login started from.
+    """
+    login = _logins.peek("google_oauth")
+    if not login or not state or not secrets.compare_digest(login["state"], state):
+        raise OAuthError("Missing or expired OAuth state. Try connecting again.")
+    _logins.discard("google_oauth")
+    if error or not code:
+        raise OAuthError(f"Google sign-in was not completed ({error or 'no code returned'}).")
+    jobs.enqueue(
+        "google_oauth.exchange",
+        {
+            "code": code,
+            "verifier": login["verifier"],
+            "redirect_uri": login["redirect_uri"],
+            "zone": timeutils.current_zone_name(),
+        },
+        dedupe_key=_exchange_key(tenancy.current_user()),
+        max_attempts=EXCHANGE_ATTEMPTS,
+    )
+    return login["return_to"]
+
+
+def _exchange_key(user: str) -> str:
+    return f"google-oauth:{user}"
+
+
+# the payload carries the authorization code and PKCE verifier; blanked once the job finishes
+@jobs.handler("google_oauth.exchange", sensitive=True)
+def _exchange(payload: Dict) -> None:
+    flow = _flow(payload["redirect_uri"], payload["verifier"])
+    flow.fetch_token(code=payload["code"])
+    # straight into this user's credential manager: the next request sees a connected,
+    # freshly issued token without reading token.json or refreshing
+    save_creds(flow.credentials)
+    # listeners (reminders) schedule in the zone the login came from
+    token = timeutils.set_zone(payload.get("zone"))
+    try:
+        event_bus.publish("google", {"connected": True})
+    finally:
+        timeutils.reset_zone(token)
+
+
+def connecting(user: Optional[str] = None) -> bool:
+    return jobs.pending(_exchange_key(user or tenancy.current_user()))
+
+
+def disconnect() -> None:
+    clear_creds()
+    event_bus.publish("google", {"connected": False})
@@ -0,0 +1,195 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Response, jsonify, make_response, request
+
+import tenancy
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# How long a completed result is replayed for, and how many are kept across all users.
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_KEYS = max(1, int(os.getenv("IDEMPOTENCY_MAX_KEYS", "5000")))
+# A duplicate that arrives while the first request is still running waits this long for its result.
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT", "30"))
+MAX_KEY_LENGTH = 255
+# response headers worth replaying with the stored body
+_REPLAY_HEADERS = ("Content-Type", "ETag", "Location")
+
+
+class _Record:
+    __slots__ = ("fingerprint", "done", "status", "body", "headers", "expires")
+
+    def __init__(self, fingerprint: str) -> None:
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.status: Optional[int] = None
+        self.body = b""
+        self.headers: Dict[str, str] = {}
+        self.expires = float("inf")
+
+
+class IdempotencyStore:
+    """
+    Results of mutating requests by (user, Idempotency-Key). The first request with a key runs;
+    duplicates that arrive while it is in flight wait for and share its result, later ones get
+    the stored response replayed. Server errors are not stored so the client can retry them.
+    """
+
+    def __init__(self, maxsize: int = IDEMPOTENCY_MAX_KEYS, ttl: float = IDEMPOTENCY_TTL_SECONDS) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._records: "OrderedDict[Tuple[str, str], _Record]" = OrderedDict()
+        self._stats = {"executed": 0, "replayed": 0, "collapsed": 0, "conflicts": 0}
+
+    def claim(self, key: Tuple[str, str], fingerprint: str) -> Tuple[_Record, bool]:
+        """
+        Returns (record, owner). The owner runs the request and must call complete() or abandon().
+        """
+        now = time.monotonic()
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record.done.is_set() and record.expires <= now:
+                del self._records[key]
+                record = None
+            if record is not None:
+                self._records.move_to_end(key)
+                return record, False
+            record = _Record(fingerprint)
+            self._records[key] = record
+            self._evict(now)
+            self._stats["executed"] += 1
+            return record, True
+
+    def peek(self, key: Tuple[str, str]) -> Optional[_Record]:
+        """
+        The completed, unexpired record for key, without claiming it.
+        """
+        with self._lock:
+            record = self._records.get(key)
+            if record is None or not record.done.is_set() or record.expires <= time.monotonic():
+                return None
+            return record
+
+    def _evict(self, now: float) -> None:
+        # expired first, then least recently used completed records; in-flight ones stay
+        for k in [k for k, r in self._records.items() if r.done.is_set() and r.expires <= now]:
+            del self._records[k]
+        for k in list(self._records.keys()):
+            if len(self._records) <= self.maxsize:
+                return
+            if self._records[k].done.is_set():
+                del self._records[k]
+
+    def complete(self, key: Tuple[str, str], record: _Record, resp: Response) -> None:
+        record.status = resp.status_code
+        record.body = resp.get_data()
+        record.headers = {h: resp.headers[h] for h in _REPLAY_HEADERS if h in resp.headers}
+        record.expires = time.monotonic() + self.ttl
+        if resp.status_code >= 500:
+            self.abandon(key, record)
+            return
+        record.done.set()
+
+    def abandon(self, key: Tuple[str, str], record: _Record) -> None:
+        with self._lock:
+            if self._records.get(key) is record:
+                del self._records[key]
+        record.done.set()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"keys": len(self._records), "maxsize": self.maxsize, **self._stats}
+
+
+store = IdempotencyStore()
+
+
+def _fingerprint() -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data(cache=True) or b"")
+    return digest.hexdigest()
+
+
+def _replay(record: _Record) -> Response:
+    resp = Response(record.body, status=record.status)
+    for name, value in record.headers.items():
+        resp.headers[name] = value
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def _request_key() -> Optional[Tuple[str, str]]:
+    raw_key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+    if not raw_key or len(raw_key) > MAX_KEY_LENGTH:
+        return None
+    return tenancy.current_user(), raw_key
+
+
+def stored_response() -> Optional[Response]:
+    """
+    The stored response if this request repeats one that already completed, else None. Lets
+    rate limiting run after the replay check, so a client retrying a request that succeeded is
+    not charged for it again.
+    """
+    key = _request_key()
+    record = store.peek(key) if key else None
+    if record is None or record.status is None or record.fingerprint != _fingerprint():
+        return None
+    store.count("replayed")
+    return _replay(record)
+
+
+def idempotent(view: Callable) -> Callable:
+    """
+    Honour an Idempotency-Key header on a mutating view. Requests without the header run as usual.
+    Reusing a key for a different request body is rejected with 422.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        raw_key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+        if not raw_key:
+            return view(*args, **kwargs)
+        if len(raw_key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters."}), 400
+
+        key = (tenancy.current_user(), raw_key)
+        fingerprint = _fingerprint()
+        record, owner = store.claim(key, fingerprint)
+        if not owner:
+            if record.fingerprint != fingerprint:
+                store.count("conflicts")
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} was already used for a different request."}), 422
+            in_flight = not record.done.is_set()
+            if not record.done.wait(IDEMPOTENCY_WAIT_SECONDS) or record.status is None or record.status >= 500:
+                resp = jsonify({"error": "The original request is still being processed. Please retry shortly."})
+                resp.status_code = 409
+                resp.headers["Retry-After"] = "1"
+                return resp
+            store.count("collapsed" if in_flight else "replayed")
+            return _replay(record)
+
+        try:
+            resp = make_response(view(*args, **kwargs))
+        except BaseException:
+            store.abandon(key, record)
+            raise
+        store.complete(key, record, resp)
+        return resp
+
+    return wrapper
+
+
+def stats() -> Dict[str, int]:
+    return store.stats()
@@ -0,0 +1,355 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+import tenancy
+
+JOBS_DB = os.getenv("JOBS_DB", os.path.join(os.path.dirname(__file__), "jobs.sqlite3"))
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "2")))
+JOB_MAX_ATTEMPTS = max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "5")))
+# Retry delay is base * 2^(attempt-1) plus up to 25% jitter, capped at the maximum.
+JOB_BACKOFF_BASE_SECONDS = float(os.getenv("JOB_BACKOFF_BASE", "5"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX", "900"))
+# Finished jobs are kept this long for inspection, then purged.
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION", str(7 * 86400)))
+# Longest a worker sleeps before re-checking the queue, even with nothing scheduled.
+POLL_SECONDS = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    user TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    run_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    dedupe_key TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, run_at);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key) WHERE status = 'queued';
+"""
+
+Handler = Callable[[Dict], None]
+
+
+class JobQueue:
+    """
+    Durable background jobs in SQLite with an in-process worker pool. Jobs run at or after
+    run_at as the user that enqueued them; failures retry with exponential backoff until
+    max_attempts, then stay 'failed'. A queued job with a dedupe_key is replaced, not duplicated,
+    when the same key is enqueued again, and can be cancelled by key.
+    Jobs left 'running' by a crash are requeued when the workers start.
+    """
+
+    def __init__(self, path: str = JOBS_DB, workers: int = JOB_WORKERS) -> None:
+        self.path = path
+        self.workers = workers
+        self._handlers: Dict[str, Handler] = {}
+        self._sensitive: Set[str] = set()
+        self._local = threading.local()
+        self._wake = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._started = False
+        self._stopping = False
+        self._init_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._ready = False
+        self._stats_lock = threading.Lock()
+        self._stats = {"succeeded": 0, "retried": 0, "failed": 0, "run_ms": 0.0, "lag_ms": 0.0}
+
+    # --- storage ---
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    conn.executescript(_SCHEMA)
+                    self._ready = True
+        return conn
+
+    def handler(self, kind: str, *, sensitive: bool = False) -> Callable[[Handler], Handler]:
+        """
+        Registers fn as the handler for kind. Payloads of sensitive kinds (secrets, auth codes)
+        are blanked once the job is done, failed or cancelled, instead of being kept until purge.
+        """
+        def register(fn: Handler) -> Handler:
+            self._handlers[kind] = fn
+            if sensitive:
+                self._sensitive.add(kind)
+            return fn
+        return register
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Optional[Dict] = None,
+        *,
+        run_at: Optional[float] = None,
+        delay: float = 0.0,
+        dedupe_key: Optional[str] = None,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        user: Optional[str] = None,
+    ) -> int:
+        """
+        Adds a job (run_at is a UNIX timestamp) and wakes a worker. Returns the job id.
+        """
+        now = time.time()
+        run_at = run_at if run_at is not None else now + delay
+        body = json.dumps(payload or {})
+        user = user or tenancy.current_user()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = None
+            if dedupe_key:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE dedupe_key = ? AND status = 'queued'", (dedupe_key,)
+                ).fetchone()
+            if row is not None:
+                job_id = row["id"]
+                conn.execute(
+                    "UPDATE jobs SET kind = ?, payload = ?, user = ?, run_at = ?, max_attempts = ?, updated_at = ? WHERE id = ?",
+                    (kind, body, user, run_at, max_attempts, now, job_id),
+                )
+            else:
+                job_id = conn.execute(
+                    "INSERT INTO jobs (kind, payload, user, run_at, max_attempts, dedupe_key, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (kind, body, user, run_at, max_attempts, dedupe_key, now, now),
+                ).lastrowid
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._wake:
+            self._wake.notify()
+        return job_id
+
+    def cancel(self, dedupe_key: str) -> bool:
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE dedupe_key = ? AND status = 'queued'",
+            (time.time(), dedupe_key),
+        )
+        return cur.rowcount > 0
+
+    def pending(self, dedupe_key: str) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running') LIMIT 1", (dedupe_key,)
+        ).fetchone()
+        return row is not None
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND run_at <= ? ORDER BY run_at, id LIMIT 1", (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (now, row["id"]),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _next_due(self) -> Optional[float]:
+        row = self._conn().execute("SELECT MIN(run_at) AS due FROM jobs WHERE status = 'queued'").fetchone()
+        return row["due"] if row else None
+
+    # --- execution ---
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(JOB_BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)), JOB_BACKOFF_MAX_SECONDS)
+        return delay * (1 + random.random() * 0.25)
+
+    def run_one(self) -> bool:
+        """
+        Claims and runs a single due job. Returns False when nothing was due.
+        """
+        row = self._claim()
+        if row is None:
+            return False
+        conn = self._conn()
+        started = time.time()
+        attempts = row["attempts"] + 1
+        fn = self._handlers.get(row["kind"])
+        token = tenancy.set_current_user(row["user"])
+        try:
+            if fn is None:
+                raise LookupError(f"no handler registered for job kind '{row['kind']}'")
+            fn(json.loads(row["payload"]))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempts >= row["max_attempts"] or fn is None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', last_error = ?, updated_at = ? WHERE id = ?",
+                    (error, time.time(), row["id"]),
+                )
+                self._count("failed")
+                print(f"job {row['id']} ({row['kind']}) failed permanently: {error}")
+            else:
+                try:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', run_at = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                        (time.time() + self._backoff(attempts), error, time.time(), row["id"]),
+                    )
+                except sqlite3.IntegrityError:
+                    # the same dedupe_key was enqueued again while this ran; the newer job wins
+                    conn.execute(
+                        "UPDATE jobs SET status = 'cancelled', last_error = ?, updated_at = ? WHERE id = ?",
+                        (error, time.time(), row["id"]),
+                    )
+                self._count("retried")
+        else:
+            conn.execute("UPDATE jobs SET status = 'done', updated_at = ? WHERE id = ?", (time.time(), row["id"]))
+            self._count("succeeded")
+        finally:
+            tenancy.reset_current_user(token)
+        if row["kind"] in self._sensitive:
+            conn.execute("UPDATE jobs SET payload = '{}' WHERE id = ? AND status != 'queued'", (row["id"],))
+        with self._stats_lock:
+            self._stats["run_ms"] += (time.time() - started) * 1000.0
+            self._stats["lag_ms"] += max(0.0, started - row["run_at"]) * 1000.0
+        return True
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _worker(self) -> None:
+        last_purge = 0.0
+        while not self._stopping:
+            try:
+                if self.run_one():
+                    continue
+                if time.time() - last_purge > 3600:
+                    self.purge()
+                    last_purge = time.time()
+                due = self._next_due()
+            except sqlite3.Error as e:
+                print("job queue error:", e)
+                due = None
+            timeout = POLL_SECONDS if due is None else min(POLL_SECONDS, max(0.0, due - time.time()))
+            with self._wake:
+                if not self._stopping and timeout > 0:
+                    self._wake.wait(timeout)
+
+    def start(self) -> None:
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._start()
+
+    def _start(self) -> None:
+        self._stopping = False
+        # anything 'running' now was interrupted by a restart; requeue it unless a newer job with
+        # the same dedupe_key is already queued or running
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE status = 'running' AND dedupe_key IS NOT NULL"
+                " AND EXISTS (SELECT 1 FROM jobs AS newer WHERE newer.dedupe_key = jobs.dedupe_key"
+                " AND newer.id > jobs.id AND newer.status IN ('queued', 'running'))",
+                (time.time(),),
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE status = 'running' AND dedupe_key IS NOT NULL"
+                " AND EXISTS (SELECT 1 FROM jobs AS queued WHERE queued.dedupe_key = jobs.dedupe_key AND queued.status = 'queued')",
+                (time.time(),),
+            )
+            conn.execute("UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'", (time.time(),))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        self._started = True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping = True
+        with self._wake:
+            self._wake.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
+        self._started = False
+
+    def purge(self) -> int:
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        cur = self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'cancelled', 'failed') AND updated_at < ?", (cutoff,)
+        )
+        return cur.rowcount
+
+    def stats(self) -> Dict:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        due = self._conn().execute(
+            "SELECT COUNT(*) AS n FROM jobs WHERE status = 'queued' AND run_at <= ?", (time.time(),)
+        ).fetchone()["n"]
+        with self._stats_lock:
+            stats = dict(self._stats)
+        runs = stats["succeeded"] + stats["retried"] + stats["failed"]
+        return {
+            "workers": len(self._threads),
+            "by_status": {r["status"]: r["n"] for r in rows},
+            "due_now": due,
+            "succeeded": stats["succeeded"],
+            "retried": stats["retried"],
+            "failed": stats["failed"],
+            "avg_run_ms": round(stats["run_ms"] / runs, 2) if runs else 0.0,
+            "avg_lag_ms": round(stats["lag_ms"] / runs, 2) if runs else 0.0,
+        }
+
+
+queue = JobQueue()
+
+
+def handler(kind: str, *, sensitive: bool = False) -> Callable[[Handler], Handler]:
+    return queue.handler(kind, sensitive=sensitive)
+
+
+def enqueue(kind: str, payload: Optional[Dict] = None, **options) -> int:
+    return queue.enqueue(kind, payload, **options)
+
+
+def cancel(dedupe_key: str) -> bool:
+    return queue.cancel(dedupe_key)
+
+
+def pending(dedupe_key: str) -> bool:
+    return queue.pending(dedupe_key)
+
+
+def start() -> None:
+    queue.start()
+
+
+def stats() -> Dict:
+    return queue.stats()
@@ -0,0 +1,82 @@
+import os
+import smtplib
+from email.message import EmailMessage
+from typing import Dict
+
+import jobs
+from goals import get_goal
+
+# Outgoing mail. Without SMTP_HOST and NOTIFY_EMAIL_TO, emails are logged and skipped.
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT_SECONDS = 15
+EMAIL_FROM = os.getenv("NOTIFY_EMAIL_FROM") or SMTP_USER or "dolma@localhost"
+# Sessions carry no email address, so notifications go to one configured inbox.
+EMAIL_TO = os.getenv("NOTIFY_EMAIL_TO")
+
+
+def email_enabled() -> bool:
+    return bool(SMTP_HOST and EMAIL_TO)
+
+
+def _send_email(subject: str, body: str) -> None:
+    """
+    Sends over SMTP. Raises on delivery errors so the job queue retries with backoff.
+    """
+    if not email_enabled():
+        print(f"email skipped ({'SMTP_HOST' if not SMTP_HOST else 'NOTIFY_EMAIL_TO'} not set): {subject}")
+        return
+    message = EmailMessage()
+    message["Subject"] = f"DOLMA: {subject.capitalize()}"
+    message["From"] = EMAIL_FROM
+    message["To"] = EMAIL_TO
+    message.set_content(body)
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS) as smtp:
+        if SMTP_STARTTLS:
+            smtp.starttls()
+        if SMTP_USER and SMTP_PASSWORD:
+            smtp.login(SMTP_USER, SMTP_PASSWORD)
+        smtp.send_message(message)
+
+
+@jobs.handler("email.goal_completed")
+def _goal_completed(payload: Dict) -> None:
+    title = payload.get("title") or "Goal"
+    _send_email("GOAL COMPLETED", f"'{title}' is now complete. Fantastic work!")
+
+
+@jobs.handler("email.goal_deleted")
+def _goal_deleted(payload: Dict) -> None:
+    title = payload.get("title") or "Goal"
+    _send_email("GOAL DELETED", f"'{title}' has been removed from your list.")
+
+
+# reminder.* jobs are enqueued by reminders.py when a reminder fires; the outbox and SSE
+# stream already have it by then, these only handle email
+@jobs.handler("reminder.goal_deadline")
+def _goal_deadline(payload: Dict) -> None:
+    goal = get_goal(payload["id"])
+    # the goal may have been finished or re-dated since this was scheduled
+    if not goal or (goal.get("status") or "").lower() == "completed":
+        return
+    if goal.get("target_date") != payload.get("target_date"):
+        return
+    title = goal.get("title") or "Goal"
+    _send_email("GOAL REMINDER", f"'{title}' is due on {goal['target_date']}.")
+
+
+@jobs.handler("reminder.event_start")
+def _event_start(payload: Dict) -> None:
+    summary = payload.get("summary") or "Event"
+    _send_email("EVENT REMINDER", f"'{summary}' starts in {payload.get('minutes')} minutes.")
+
+
+def goal_completed(goal: Dict) -> None:
+    jobs.enqueue("email.goal_completed", {"goal_id": goal.get("id"), "title": goal.get("title")})
+
+
+def goal_deleted(goal: Dict) -> None:
+    jobs.enqueue("email.goal_deleted", {"goal_id": goal.get("id"), "title": goal.get("title")})
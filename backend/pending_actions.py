@@ -0,0 +1,155 @@
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import tenancy
+
+# Previews expire if the user doesn't confirm within this window.
+PENDING_TTL_SECONDS = float(os.getenv("PENDING_ACTION_TTL", "900"))
+PENDING_MAX_ACTIONS = max(1, int(os.getenv("PENDING_ACTION_MAX", "5000")))
+# Approximate memory budget across all pending payloads (JSON-encoded size).
+PENDING_MAX_BYTES = max(1, int(os.getenv("PENDING_ACTION_MAX_BYTES", str(16 * 1024 * 1024))))
+
+
+class _Action:
+    __slots__ = ("id", "user", "kind", "payload", "expires", "size")
+
+    def __init__(self, action_id: str, user: str, kind: str, payload: Any, expires: float, size: int) -> None:
+        self.id = action_id
+        self.user = user
+        self.kind = kind
+        self.payload = payload
+        self.expires = expires
+        self.size = size
+
+
+class PendingStore:
+    """
+    Server-side home for previewed actions awaiting a yes/no, so the cookie session carries
+    nothing. Each action gets a short id; a user has at most one pending action per kind, and a
+    new preview replaces the old one. Bounded by count and encoded size with LRU eviction.
+    """
+
+    def __init__(self, maxsize: int = PENDING_MAX_ACTIONS, max_bytes: int = PENDING_MAX_BYTES, ttl: float = PENDING_TTL_SECONDS) -> None:
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._actions: "OrderedDict[str, _Action]" = OrderedDict()
+        # user -> kind -> id of that user's current action of the kind
+        self._latest: Dict[str, Dict[str, str]] = {}
+        self._bytes = 0
+        self._stats = {"created": 0, "confirmed": 0, "expired": 0, "evicted": 0}
+
+    def put(self, kind: str, payload: Any) -> str:
+        user = tenancy.current_user()
+        size = len(json.dumps(payload, default=str))
+        action_id = secrets.token_urlsafe(6)
+        with self._lock:
+            previous = self._latest.get(user, {}).get(kind)
+            if previous is not None:
+                self._drop(previous)
+            action = _Action(action_id, user, kind, payload, time.monotonic() + self.ttl, size)
+            self._actions[action_id] = action
+            self._latest.setdefault(user, {})[kind] = action_id
+            self._bytes += size
+            self._stats["created"] += 1
+            self._evict()
+        return action_id
+
+    def _drop(self, action_id: str) -> Optional[_Action]:
+        action = self._actions.pop(action_id, None)
+        if action is None:
+            return None
+        self._bytes -= action.size
+        kinds = self._latest.get(action.user)
+        if kinds is not None and kinds.get(action.kind) == action_id:
+            del kinds[action.kind]
+            if not kinds:
+                del self._latest[action.user]
+        return action
+
+    def _evict(self) -> None:
+        while self._actions and (len(self._actions) > self.maxsize or self._bytes > self.max_bytes):
+            oldest = next(iter(self._actions))
+            self._drop(oldest)
+            self._stats["evicted"] += 1
+
+    def _find(self, kind: str, action_id: Optional[str]) -> Optional[_Action]:
+        user = tenancy.current_user()
+        action_id = action_id or self._latest.get(user, {}).get(kind)
+        action = self._actions.get(action_id) if action_id else None
+        if action is None or action.user != user or action.kind != kind:
+            return None
+        if action.expires <= time.monotonic():
+            self._drop(action.id)
+            self._stats["expired"] += 1
+            return None
+        return action
+
+    def take(self, kind: str, action_id: Optional[str] = None) -> Optional[Any]:
+        """
+        Removes and returns the payload of the given (or latest) pending action of this kind.
+        """
+        with self._lock:
+            action = self._find(kind, action_id)
+            if action is None:
+                return None
+            self._drop(action.id)
+            self._stats["confirmed"] += 1
+            return action.payload
+
+    def peek(self, kind: str, action_id: Optional[str] = None) -> Optional[Any]:
+        with self._lock:
+            action = self._find(kind, action_id)
+            if action is None:
+                return None
+            self._actions.move_to_end(action.id)
+            return action.payload
+
+    def discard(self, kind: str) -> None:
+        with self._lock:
+            action_id = self._latest.get(tenancy.current_user(), {}).get(kind)
+            if action_id is not None:
+                self._drop(action_id)
+
+    def has_pending(self) -> bool:
+        user = tenancy.current_user()
+        now = time.monotonic()
+        with self._lock:
+            return any(self._actions[a].expires > now for a in self._latest.get(user, {}).values())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"actions": len(self._actions), "bytes": self._bytes, "maxsize": self.maxsize, **self._stats}
+
+
+store = PendingStore()
+
+
+def put(kind: str, payload: Any) -> str:
+    return store.put(kind, payload)
+
+
+def take(kind: str, action_id: Optional[str] = None) -> Optional[Any]:
+    return store.take(kind, action_id)
+
+
+def peek(kind: str, action_id: Optional[str] = None) -> Optional[Any]:
+    return store.peek(kind, action_id)
+
+
+def discard(kind: str) -> None:
+    store.discard(kind)
+
+
+def has_pending() -> bool:
+    return store.has_pending()
+
+
+def stats() -> Dict[str, int]:
+    return store.stats()
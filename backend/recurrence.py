@@ -0,0 +1,377 @@
+import calendar
+import heapq
+import itertools
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+import timeutils
+
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+SUPPORTED_PARTS = {"FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY", "BYMONTHDAY", "BYMONTH", "WKST"}
+# Rules that cannot match (e.g. 30 February) stop this many years past the window start.
+MAX_YEARS = 100
+
+
+class UnsupportedRule(ValueError):
+    """
+    RRULE uses a part this expander does not implement, or a series' exceptions could not all
+    be listed; callers fall back to letting Google expand the series.
+    """
+
+
+class Rule(NamedTuple):
+    freq: str
+    interval: int
+    count: Optional[int]
+    until: Union[datetime, date, None]
+    by_day: Tuple[Tuple[Optional[int], int], ...]
+    by_month_day: Tuple[int, ...]
+    by_month: Tuple[int, ...]
+    wkst: int
+
+
+def _parse_stamp(value: str, tz: Optional[tzinfo]) -> Union[datetime, date]:
+    # 20251231, 20251231T090000 (wall time in tz) or 20251231T090000Z
+    if "T" not in value:
+        return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    dt = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.replace(tzinfo=tz) if tz else dt
+
+
+@lru_cache(maxsize=1024)
+def parse_rrule(line: str, tz_name: Optional[str] = None) -> Rule:
+    body = line.split(":", 1)[1] if line.upper().startswith("RRULE") else line
+    parts = {}
+    for item in body.split(";"):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            parts[key.strip().upper()] = value.strip().upper()
+    unknown = set(parts) - SUPPORTED_PARTS
+    freq = parts.get("FREQ")
+    if unknown or freq not in ("DAILY", "WEEKLY", "MONTHLY", "YEARLY"):
+        raise UnsupportedRule(f"unsupported recurrence rule: {line}")
+    by_day = []
+    for code in filter(None, parts.get("BYDAY", "").split(",")):
+        ordinal, weekday = code[:-2], code[-2:]
+        if weekday not in WEEKDAY_CODES:
+            raise UnsupportedRule(f"unsupported BYDAY value: {code}")
+        by_day.append((int(ordinal) if ordinal else None, WEEKDAY_CODES.index(weekday)))
+    if any(ordinal is not None for ordinal, _ in by_day) and freq not in ("MONTHLY", "YEARLY"):
+        raise UnsupportedRule(f"ordinal BYDAY needs a monthly or yearly rule: {line}")
+    by_month = tuple(int(m) for m in filter(None, parts.get("BYMONTH", "").split(",")))
+    if freq == "YEARLY" and by_day and not by_month:
+        raise UnsupportedRule(f"yearly BYDAY without BYMONTH is not supported: {line}")
+    tz = timeutils.get_zone(tz_name) if tz_name else None
+    return Rule(
+        freq=freq,
+        interval=max(1, int(parts.get("INTERVAL", "1"))),
+        count=int(parts["COUNT"]) if "COUNT" in parts else None,
+        until=_parse_stamp(parts["UNTIL"], tz) if "UNTIL" in parts else None,
+        by_day=tuple(by_day),
+        by_month_day=tuple(int(d) for d in filter(None, parts.get("BYMONTHDAY", "").split(","))),
+        by_month=by_month,
+        wkst=WEEKDAY_CODES.index(parts.get("WKST", "MO")),
+    )
+
+
+def _add_months(day: date, months: int) -> Tuple[int, int]:
+    index = day.year * 12 + day.month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+def _month_candidates(year: int, month: int, rule: Rule, default_day: int) -> List[date]:
+    days_in_month = calendar.monthrange(year, month)[1]
+    if rule.by_month_day:
+        days = {d if d > 0 else days_in_month + d + 1 for d in rule.by_month_day}
+        days = {d for d in days if 1 <= d <= days_in_month}
+    else:
+        days = None
+    if rule.by_day:
+        matched = set()
+        for ordinal, weekday in rule.by_day:
+            first = (weekday - date(year, month, 1).weekday()) % 7 + 1
+            all_days = list(range(first, days_in_month + 1, 7))
+            if ordinal is None:
+                matched.update(all_days)
+            elif -len(all_days) <= ordinal <= len(all_days) and ordinal != 0:
+                matched.add(all_days[ordinal - 1 if ordinal > 0 else ordinal])
+        days = matched if days is None else days & matched
+    if days is None:
+        days = {default_day} if default_day <= days_in_month else set()
+    return [date(year, month, d) for d in sorted(days)]
+
+
+def _period_candidates(rule: Rule, start: date, period: int) -> List[date]:
+    if rule.freq == "DAILY":
+        day = start + timedelta(days=period * rule.interval)
+        if rule.by_month_day and day.day not in rule.by_month_day and \
+                day.day - calendar.monthrange(day.year, day.month)[1] - 1 not in rule.by_month_day:
+            return []
+        if rule.by_day and day.weekday() not in {wd for _, wd in rule.by_day}:
+            return []
+        candidates = [day]
+    elif rule.freq == "WEEKLY":
+        week_start = start - timedelta(days=(start.weekday() - rule.wkst) % 7) + timedelta(weeks=period * rule.interval)
+        weekdays = sorted({wd for _, wd in rule.by_day} or {start.weekday()}, key=lambda wd: (wd - rule.wkst) % 7)
+        candidates = [week_start + timedelta(days=(wd - rule.wkst) % 7) for wd in weekdays]
+    elif rule.freq == "MONTHLY":
+        year, month = _add_months(start.replace(day=1), period * rule.interval)
+        candidates = _month_candidates(year, month, rule, start.day)
+    else:
+        year = start.year + period * rule.interval
+        if year > 9999:
+            return []
+        months = rule.by_month or ((range(1, 13)) if rule.by_month_day else (start.month,))
+        candidates = [d for m in months for d in _month_candidates(year, m, rule, start.day)]
+    if rule.by_month:
+        candidates = [d for d in candidates if d.month in rule.by_month]
+    return sorted(candidates)
+
+
+def _first_period(rule: Rule, start: date, not_before: date) -> int:
+    # COUNT needs every occurrence from the start; otherwise skip whole periods before the window
+    if rule.count is not None or not_before <= start:
+        return 0
+    if rule.freq == "DAILY":
+        span = (not_before - start).days
+    elif rule.freq == "WEEKLY":
+        span = (not_before - start).days // 7
+    elif rule.freq == "MONTHLY":
+        span = (not_before.year - start.year) * 12 + not_before.month - start.month
+    else:
+        span = not_before.year - start.year
+    return max(0, span // rule.interval - 1)
+
+
+def rule_dates(rule: Rule, start: date, not_before: date, stop: date) -> Iterator[date]:
+    """
+    Occurrence dates of one rule in ascending order, from dtstart (or the period before
+    not_before when COUNT allows skipping) until stop, COUNT or UNTIL.
+    """
+    emitted = 0
+    horizon = min(stop, date(min(9999, max(start, not_before).year + MAX_YEARS), 12, 31))
+    period = _first_period(rule, start, not_before)
+    until_day = rule.until if isinstance(rule.until, date) and not isinstance(rule.until, datetime) else None
+    while True:
+        candidates = _period_candidates(rule, start, period)
+        for day in candidates:
+            if day < start:
+                continue
+            if day > horizon or (until_day and day > until_day):
+                return
+            yield day
+            emitted += 1
+            if rule.count is not None and emitted >= rule.count:
+                return
+        if _period_start(rule, start, period) > horizon:
+            return
+        period += 1
+
+
+def _period_start(rule: Rule, start: date, period: int) -> date:
+    if rule.freq == "DAILY":
+        return start + timedelta(days=period * rule.interval)
+    if rule.freq == "WEEKLY":
+        return start + timedelta(weeks=period * rule.interval)
+    if rule.freq == "MONTHLY":
+        year, month = _add_months(start.replace(day=1), period * rule.interval)
+        return date(year, month, 1)
+    return date(min(9999, start.year + period * rule.interval), 1, 1)
+
+
+def _parse_date_list(line: str, tz: Optional[tzinfo]) -> List[Union[datetime, date]]:
+    # EXDATE;TZID=Australia/Sydney:20251110T090000,20251117T090000
+    head, _, values = line.partition(":")
+    params = dict(p.split("=", 1) for p in head.split(";")[1:] if "=" in p)
+    zone = timeutils.get_zone(params["TZID"]) if "TZID" in params else tz
+    return [_parse_stamp(v.strip(), zone) for v in values.split(",") if v.strip()]
+
+
+class Series(NamedTuple):
+    rules: Tuple[Rule, ...]
+    exdates: Set[Union[datetime, date]]
+    rdates: Tuple[Union[datetime, date], ...]
+
+
+def parse_series(lines: Iterable[str], tz_name: Optional[str]) -> Series:
+    tz = timeutils.get_zone(tz_name) if tz_name else None
+    rules, exdates, rdates = [], set(), []
+    for line in lines:
+        kind = line.split(":", 1)[0].split(";", 1)[0].upper()
+        if kind == "RRULE":
+            rules.append(parse_rrule(line, tz_name))
+        elif kind == "EXDATE":
+            exdates.update(_parse_date_list(line, tz))
+        elif kind == "RDATE":
+            rdates.extend(_parse_date_list(line, tz))
+        else:
+            raise UnsupportedRule(f"unsupported recurrence line: {line}")
+    return Series(tuple(rules), exdates, tuple(rdates))
+
+
+def _event_start(ev: Dict) -> Tuple[Union[datetime, date], bool, Optional[str]]:
+    start = ev.get("start") or {}
+    if start.get("dateTime"):
+        return timeutils.parse_iso(start["dateTime"]), False, start.get("timeZone")
+    return date.fromisoformat(start["date"]), True, start.get("timeZone")
+
+
+def _event_end(ev: Dict) -> Union[datetime, date]:
+    end = ev.get("end") or {}
+    if end.get("dateTime"):
+        return timeutils.parse_iso(end["dateTime"])
+    return date.fromisoformat(end["date"])
+
+
+def _instance_key(value: Union[datetime, date]) -> str:
+    # same suffix Google uses for instance ids
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return value.strftime("%Y%m%d")
+
+
+def expand(master: Dict, window_start: datetime, window_end: datetime, skip: Set[str] = frozenset()) -> Iterator[Dict]:
+    """
+    Lazily yields the instances of a recurring master that overlap [window_start, window_end),
+    each shaped like the item Google returns with singleEvents=True. skip holds instance keys
+    (see _instance_key) already covered by exceptions.
+    """
+    dtstart, all_day, tz_name = _event_start(master)
+    duration = _event_end(master) - dtstart
+    tz = timeutils.get_zone(tz_name) if tz_name else None
+    if not all_day:
+        tz = tz or dtstart.tzinfo
+        dtstart = dtstart.astimezone(tz)
+    series = parse_series(master.get("recurrence") or [], tz_name)
+    first_day = dtstart if all_day else dtstart.date()
+    local_from = (window_start.astimezone(tz) if tz else window_start).date() - timedelta(days=max(1, duration.days + 1))
+    local_to = (window_end.astimezone(tz) if tz else window_end).date()
+
+    def starts_for(rule: Rule) -> Iterator[Union[datetime, date]]:
+        until = rule.until if isinstance(rule.until, datetime) else None
+        if until is not None and until.tzinfo is None:
+            until = until.replace(tzinfo=tz)
+        for day in rule_dates(rule, first_day, local_from, local_to):
+            if all_day:
+                if until is not None and day > until.date():
+                    return
+                yield day
+                continue
+            occurrence = datetime.combine(day, dtstart.timetz().replace(tzinfo=None), tzinfo=tz)
+            if until is not None and occurrence > until:
+                return
+            yield occurrence
+
+    streams = [starts_for(rule) for rule in series.rules] or [iter([dtstart])]
+    if all_day:
+        extra = sorted(d.date() if isinstance(d, datetime) else d for d in series.rdates)
+    else:
+        extra = sorted(d if isinstance(d, datetime) else datetime.combine(d, dtstart.timetz()) for d in series.rdates)
+    excluded = {_instance_key(d) for d in series.exdates}
+    master_id = master.get("id")
+    last_key = None
+    for occurrence in heapq.merge(*streams, extra):
+        key = _instance_key(occurrence)
+        if key == last_key:
+            continue
+        last_key = key
+        if key in excluded or key in skip:
+            continue
+        end = occurrence + duration
+        if all_day:
+            occ_start = datetime.combine(occurrence, time.min, tzinfo=timeutils.current_zone())
+            occ_end = datetime.combine(end, time.min, tzinfo=timeutils.current_zone())
+        else:
+            occ_start, occ_end = occurrence, end
+        if occ_start >= window_end:
+            return
+        if occ_end <= window_start:
+            continue
+        # the master's etag is not the instance's, so conditional writes must not reuse it
+        instance = {k: v for k, v in master.items() if k not in ("recurrence", "id", "start", "end", "etag")}
+        instance["id"] = f"{master_id}_{key}"
+        instance["recurringEventId"] = master_id
+        if all_day:
+            instance["start"] = {"date": occurrence.isoformat()}
+            instance["end"] = {"date": end.isoformat()}
+            instance["originalStartTime"] = {"date": occurrence.isoformat()}
+        else:
+            instance["start"] = {"dateTime": occurrence.isoformat(), **({"timeZone": tz_name} if tz_name else {})}
+            instance["end"] = {"dateTime": end.isoformat(), **({"timeZone": tz_name} if tz_name else {})}
+            instance["originalStartTime"] = dict(instance["start"])
+        yield instance
+
+
+def _sort_key(ev: Dict) -> datetime:
+    start, all_day, _ = _event_start(ev)
+    if all_day:
+        return datetime.combine(start, time.min, tzinfo=timeutils.current_zone())
+    return start
+
+
+def _overlaps(ev: Dict, window_start: datetime, window_end: datetime) -> bool:
+    start = _sort_key(ev)
+    end = _event_end(ev)
+    if not isinstance(end, datetime):
+        end = datetime.combine(end, time.min, tzinfo=timeutils.current_zone())
+    return start < window_end and end > window_start
+
+
+def expand_events(items: Iterable[Dict], window_start: datetime, window_end: datetime, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Turns events.list items fetched with singleEvents=False (and showDeleted=True, so cancelled
+    instances are visible) into the flat, start-ordered list singleEvents=True would return for
+    [window_start, window_end). items may cover more than the window.
+    Raises UnsupportedRule if any master uses a rule this module cannot expand.
+    """
+    masters, singles = [], []
+    exceptions: Dict[str, Set[str]] = {}
+    for ev in items:
+        if ev.get("recurringEventId") and ev.get("originalStartTime"):
+            original = ev["originalStartTime"]
+            stamp = timeutils.parse_iso(original["dateTime"]) if original.get("dateTime") else date.fromisoformat(original["date"])
+            exceptions.setdefault(ev["recurringEventId"], set()).add(_instance_key(stamp))
+        if ev.get("status") == "cancelled":
+            continue
+        if ev.get("recurrence"):
+            if _sort_key(ev) < window_end:
+                masters.append(ev)
+        elif _overlaps(ev, window_start, window_end):
+            singles.append(ev)
+    # validate every master up front so a fallback happens before anything is returned
+    for master in masters:
+        parse_series(master["recurrence"], (master.get("start") or {}).get("timeZone"))
+    streams = [expand(m, window_start, window_end, exceptions.get(m.get("id"), set())) for m in masters]
+    streams.append(iter(sorted(singles, key=_sort_key)))
+    merged = heapq.merge(*streams, key=_sort_key)
+    return list(itertools.islice(merged, limit) if limit else merged)
+
+
+def describe(lines: Iterable[str]) -> str:
+    """
+    Short human summary of RRULE lines for previews, e.g. 'weekly on Mon, Wed, 10 times'.
+    """
+    summaries = []
+    for line in lines:
+        try:
+            rule = parse_rrule(line)
+        except UnsupportedRule:
+            summaries.append(line)
+            continue
+        unit = {"DAILY": "day", "WEEKLY": "week", "MONTHLY": "month", "YEARLY": "year"}[rule.freq]
+        text = f"every {rule.interval} {unit}s" if rule.interval > 1 else f"{rule.freq.lower()}"
+        if rule.by_day:
+            names = [
+                (f"{ordinal} " if ordinal else "") + calendar.day_abbr[weekday]
+                for ordinal, weekday in rule.by_day
+            ]
+            text += " on " + ", ".join(names)
+        if rule.count:
+            text += f", {rule.count} times"
+        elif rule.until:
+            text += f", until {rule.until.strftime('%d %b %Y')}"
+        summaries.append(text)
+    return "; ".join(summaries)
@@ -0,0 +1,329 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, time as dt_time, timedelta
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import event_bus
+import jobs
+import tenancy
+import timeutils
+
+# Deadline check-ins go out at this local hour, this many days before a goal's target_date.
+GOAL_REMINDER_LEAD_DAYS = int(os.getenv("GOAL_REMINDER_LEAD_DAYS", "1"))
+GOAL_REMINDER_HOUR = int(os.getenv("GOAL_REMINDER_HOUR", "9"))
+# Minutes before a timed event starts, unless the event carries its own reminder override.
+EVENT_REMINDER_MINUTES = int(os.getenv("EVENT_REMINDER_MINUTES", "15"))
+# How far ahead calendar events are loaded, and how often each user's reminders are reloaded.
+CALENDAR_LOOKAHEAD_DAYS = int(os.getenv("REMINDER_LOOKAHEAD_DAYS", "7"))
+RELOAD_SECONDS = float(os.getenv("REMINDER_RELOAD_SECONDS", str(6 * 3600)))
+OUTBOX_SIZE = max(1, int(os.getenv("REMINDER_OUTBOX_SIZE", "50")))
+OUTBOX_USERS = int(os.getenv("REMINDER_OUTBOX_USERS", "10000"))
+# Users whose reminders this process has loaded; one evicted from here is simply loaded again.
+LOADED_USERS = int(os.getenv("REMINDER_LOADED_USERS", "10000"))
+# Cancelled entries stay in the heap until popped; rebuild once they outnumber the live ones.
+_COMPACT_MIN = 1024
+
+Key = Tuple[str, str, str]  # (user, kind, goal or event id)
+
+
+class _Entry:
+    __slots__ = ("fire_at", "key", "payload", "cancelled")
+
+    def __init__(self, fire_at: float, key: Key, payload: Dict) -> None:
+        self.fire_at = fire_at
+        self.key = key
+        self.payload = payload
+        self.cancelled = False
+
+
+class ReminderScheduler:
+    """
+    Pending reminders in a binary heap ordered by fire time, plus a dict from key to entry.
+    schedule() and cancel() are O(log n) and O(1): a rescheduled or cancelled entry is only
+    marked, and skipped when it reaches the top. One timer thread sleeps until the earliest
+    reminder is due and fires it into the user's outbox, the SSE stream and the job queue.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, _Entry]] = []
+        self._entries: Dict[Key, _Entry] = {}
+        self._by_user: Dict[str, Set[Key]] = {}
+        self._seq = itertools.count()
+        self._stale = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"scheduled": 0, "cancelled": 0, "fired": 0, "compactions": 0}
+
+    def schedule(self, key: Key, fire_at: float, payload: Dict) -> None:
+        with self._cond:
+            self._unlink(key)
+            entry = _Entry(fire_at, key, payload)
+            self._entries[key] = entry
+            self._by_user.setdefault(key[0], set()).add(key)
+            heapq.heappush(self._heap, (fire_at, next(self._seq), entry))
+            self._stats["scheduled"] += 1
+            if self._heap[0][2] is entry:
+                self._cond.notify()
+
+    def cancel(self, key: Key) -> bool:
+        with self._cond:
+            if not self._unlink(key):
+                return False
+            self._stats["cancelled"] += 1
+            return True
+
+    def _forget(self, key: Key) -> Optional[_Entry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(key[0])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[key[0]]
+        return entry
+
+    def _unlink(self, key: Key) -> bool:
+        entry = self._forget(key)
+        if entry is None:
+            return False
+        entry.cancelled = True
+        self._stale += 1
+        if self._stale > _COMPACT_MIN and self._stale > len(self._entries):
+            self._heap = [item for item in self._heap if not item[2].cancelled]
+            heapq.heapify(self._heap)
+            self._stale = 0
+            self._stats["compactions"] += 1
+        return True
+
+    def pop_due(self, now: float) -> List[_Entry]:
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)[2]
+                if entry.cancelled:
+                    self._stale -= 1
+                    continue
+                self._forget(entry.key)
+                due.append(entry)
+            self._stats["fired"] += len(due)
+        return due
+
+    def _next_fire_at(self) -> Optional[float]:
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+            self._stale -= 1
+        return self._heap[0][0] if self._heap else None
+
+    def _run(self) -> None:
+        while True:
+            for entry in self.pop_due(time.time()):
+                try:
+                    _fire(entry)
+                except Exception as e:
+                    print("reminder failed:", e)
+            with self._cond:
+                fire_at = self._next_fire_at()
+                timeout = None if fire_at is None else max(0.0, fire_at - time.time())
+                if timeout is None or timeout > 0:
+                    self._cond.wait(timeout)
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+                self._thread.start()
+
+    def upcoming(self, user: str, limit: int = 20) -> List[Dict]:
+        with self._cond:
+            entries = [self._entries[k] for k in self._by_user.get(user, ())]
+        soonest = heapq.nsmallest(limit, entries, key=lambda e: e.fire_at)
+        return [_describe(e) for e in soonest]
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {"pending": len(self._entries), "heap": len(self._heap), "users": len(self._by_user), **self._stats}
+
+
+scheduler = ReminderScheduler()
+_outboxes: "tenancy.LRUCache[Deque[Dict]]" = tenancy.LRUCache(OUTBOX_USERS)
+# user -> when this process first loaded their reminders
+_loaded: "tenancy.LRUCache[float]" = tenancy.LRUCache(LOADED_USERS)
+
+
+def _describe(entry: _Entry) -> Dict:
+    user, kind, ref = entry.key
+    return {
+        "kind": kind,
+        "id": ref,
+        # in the zone of the session that scheduled it, not the server's
+        "fire_at": datetime.fromtimestamp(entry.fire_at, timeutils.get_zone(entry.payload.get("zone") or timeutils.DEFAULT_ZONE)).isoformat(),
+        **entry.payload,
+    }
+
+
+def _outbox(user: str) -> Deque[Dict]:
+    return _outboxes.get_or_create(user, lambda: deque(maxlen=OUTBOX_SIZE))
+
+
+def _fire(entry: _Entry) -> None:
+    user = entry.key[0]
+    item = _describe(entry)
+    _outbox(user).append(item)
+    event_bus.publish("reminder", item, user=user)
+    # emails and other slow delivery happen on the job workers
+    jobs.enqueue(f"reminder.{entry.key[1]}", item, user=user)
+
+
+def _goal_fire_at(target_date: Optional[str]) -> Optional[float]:
+    try:
+        day = datetime.strptime(target_date or "", "%Y-%m-%d").date()
+    except ValueError:
+        return None
+    at = datetime.combine(day - timedelta(days=GOAL_REMINDER_LEAD_DAYS), dt_time(GOAL_REMINDER_HOUR), timeutils.current_zone())
+    return at.timestamp()
+
+
+def schedule_goal(goal: Dict, user: Optional[str] = None) -> None:
+    """
+    (Re)schedules a goal's deadline check-in, or drops it when the goal is complete, has no
+    target_date, or the check-in time has already passed.
+    """
+    key = (user or tenancy.current_user(), "goal_deadline", str(goal.get("id")))
+    fire_at = _goal_fire_at(goal.get("target_date"))
+    if (goal.get("status") or "").lower() == "completed" or fire_at is None or fire_at <= time.time():
+        scheduler.cancel(key)
+        return
+    scheduler.schedule(key, fire_at, {
+        "title": goal.get("title"),
+        "target_date": goal.get("target_date"),
+        "zone": timeutils.current_zone_name(),
+    })
+
+
+def schedule_event(event: Dict, user: Optional[str] = None) -> None:
+    """
+    event is the flat shape published on the event bus: id, summary, start and optionally
+    reminder_minutes. All-day events (date-only start) don't get a start reminder.
+    """
+    key = (user or tenancy.current_user(), "event_start", str(event.get("id")))
+    start = event.get("start")
+    if not start or "T" not in start:
+        scheduler.cancel(key)
+        return
+    minutes = event.get("reminder_minutes")
+    if minutes is None:
+        minutes = EVENT_REMINDER_MINUTES
+    fire_at = timeutils.parse_iso(start).timestamp() - minutes * 60
+    if fire_at <= time.time():
+        scheduler.cancel(key)
+        return
+    scheduler.schedule(key, fire_at, {
+        "summary": event.get("summary"),
+        "start": start,
+        "minutes": minutes,
+        "zone": timeutils.current_zone_name(),
+    })
+
+
+def _flatten_event(event: Dict) -> Dict:
+    start = event.get("start") or {}
+    overrides = (event.get("reminders") or {}).get("overrides") or []
+    return {
+        "id": event.get("id"),
+        "summary": event.get("summary"),
+        "start": start.get("dateTime") or start.get("date"),
+        "reminder_minutes": max((o.get("minutes") or 0 for o in overrides), default=None),
+    }
+
+
+@jobs.handler("reminders.load")
+def _load(payload: Dict) -> None:
+    # imported here so the scheduler itself stays free of storage and Google dependencies
+    from goals import list_goals
+    from google_calendar import find_events, is_connected
+
+    user = tenancy.current_user()
+    token = timeutils.set_zone(payload.get("zone"))
+    try:
+        goals = list_goals()
+        for goal in goals:
+            schedule_goal(goal, user=user)
+        connected = is_connected()
+        if connected:
+            now = timeutils.now()
+            for event in find_events(now, now + timedelta(days=CALENDAR_LOOKAHEAD_DAYS), max_results=250):
+                schedule_event(_flatten_event(event), user=user)
+    finally:
+        timeutils.reset_zone(token)
+    if not goals and not connected:
+        # nothing to remind about; a new goal or a Google login schedules through _on_event
+        return
+    # pick up events that move into the lookahead window
+    jobs.enqueue("reminders.load", payload, delay=RELOAD_SECONDS, dedupe_key=f"reminders-load:{user}")
+
+
+def _enqueue_load(user: str) -> None:
+    jobs.enqueue("reminders.load", {"zone": timeutils.current_zone_name()}, dedupe_key=f"reminders-load:{user}", user=user)
+
+
+def ensure_loaded(user: Optional[str] = None) -> None:
+    """
+    Loads a user's reminders from their goals and calendar the first time they're seen by
+    this process. Cheap to call per request; the load itself runs on a job worker.
+    """
+    user = user or tenancy.current_user()
+    first = False
+
+    def mark() -> float:
+        nonlocal first
+        first = True
+        return time.time()
+
+    _loaded.get_or_create(user, mark)
+    if first:
+        _enqueue_load(user)
+
+
+def _on_event(event: Dict) -> None:
+    user = event.get("user") or tenancy.DEFAULT_USER
+    data = event.get("data") or {}
+    if event.get("type") == "goals":
+        for goal in data.get("goals") or []:
+            schedule_goal(goal, user=user)
+        for goal_id in data.get("deleted") or []:
+            scheduler.cancel((user, "goal_deadline", str(goal_id)))
+    elif event.get("type") == "calendar" and data.get("id"):
+        if data.get("action") == "deleted":
+            scheduler.cancel((user, "event_start", str(data["id"])))
+        else:
+            schedule_event(data, user=user)
+    elif event.get("type") == "google" and data.get("connected"):
+        # a freshly connected calendar has events nobody has scheduled reminders for yet
+        _enqueue_load(user)
+
+
+event_bus.add_listener(_on_event)
+
+
+def start() -> None:
+    scheduler.start()
+
+
+def outbox(user: Optional[str] = None) -> List[Dict]:
+    return list(_outbox(user or tenancy.current_user()))
+
+
+def clear_outbox(user: Optional[str] = None) -> None:
+    _outbox(user or tenancy.current_user()).clear()
+
+
+def upcoming(limit: int = 20) -> List[Dict]:
+    return scheduler.upcoming(tenancy.current_user(), limit)
+
+
+def stats() -> Dict:
+    return scheduler.stats()
@@ -0,0 +1,248 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, NamedTuple, Optional, Sequence
+
+import event_bus
+import tenancy
+
+if TYPE_CHECKING:
+    import numpy as np
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = max(1, int(os.getenv("RESPONSE_CACHE_SIZE", "2000")))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+# Weather answers go stale faster than the goal/calendar state they are keyed on.
+WEATHER_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_WEATHER_TTL", "300"))
+# Near-duplicate lookup: embed the message and accept the closest cached one above the threshold.
+EMBEDDINGS_ENABLED = os.getenv("RESPONSE_CACHE_EMBEDDINGS", "0").lower() in ("1", "true", "yes")
+SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.93"))
+# Coordinates are rounded to this many decimals (0.1° is roughly 11 km) for the weather cell.
+WEATHER_CELL_DECIMALS = 1
+# Messages this short ("yes", "and tomorrow?") only make sense with the turns before them.
+FOLLOW_UP_MAX_WORDS = 2
+
+# Read-only chat tools whose replies depend only on state already in the key. Calendar reads
+# (find_events, find_free_time) are left out: edits made in Google directly never reach the bus
+# or the key, and checking for them costs the same round trip the cache is meant to save.
+CACHEABLE_TOOLS = frozenset({"list_goals", "goal_insights"})
+
+_PUNCTUATION = re.compile(r"[^\w\s%$]+")
+_SPACES = re.compile(r"\s+")
+
+
+class CacheKey(NamedTuple):
+    user: str
+    context: str
+    message: str
+
+
+class _Entry:
+    __slots__ = ("payload", "expires", "compute_ms", "vector")
+
+    def __init__(self, payload: Dict, expires: float, compute_ms: float, vector: Optional["np.ndarray"]) -> None:
+        self.payload = payload
+        self.expires = expires
+        self.compute_ms = compute_ms
+        self.vector = vector
+
+
+def normalise_message(text: str) -> str:
+    # "What's the weather?!" and "whats the   weather" share an entry
+    text = unicodedata.normalize("NFKC", text or "").lower().replace("'", "").replace("’", "")
+    return _SPACES.sub(" ", _PUNCTUATION.sub(" ", text)).strip()
+
+
+def weather_cell(lat: Optional[float], lon: Optional[float], fallback: Optional[str] = None) -> str:
+    if lat is None or lon is None:
+        return f"ip:{fallback}" if fallback else "unknown"
+    return f"{round(lat, WEATHER_CELL_DECIMALS)},{round(lon, WEATHER_CELL_DECIMALS)}"
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of chat payloads. Keys combine the normalised message with a context digest
+    (goal store revision, calendar write generation, weather cell, local date, and the recent turns
+    for short follow-ups), so
+    any state change makes old entries unreachable; goal and calendar events on the bus also drop
+    the user's entries outright. With an embed function, a miss falls back to the most similar
+    cached message under the same context.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        embed: Optional[Callable[[str], Sequence[float]]] = None,
+        threshold: float = SIMILARITY_THRESHOLD,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.embed = embed
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        # query vectors from missed lookups, reused when the computed reply is stored
+        self._query_vectors: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._saved_ms = 0.0
+
+    # --- keys ---
+
+    def calendar_generation(self, user: Optional[str] = None) -> int:
+        with self._lock:
+            return self._generations.get(user or tenancy.current_user(), 0)
+
+    def make_key(
+        self,
+        message: str,
+        *,
+        goal_revision: int,
+        local_date: str,
+        zone: str,
+        weather: Optional[str] = None,
+        history: Iterable[Dict] = (),
+    ) -> CacheKey:
+        user = tenancy.current_user()
+        digest = hashlib.sha1()
+        for part in (goal_revision, self.calendar_generation(user), local_date, zone, weather or "-"):
+            digest.update(f"{part}|".encode())
+        text = normalise_message(message)
+        if len(text.split()) <= FOLLOW_UP_MAX_WORDS:
+            for turn in history:
+                digest.update(f"{turn.get('role')}:{normalise_message(turn.get('text', ''))}\n".encode())
+        return CacheKey(user, digest.hexdigest()[:20], text)
+
+    # --- lookups ---
+
+    def get(self, key: CacheKey) -> Optional[Dict]:
+        if not RESPONSE_CACHE_ENABLED or not key.message:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                self._saved_ms += entry.compute_ms
+                return entry.payload
+            if entry is not None:
+                del self._entries[key]
+            if self.embed is None:
+                self._misses += 1
+                return None
+        similar = self._similar(key, now)
+        with self._lock:
+            if similar is None:
+                self._misses += 1
+                return None
+            self._semantic_hits += 1
+            self._saved_ms += similar.compute_ms
+            return similar.payload
+
+    def _vector(self, text: str) -> Optional["np.ndarray"]:
+        # numpy is only needed once embeddings are switched on, so it isn't imported at startup
+        import numpy as np
+        try:
+            vector = np.asarray(self.embed(text), dtype=np.float32)
+        except Exception as e:
+            print("response cache embedding failed:", e)
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def _similar(self, key: CacheKey, now: float) -> Optional[_Entry]:
+        with self._lock:
+            candidates = [
+                entry for k, entry in self._entries.items()
+                if k.user == key.user and k.context == key.context and entry.vector is not None and entry.expires > now
+            ]
+        query = self._vector(key.message)
+        if query is None:
+            return None
+        with self._lock:
+            self._query_vectors[key] = query
+            while len(self._query_vectors) > 256:
+                self._query_vectors.popitem(last=False)
+        if not candidates:
+            return None
+        import numpy as np
+        scores = np.stack([entry.vector for entry in candidates]) @ query
+        best = int(np.argmax(scores))
+        return candidates[best] if scores[best] >= self.threshold else None
+
+    # --- writes ---
+
+    def put(self, key: CacheKey, payload: Dict, compute_ms: float, ttl: Optional[float] = None) -> None:
+        if not RESPONSE_CACHE_ENABLED or not key.message:
+            return
+        vector = None
+        if self.embed is not None:
+            with self._lock:
+                vector = self._query_vectors.pop(key, None)
+            if vector is None:
+                vector = self._vector(key.message)
+        # a write racing this reply bumps the revision/generation, so the entry is simply unreachable
+        with self._lock:
+            self._entries[key] = _Entry(payload, time.monotonic() + (ttl or self.ttl), compute_ms, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user: str, calendar: bool = False) -> int:
+        with self._lock:
+            stale = [k for k in self._entries if k.user == user]
+            for k in stale:
+                del self._entries[k]
+            if calendar:
+                self._generations[user] = self._generations.get(user, 0) + 1
+            self._invalidations += 1
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._semantic_hits + self._misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self._hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._hits + self._semantic_hits) / lookups, 4) if lookups else 0.0,
+                "invalidations": self._invalidations,
+                "latency_saved_ms": round(self._saved_ms, 1),
+                "embeddings": self.embed is not None,
+            }
+
+
+cache = ResponseCache()
+
+
+def _on_event(event: Dict) -> None:
+    # connecting or disconnecting Google changes every calendar answer, like an edit does
+    if event.get("type") in ("goals", "calendar", "google"):
+        cache.invalidate_user(event.get("user") or tenancy.DEFAULT_USER, calendar=event.get("type") != "goals")
+
+
+event_bus.add_listener(_on_event)
+
+
+def configure_embeddings(embed: Callable[[str], Sequence[float]]) -> None:
+    if EMBEDDINGS_ENABLED:
+        cache.embed = embed
+
+
+def stats() -> Dict:
+    return cache.stats()
@@ -0,0 +1,305 @@
+import bisect
+import os
+import random
+import time as time_mod
+from datetime import datetime, timedelta, tzinfo
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import scheduling
+import timeutils
+
+# Wall-clock budget for the local search phase; the greedy pass always completes.
+TIME_BUDGET_MS = int(os.getenv("SCHEDULE_OPTIMIZER_BUDGET_MS", "250"))
+MAX_ITERATIONS = 5000
+STEP_MINUTES = scheduling.SLOT_STEP_MINUTES
+
+# cost weights: moving anything is worse than a short buffer, overlaps are never accepted
+MOVE_PENALTY = 60.0
+MINUTE_PENALTY = 0.1
+DAY_CHANGE_PENALTY = 120.0
+BUFFER_PENALTY = 2.0
+
+
+class Block:
+    __slots__ = ("id", "title", "start", "end", "duration", "original_start", "fixed", "goal_linked")
+
+    def __init__(self, event_id: str, title: str, start: datetime, end: datetime, fixed: bool, goal_linked: bool) -> None:
+        self.id = event_id
+        self.title = title
+        self.start = start
+        self.end = end
+        self.duration = end - start
+        self.original_start = start
+        self.fixed = fixed
+        self.goal_linked = goal_linked
+
+    @property
+    def moved(self) -> bool:
+        return self.start != self.original_start
+
+
+class _Timeline:
+    """
+    Placed blocks kept sorted by start so neighbour and overlap checks are bisects.
+    """
+
+    def __init__(self) -> None:
+        self._keys: List[Tuple[datetime, str]] = []
+        self._blocks: List[Block] = []
+        self._longest = timedelta(0)
+
+    def add(self, block: Block) -> None:
+        i = bisect.bisect_left(self._keys, (block.start, block.id))
+        self._keys.insert(i, (block.start, block.id))
+        self._blocks.insert(i, block)
+        self._longest = max(self._longest, block.duration)
+
+    def remove(self, block: Block) -> None:
+        i = bisect.bisect_left(self._keys, (block.start, block.id))
+        del self._keys[i]
+        del self._blocks[i]
+
+    def neighbours(self, start: datetime, end: datetime) -> Tuple[Optional[Block], Optional[Block]]:
+        i = bisect.bisect_left(self._keys, (start, ""))
+        before = self._blocks[i - 1] if i > 0 else None
+        after = self._blocks[i] if i < len(self._blocks) else None
+        return before, after
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        # only blocks starting within one longest-duration of start can still be running
+        earliest = start - self._longest
+        j = bisect.bisect_left(self._keys, (end, "")) - 1
+        while j >= 0 and self._blocks[j].start >= earliest:
+            if self._blocks[j].end > start:
+                return True
+            j -= 1
+        return False
+
+    def busy(self) -> List[scheduling.Window]:
+        return scheduling.merge_windows((b.start, b.end) for b in self._blocks)
+
+
+def _local_day(dt: datetime, tz: Optional[tzinfo]):
+    return dt.astimezone(tz).date() if tz else dt.date()
+
+
+class Optimizer:
+    """
+    Rearranges movable events so none overlap, using a greedy interval-scheduling pass followed
+    by a time-bounded local search that pulls moved events back towards their original times.
+
+    Fixed: all-day events, events with other attendees, recurring instances and anything the
+    caller marks as keep. Goal-linked blocks may move but stay on their original day.
+    New placements respect working hours and prefer a buffer between events.
+    """
+
+    def __init__(
+        self,
+        events: Iterable[Dict],
+        start: datetime,
+        end: datetime,
+        *,
+        goal_titles: Sequence[str] = (),
+        keep: Sequence[str] = (),
+        only: Sequence[str] = (),
+        day_start: int = scheduling.DAY_START_HOUR,
+        day_end: int = scheduling.DAY_END_HOUR,
+        buffer_minutes: int = scheduling.SLOT_BUFFER_MINUTES,
+        budget_ms: int = TIME_BUDGET_MS,
+        seed: int = 5620,
+    ) -> None:
+        self.tz = timeutils.current_zone()
+        self.start = start
+        self.end = end
+        self.day_start = day_start
+        self.day_end = day_end
+        self.buffer = timedelta(minutes=buffer_minutes)
+        self.budget_ms = budget_ms
+        self.rng = random.Random(seed)
+        goal_titles = [t.lower() for t in goal_titles if t]
+        keep = [k.lower() for k in keep if k]
+        only = [o.lower() for o in only if o]
+        self.blocks: List[Block] = []
+        by_id = {ev.get("id"): ev for ev in events}
+        for interval in scheduling.intervals_from_events(by_id.values(), self.tz):
+            ev = by_id[interval.event_id]
+            title = interval.title.lower()
+            others = [a for a in ev.get("attendees") or [] if not a.get("self")]
+            goal_id = ((ev.get("extendedProperties") or {}).get("private") or {}).get("goal_id")
+            fixed = bool(
+                others
+                or ev.get("recurringEventId")
+                or any(k in title for k in keep)
+                or (only and not any(o in title for o in only))
+                or interval.start < start
+                or interval.end > end
+            )
+            goal_linked = bool(goal_id) or any(t in title for t in goal_titles)
+            self.blocks.append(Block(interval.event_id, interval.title, interval.start, interval.end, fixed, goal_linked))
+        self.conflicts_before = len(scheduling.IntervalIndex(
+            scheduling.Interval(b.start, b.end, b.id) for b in self.blocks
+        ).conflicts())
+        self.unresolved: List[Block] = []
+        self.iterations = 0
+
+    # --- costs ---
+
+    def _cost(self, block: Block, start: datetime, timeline: _Timeline) -> float:
+        end = start + block.duration
+        cost = 0.0
+        if start != block.original_start:
+            cost += MOVE_PENALTY + MINUTE_PENALTY * abs((start - block.original_start).total_seconds()) / 60.0
+            if _local_day(start, self.tz) != _local_day(block.original_start, self.tz):
+                cost += DAY_CHANGE_PENALTY
+        before, after = timeline.neighbours(start, end)
+        if before is not None and start - before.end < self.buffer:
+            cost += BUFFER_PENALTY * (self.buffer - max(start - before.end, timedelta(0))).total_seconds() / 60.0
+        if after is not None and after.start - end < self.buffer:
+            cost += BUFFER_PENALTY * (self.buffer - max(after.start - end, timedelta(0))).total_seconds() / 60.0
+        return cost
+
+    def _candidates(self, block: Block, timeline: _Timeline) -> List[datetime]:
+        """
+        Feasible starts: the original slot if it is clear, otherwise the edges of each free
+        gap (padded by the buffer when there is room) and the point nearest the original time.
+        """
+        need = block.duration
+        day = _local_day(block.original_start, self.tz)
+        free = scheduling.free_windows(
+            self.start, self.end, timeline.busy(), tz=self.tz, day_start=self.day_start, day_end=self.day_end
+        )
+        step = STEP_MINUTES
+        starts = []
+        if not timeline.overlaps(block.original_start, block.original_start + need):
+            starts.append(block.original_start)
+        for f_start, f_end in free:
+            if f_end - f_start < need:
+                continue
+            if block.goal_linked and _local_day(f_start, self.tz) != day:
+                continue
+            options = [
+                f_start,
+                f_start + self.buffer,
+                f_end - need,
+                f_end - need - self.buffer,
+                min(max(block.original_start, f_start), f_end - need),
+            ]
+            for s in options:
+                s = scheduling.round_up(s, step) if s.minute % step or s.second or s.microsecond else s
+                if f_start <= s and s + need <= f_end:
+                    starts.append(s)
+        return starts
+
+    def _place_best(self, block: Block, timeline: _Timeline) -> bool:
+        candidates = self._candidates(block, timeline)
+        if not candidates:
+            return False
+        best = min(candidates, key=lambda s: (self._cost(block, s, timeline), s))
+        block.start, block.end = best, best + block.duration
+        timeline.add(block)
+        return True
+
+    # --- solve ---
+
+    def solve(self) -> Dict:
+        started = time_mod.perf_counter()
+        timeline = _Timeline()
+        movable = []
+        for block in self.blocks:
+            if block.fixed:
+                timeline.add(block)
+            else:
+                movable.append(block)
+
+        # greedy: keep every movable block that still fits where it is, earliest first
+        pending = []
+        for block in sorted(movable, key=lambda b: (b.start, -b.duration)):
+            if timeline.overlaps(block.start, block.end):
+                pending.append(block)
+            else:
+                timeline.add(block)
+        # then place displaced blocks, longest (hardest to fit) first
+        for block in sorted(pending, key=lambda b: (-b.duration, b.start)):
+            if not self._place_best(block, timeline):
+                # nowhere to go: leave it where it was, report it and keep others off it
+                self.unresolved.append(block)
+                timeline.add(block)
+
+        # local search: try to pull moved blocks back towards their original times
+        deadline = started + self.budget_ms / 1000.0
+        placed = [b for b in movable if b not in self.unresolved]
+        improved = True
+        while improved and time_mod.perf_counter() < deadline and self.iterations < MAX_ITERATIONS:
+            improved = False
+            order = [b for b in placed if b.moved]
+            self.rng.shuffle(order)
+            for block in order:
+                if time_mod.perf_counter() >= deadline or self.iterations >= MAX_ITERATIONS:
+                    break
+                self.iterations += 1
+                timeline.remove(block)
+                current = block.start
+                current_cost = self._cost(block, current, timeline)
+                candidates = self._candidates(block, timeline)
+                best = min(candidates, key=lambda s: (self._cost(block, s, timeline), s)) if candidates else current
+                if self._cost(block, best, timeline) + 1e-9 < current_cost:
+                    block.start, block.end = best, best + block.duration
+                    improved = True
+                timeline.add(block)
+            if not improved:
+                improved = self._try_swaps(placed, timeline, deadline)
+
+        final = [b for b in self.blocks if b not in self.unresolved] + self.unresolved
+        conflicts_after = len(scheduling.IntervalIndex(
+            scheduling.Interval(b.start, b.end, b.id) for b in final
+        ).conflicts())
+        return {
+            "changes": [
+                {
+                    "id": b.id,
+                    "title": b.title,
+                    "from": {"start": b.original_start.isoformat(), "end": (b.original_start + b.duration).isoformat()},
+                    "to": {"start": b.start.isoformat(), "end": b.end.isoformat()},
+                    "goal_linked": b.goal_linked,
+                }
+                for b in sorted(self.blocks, key=lambda b: b.start)
+                if b.moved and b not in self.unresolved
+            ],
+            "unresolved": [{"id": b.id, "title": b.title, "start": b.start.isoformat()} for b in self.unresolved],
+            "conflicts_before": self.conflicts_before,
+            "conflicts_after": conflicts_after,
+            "iterations": self.iterations,
+            "elapsed_ms": round((time_mod.perf_counter() - started) * 1000, 2),
+        }
+
+    def _try_swaps(self, placed: List[Block], timeline: _Timeline, deadline: float) -> bool:
+        # swap a moved block with an equal-length block if both end up cheaper
+        moved = [b for b in placed if b.moved]
+        for a in moved:
+            for b in placed:
+                if time_mod.perf_counter() >= deadline or self.iterations >= MAX_ITERATIONS:
+                    return False
+                if b is a or b.duration != a.duration:
+                    continue
+                if a.goal_linked and _local_day(b.start, self.tz) != _local_day(a.original_start, self.tz):
+                    continue
+                if b.goal_linked and _local_day(a.start, self.tz) != _local_day(b.original_start, self.tz):
+                    continue
+                self.iterations += 1
+                timeline.remove(a)
+                timeline.remove(b)
+                before = self._cost(a, a.start, timeline) + self._cost(b, b.start, timeline)
+                after = self._cost(a, b.start, timeline) + self._cost(b, a.start, timeline)
+                if after + 1e-9 < before:
+                    a.start, b.start = b.start, a.start
+                    a.end, b.end = a.start + a.duration, b.start + b.duration
+                    timeline.add(a)
+                    timeline.add(b)
+                    return True
+                timeline.add(a)
+                timeline.add(b)
+        return False
+
+
+def optimise(events: Iterable[Dict], start: datetime, end: datetime, **options) -> Dict:
+    return Optimizer(events, start, end, **options).solve()
@@ -0,0 +1,252 @@
+import bisect
+import heapq
+import os
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import timeutils
+
+# Local hours considered schedulable when looking for free slots.
+DAY_START_HOUR = int(os.getenv("SCHEDULE_DAY_START", "8"))
+DAY_END_HOUR = int(os.getenv("SCHEDULE_DAY_END", "20"))
+SLOT_STEP_MINUTES = 15
+# Preferred gap kept between a suggested slot and its neighbours when there is room.
+SLOT_BUFFER_MINUTES = 10
+MAX_SLOTS = 20
+
+Window = Tuple[datetime, datetime]
+
+
+class Interval(NamedTuple):
+    start: datetime
+    end: datetime
+    event_id: Optional[str] = None
+    title: str = ""
+
+
+def intervals_from_events(events: Iterable[Dict], tz: Optional[tzinfo] = None, include_all_day: bool = False) -> List[Interval]:
+    """
+    Busy intervals for Google Calendar events. Events marked free (transparent), declined by
+    the user, or all-day (unless include_all_day) do not block time.
+    """
+    tz = tz or timeutils.current_zone()
+    intervals = []
+    for ev in events:
+        if ev.get("transparency") == "transparent" or ev.get("status") == "cancelled":
+            continue
+        if any(a.get("self") and a.get("responseStatus") == "declined" for a in ev.get("attendees") or []):
+            continue
+        start, end = timeutils.event_bounds(ev)
+        if not (start and end):
+            continue
+        if "T" in start and "T" in end:
+            s, e = timeutils.to_zone(start, tz), timeutils.to_zone(end, tz)
+        elif include_all_day:
+            s = datetime.combine(date.fromisoformat(start[:10]), time.min, tzinfo=tz)
+            e = datetime.combine(date.fromisoformat(end[:10]), time.min, tzinfo=tz)
+        else:
+            continue
+        if e > s:
+            intervals.append(Interval(s, e, ev.get("id"), ev.get("summary") or "(no title)"))
+    return intervals
+
+
+class IntervalIndex:
+    """
+    Intervals sorted by start with a running maximum of end times, so overlap queries are a
+    bisect plus a walk over the hits rather than a scan of the whole calendar.
+    Overlap is strict: back-to-back intervals do not overlap.
+    """
+
+    def __init__(self, intervals: Iterable[Interval]) -> None:
+        self.intervals: List[Interval] = sorted(intervals, key=lambda iv: (iv.start, iv.end))
+        self._starts = [iv.start for iv in self.intervals]
+        self._max_end: List[datetime] = []
+        for iv in self.intervals:
+            self._max_end.append(iv.end if not self._max_end or iv.end > self._max_end[-1] else self._max_end[-1])
+
+    def __len__(self) -> int:
+        return len(self.intervals)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Interval]:
+        hits = []
+        i = bisect.bisect_left(self._starts, end) - 1
+        while i >= 0 and self._max_end[i] > start:
+            if self.intervals[i].end > start:
+                hits.append(self.intervals[i])
+            i -= 1
+        hits.reverse()
+        return hits
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        return not self.overlapping(start, end)
+
+    def conflicts(self) -> List[Tuple[Interval, Interval]]:
+        """
+        Every overlapping pair via a sweep over starts with a heap of active ends:
+        O(n log n + k) for k conflicting pairs.
+        """
+        pairs = []
+        active: List[Tuple[datetime, int]] = []
+        for i, iv in enumerate(self.intervals):
+            while active and active[0][0] <= iv.start:
+                heapq.heappop(active)
+            for _, j in active:
+                pairs.append((self.intervals[j], iv))
+            heapq.heappush(active, (iv.end, i))
+        return pairs
+
+    def busy(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Window]:
+        return merge_windows(
+            (iv.start, iv.end) for iv in (self.overlapping(start, end) if start and end else self.intervals)
+        )
+
+
+def merge_windows(windows: Iterable[Window]) -> List[Window]:
+    merged: List[List[datetime]] = []
+    for s, e in sorted(windows):
+        if merged and s <= merged[-1][1]:
+            if e > merged[-1][1]:
+                merged[-1][1] = e
+        else:
+            merged.append([s, e])
+    return [(s, e) for s, e in merged]
+
+
+def _working_windows(start: datetime, end: datetime, tz: Optional[tzinfo], day_start: int, day_end: int) -> List[Window]:
+    if day_start <= 0 and day_end >= 24:
+        return [(start, end)]
+    windows = []
+    day = start.astimezone(tz).date() if tz else start.date()
+    last = end.astimezone(tz).date() if tz else end.date()
+    while day <= last:
+        open_at = datetime.combine(day, time(day_start), tzinfo=tz)
+        close_at = datetime.combine(day, time.max, tzinfo=tz) if day_end >= 24 else datetime.combine(day, time(day_end), tzinfo=tz)
+        s, e = max(open_at, start), min(close_at, end)
+        if e > s:
+            windows.append((s, e))
+        day += timedelta(days=1)
+    return windows
+
+
+def free_windows(
+    start: datetime,
+    end: datetime,
+    busy: Sequence[Window],
+    *,
+    tz: Optional[tzinfo] = None,
+    day_start: int = DAY_START_HOUR,
+    day_end: int = DAY_END_HOUR,
+    min_minutes: int = 0,
+) -> List[Window]:
+    """
+    Gaps between merged busy windows inside [start, end), clipped to working hours each day.
+    """
+    tz = tz or timeutils.current_zone()
+    busy = merge_windows(busy)
+    starts = [s for s, _ in busy]
+    minimum = timedelta(minutes=min_minutes)
+    free = []
+    for w_start, w_end in _working_windows(start, end, tz, day_start, day_end):
+        cursor = w_start
+        i = max(0, bisect.bisect_right(starts, w_start) - 1)
+        while i < len(busy) and busy[i][0] < w_end:
+            b_start, b_end = busy[i]
+            if b_end > cursor:
+                if b_start > cursor and b_start - cursor >= max(minimum, timedelta(microseconds=1)):
+                    free.append((cursor, min(b_start, w_end)))
+                cursor = max(cursor, b_end)
+            i += 1
+        if w_end > cursor and w_end - cursor >= max(minimum, timedelta(microseconds=1)):
+            free.append((cursor, w_end))
+    return free
+
+
+def round_up(dt: datetime, minutes: int) -> datetime:
+    base = dt.replace(second=0, microsecond=0)
+    if base < dt:
+        base += timedelta(minutes=1)
+    extra = (-base.minute) % minutes
+    return base + timedelta(minutes=extra)
+
+
+def find_slots(
+    duration_minutes: int,
+    free: Sequence[Window],
+    *,
+    limit: int = 5,
+    per_day: int = 2,
+    buffer_minutes: int = SLOT_BUFFER_MINUTES,
+    step_minutes: int = SLOT_STEP_MINUTES,
+    tz: Optional[tzinfo] = None,
+) -> List[Window]:
+    """
+    Best slots of the requested length: earliest first, at most per_day per local day so
+    suggestions spread across the range, and padded by buffer_minutes where the gap allows.
+    """
+    tz = tz or timeutils.current_zone()
+    need = timedelta(minutes=duration_minutes)
+    pad = timedelta(minutes=buffer_minutes)
+    slots: List[Window] = []
+    per_day_count: Dict[date, int] = {}
+    for f_start, f_end in free:
+        if len(slots) >= limit:
+            break
+        if f_end - f_start < need:
+            continue
+        padded = round_up(f_start + pad, step_minutes)
+        begin = padded if padded + need + pad <= f_end else round_up(f_start, step_minutes)
+        if begin + need > f_end:
+            begin = f_start
+        day = begin.astimezone(tz).date() if tz else begin.date()
+        if per_day_count.get(day, 0) >= per_day:
+            continue
+        per_day_count[day] = per_day_count.get(day, 0) + 1
+        slots.append((begin, begin + need))
+    return slots
+
+
+def serialise_window(window: Window) -> Dict[str, str]:
+    return {"start": window[0].isoformat(), "end": window[1].isoformat()}
+
+
+def serialise_interval(interval: Interval) -> Dict[str, Optional[str]]:
+    return {
+        "id": interval.event_id,
+        "title": interval.title,
+        "start": interval.start.isoformat(),
+        "end": interval.end.isoformat(),
+    }
+
+
+def availability(
+    events: Iterable[Dict],
+    start: datetime,
+    end: datetime,
+    *,
+    duration_minutes: Optional[int] = None,
+    extra_busy: Iterable[Window] = (),
+    day_start: int = DAY_START_HOUR,
+    day_end: int = DAY_END_HOUR,
+    limit: int = 5,
+) -> Dict:
+    """
+    Conflicts among the events, merged busy time (events plus extra_busy from other calendars),
+    free windows within working hours and, if a duration is given, the best slots for it.
+    """
+    tz = timeutils.current_zone()
+    index = IntervalIndex(intervals_from_events(events, tz))
+    busy = merge_windows(list(index.busy(start, end)) + [(s, e) for s, e in extra_busy if e > start and s < end])
+    free = free_windows(start, end, busy, tz=tz, day_start=day_start, day_end=day_end)
+    result = {
+        "conflicts": [
+            {"first": serialise_interval(a), "second": serialise_interval(b)} for a, b in index.conflicts()
+        ],
+        "busy": [serialise_window(w) for w in busy],
+        "free": [serialise_window(w) for w in free],
+    }
+    if duration_minutes:
+        result["slots"] = [
+            serialise_window(w) for w in find_slots(duration_minutes, free, limit=min(limit, MAX_SLOTS), tz=tz)
+        ]
+    return result
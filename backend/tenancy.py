@@ -0,0 +1,126 @@
+import contextvars
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Generic, Iterator, List, Optional, TypeVar
+
+# Set DOLMA_SINGLE_TENANT=1 to keep every browser on the shared goals.json/token.json.
+SINGLE_TENANT = os.getenv("DOLMA_SINGLE_TENANT", "").lower() in ("1", "true", "yes")
+USER_DATA_DIR = os.getenv("USER_DATA_DIR", os.path.join(os.path.dirname(__file__), "user_data"))
+DEFAULT_USER = "default"
+LEGACY_CLAIM_FILE = os.path.join(USER_DATA_DIR, ".legacy_claimed")
+
+_current_user: contextvars.ContextVar = contextvars.ContextVar("dolma_user", default=DEFAULT_USER)
+
+T = TypeVar("T")
+
+
+def safe_user_id(user_id: Optional[str]) -> str:
+    cleaned = "".join(ch for ch in (user_id or "") if ch.isalnum() or ch in "-_")
+    return cleaned[:64] or DEFAULT_USER
+
+
+def current_user() -> str:
+    """
+    User the current request acts for. Outside a request (scripts, benchmarks, background
+    threads) this is DEFAULT_USER, which maps to the legacy shared files.
+    """
+    return _current_user.get()
+
+
+def set_current_user(user_id: Optional[str]) -> contextvars.Token:
+    if SINGLE_TENANT:
+        return _current_user.set(DEFAULT_USER)
+    return _current_user.set(safe_user_id(user_id))
+
+
+def reset_current_user(token: contextvars.Token) -> None:
+    _current_user.reset(token)
+
+
+def user_dir(user_id: str) -> str:
+    return os.path.join(USER_DATA_DIR, safe_user_id(user_id))
+
+
+def claim_legacy(has_data: Callable[[], bool]) -> bool:
+    """
+    Decides, once per data directory, whether the first new session inherits the store that
+    predates per-session users (goals.json and token.json, owned by DEFAULT_USER). True only
+    for that first session and only if has_data() finds something there; later sessions always
+    start empty. The decision is recorded in LEGACY_CLAIM_FILE.
+    """
+    if os.path.exists(LEGACY_CLAIM_FILE):
+        return False
+    os.makedirs(USER_DATA_DIR, exist_ok=True)
+    try:
+        fd = os.open(LEGACY_CLAIM_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    claimed = has_data()
+    with os.fdopen(fd, "w") as f:
+        f.write("claimed\n" if claimed else "no legacy data\n")
+    return claimed
+
+
+class LRUCache(Generic[T]):
+    """
+    Thread-safe bounded mapping for per-user hot objects. Entries checked out with pinned() are
+    skipped by eviction until released, so in-flight work never holds an orphaned copy.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = max(1, maxsize)
+        self._items: "OrderedDict[str, T]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: str, factory: Callable[[], T]) -> T:
+        with self._lock:
+            return self._get_or_create(key, factory, pin=False)
+
+    @contextmanager
+    def pinned(self, key: str, factory: Callable[[], T]) -> Iterator[T]:
+        """
+        get_or_create() for the length of a with block. Use it when the caller goes on to lock
+        the entry: an entry evicted between lookup and lock would let a concurrent request build
+        a second copy with its own lock.
+        """
+        with self._lock:
+            item = self._get_or_create(key, factory, pin=True)
+        try:
+            yield item
+        finally:
+            with self._lock:
+                pins = self._pins.pop(key) - 1
+                if pins:
+                    self._pins[key] = pins
+                else:
+                    self._evict()
+
+    def _get_or_create(self, key: str, factory: Callable[[], T], pin: bool) -> T:
+        if pin:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+            return item
+        item = factory()
+        self._items[key] = item
+        self._evict()
+        return item
+
+    def _evict(self) -> None:
+        for key in list(self._items.keys()):
+            if len(self._items) <= self.maxsize:
+                return
+            if key not in self._pins:
+                del self._items[key]
+
+    def values(self) -> List[T]:
+        with self._lock:
+            return list(self._items.values())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._items), "maxsize": self.maxsize}
@@ -0,0 +1,238 @@
+import bisect
+import contextvars
+import os
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+# Zone used when neither the browser nor the session supplies one.
+DEFAULT_ZONE = os.getenv("USER_TIMEZONE", "Australia/Sydney")
+# Years either side of the current one covered by each zone's transition table.
+TRANSITION_YEARS = 2
+
+_current_zone: contextvars.ContextVar = contextvars.ContextVar("dolma_zone", default=DEFAULT_ZONE)
+
+
+@lru_cache(maxsize=64)
+def get_zone(name: str = DEFAULT_ZONE) -> Optional[tzinfo]:
+    if not ZoneInfo:
+        return None
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        return None
+
+
+class ZoneProfile(NamedTuple):
+    name: str
+    tz: Optional[tzinfo]
+    # (UTC instant, offset from that instant on), ascending
+    transitions: Tuple[Tuple[datetime, timedelta], ...]
+
+
+def _offset(tz: tzinfo, instant: datetime) -> timedelta:
+    return instant.astimezone(tz).utcoffset() or timedelta(0)
+
+
+def _find_transitions(tz: tzinfo, start: datetime, end: datetime) -> List[Tuple[datetime, timedelta]]:
+    # sample daily, then bisect each change down to the minute
+    found = []
+    step = timedelta(days=1)
+    prev, prev_offset = start, _offset(tz, start)
+    cursor = start + step
+    while cursor <= end:
+        offset = _offset(tz, cursor)
+        if offset != prev_offset:
+            lo, hi = prev, cursor
+            while hi - lo > timedelta(minutes=1):
+                mid = lo + (hi - lo) / 2
+                if _offset(tz, mid) == prev_offset:
+                    lo = mid
+                else:
+                    hi = mid
+            found.append((hi.replace(second=0, microsecond=0), offset))
+            prev_offset = offset
+        prev = cursor
+        cursor += step
+    return found
+
+
+@lru_cache(maxsize=64)
+def zone_profile(name: str) -> ZoneProfile:
+    """
+    Zone object plus its DST transitions around the current year, built once per zone name.
+    Unknown names fall back to DEFAULT_ZONE.
+    """
+    tz = get_zone(name)
+    if tz is None and name != DEFAULT_ZONE:
+        return zone_profile(DEFAULT_ZONE)
+    if tz is None:
+        return ZoneProfile(name, None, ())
+    year = datetime.now(timezone.utc).year
+    start = datetime(year - TRANSITION_YEARS, 1, 1, tzinfo=timezone.utc)
+    end = datetime(year + TRANSITION_YEARS + 1, 1, 1, tzinfo=timezone.utc)
+    return ZoneProfile(name, tz, tuple(_find_transitions(tz, start, end)))
+
+
+def next_transition(profile: ZoneProfile, after: datetime) -> Optional[Tuple[datetime, timedelta]]:
+    instants = [t for t, _ in profile.transitions]
+    i = bisect.bisect_right(instants, after.astimezone(timezone.utc))
+    return profile.transitions[i] if i < len(profile.transitions) else None
+
+
+def is_valid_zone(name: Optional[str]) -> bool:
+    return bool(name) and len(name) <= 64 and get_zone(name) is not None
+
+
+def set_zone(name: Optional[str]) -> contextvars.Token:
+    """
+    Binds the display/scheduling zone for the current request; invalid names bind DEFAULT_ZONE.
+    """
+    return _current_zone.set(name if is_valid_zone(name) else DEFAULT_ZONE)
+
+
+def reset_zone(token: contextvars.Token) -> None:
+    _current_zone.reset(token)
+
+
+def current_zone_name() -> str:
+    return _current_zone.get()
+
+
+def current_zone() -> Optional[tzinfo]:
+    return zone_profile(current_zone_name()).tz
+
+
+def now() -> datetime:
+    tz = current_zone()
+    return datetime.now(tz) if tz else datetime.now()
+
+
+def offset_label(dt: datetime) -> str:
+    # 'UTC+11:00'
+    offset = dt.utcoffset() or timedelta(0)
+    sign = "-" if offset < timedelta(0) else "+"
+    minutes = abs(int(offset.total_seconds())) // 60
+    return f"UTC{sign}{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+@lru_cache(maxsize=8192)
+def parse_iso(value: str) -> datetime:
+    """
+    datetime.fromisoformat that also accepts a trailing 'Z'. Memoised: event pages repeat the
+    same timestamps (start of one event is often the end of another) and datetimes are immutable.
+    """
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _local(value: Union[str, datetime], tz: Optional[tzinfo]) -> datetime:
+    if isinstance(value, str):
+        return _local_from_iso(value, tz)
+    return _convert(value, tz)
+
+
+@lru_cache(maxsize=8192)
+def _local_from_iso(value: str, tz: Optional[tzinfo]) -> datetime:
+    return _convert(parse_iso(value), tz)
+
+
+def _convert(dt: datetime, tz: Optional[tzinfo]) -> datetime:
+    if not tz:
+        return dt
+    if dt.tzinfo is None:
+        # all-day dates and offset-less times are already wall-clock times in the user's zone
+        return dt.replace(tzinfo=tz)
+    return dt.astimezone(tz)
+
+
+@lru_cache(maxsize=2048)
+def _clock_label(hour: int, minute: int) -> str:
+    # '2:05 PM' without the leading zero
+    return f"{(hour % 12) or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def _clock(dt: datetime) -> str:
+    return _clock_label(dt.hour, dt.minute)
+
+
+@lru_cache(maxsize=4096)
+def _date_label(day: date) -> str:
+    return day.strftime("%A, %d %B %Y")
+
+
+def fmt_date_only(value: Union[str, datetime], tz: Optional[tzinfo] = None) -> str:
+    return _date_label(_local(value, tz or current_zone()).date())
+
+
+def fmt_time_range(start: Union[str, datetime], end: Union[str, datetime], tz: Optional[tzinfo] = None) -> str:
+    tz = tz or current_zone()
+    return f"{_clock(_local(start, tz))} – {_clock(_local(end, tz))}"
+
+
+def fmt_clock(value: Union[str, datetime], tz: Optional[tzinfo] = None) -> str:
+    return _clock(_local(value, tz or current_zone()))
+
+
+def fmt_short(value: Union[str, datetime], tz: Optional[tzinfo] = None) -> str:
+    # example: 'Mon, 3 Nov 2:00 PM'
+    return _local(value, tz or current_zone()).strftime("%a, %-d %b %-I:%M %p")
+
+
+def to_zone(value: Union[str, datetime], tz: Optional[tzinfo] = None):
+    if isinstance(value, str) and "T" in value:
+        return _local(value, tz or current_zone())
+    return value
+
+
+def event_bounds(event: Dict) -> Tuple[Optional[str], Optional[str]]:
+    start = (event.get("start") or {}).get("dateTime") or (event.get("start") or {}).get("date")
+    end = (event.get("end") or {}).get("dateTime") or (event.get("end") or {}).get("date")
+    return start, end
+
+
+def format_event_lines(
+    events: Iterable[Dict],
+    tz: Optional[tzinfo] = None,
+    *,
+    numbered: bool = False,
+    bullet: str = "• ",
+    include_date: bool = True,
+    fallback_day: Optional[str] = None,
+) -> List[str]:
+    """
+    Turn a page of Google Calendar events into display lines in one pass.
+    Timed events read '<title> — <date>, <start> – <end>'; all-day events end with '(all day)'.
+    Date labels are computed once per distinct local day.
+    """
+    tz = tz or current_zone()
+    day_labels: Dict[date, str] = {}
+    lines = []
+    for i, ev in enumerate(events, start=1):
+        title = ev.get("summary") or "(no title)"
+        prefix = f"{i}. " if numbered else bullet
+        start, end = event_bounds(ev)
+        try:
+            if start and end and "T" in start and "T" in end:
+                s = _local(start, tz)
+                e = _local(end, tz)
+                time_str = f"{_clock(s)} – {_clock(e)}"
+                if include_date:
+                    day = s.date()
+                    label = day_labels.get(day)
+                    if label is None:
+                        label = day_labels[day] = _date_label(day)
+                    lines.append(f"{prefix}{title} — {label}, {time_str}")
+                else:
+                    lines.append(f"{prefix}{title} — {time_str}")
+            elif include_date and (start or end or fallback_day):
+                lines.append(f"{prefix}{title} — {fmt_date_only(start or end or fallback_day, tz)} (all day)")
+            else:
+                lines.append(f"{prefix}{title}")
+        except Exception:
+            lines.append(f"{prefix}{title}")
+    return lines
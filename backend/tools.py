@@ -61,14 +61,13 @@ calendar_tools = [
         "type": "function",
         "function": {
             "name": "find_events",
-            "description": "List calendar events in a time window. Supports presets like today/this_week/next_week. Read-only.",
+            "description": "List calendar events in a time window. Supports presets like today/this_week/next_month/next_3_days/friday. Read-only.",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "preset": {
                         "type": "string",
-                        "enum": ["today", "tomorrow", "this_week", "next_week"],
-                        "description": "If set, ignore time_min/time_max and use preset in Australia/Sydney."
+                        "description": "If set, ignore time_min/time_max and use preset in the user's timezone. One of today, tomorrow, this_week, next_week, this_month, next_month, next_<N>_days (e.g. next_3_days) or a weekday name (e.g. friday, next_friday)."
                     },
                     "time_min": {
                         "type": "string",
@@ -100,8 +99,7 @@ calendar_tools = [
                     },
                     "preset": {
                         "type": "string",
-                        "enum": ["today", "tomorrow", "this_week", "next_week"],
-                        "description": "Optional preset to narrow search window."
+                        "description": "Optional preset to narrow search window. Same values as find_events.preset."
                     },
                     "time_min": {"type": "string"},
                     "time_max": {"type": "string"},
@@ -126,8 +124,7 @@ calendar_tools = [
                     },
                     "preset": {
                         "type": "string",
-                        "enum": ["today", "tomorrow", "this_week", "next_week"],
-                        "description": "Optional preset time range to limit search scope."
+                        "description": "Optional preset time range to limit search scope. Same values as find_events.preset."
                     },
                     "time_min": {
                         "type": "string",
@@ -167,6 +164,67 @@ calendar_tools = [
         }
     },
 
+    {
+        "type": "function",
+        "function": {
+            "name": "find_free_time",
+            "description": "Check the user's calendar for overlapping events, free time and the best slots for something of a given length. Use this instead of reasoning about overlaps yourself. Read-only.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "duration_minutes": {
+                        "type": "integer",
+                        "description": "Length of the slot the user needs. Omit to just list free time and conflicts."
+                    },
+                    "preset": {
+                        "type": "string",
+                        "description": "Range to search. Same values as find_events.preset. Defaults to the next 7 days."
+                    },
+                    "time_min": {"type": "string", "description": "RFC3339 start, used when preset is not provided."},
+                    "time_max": {"type": "string", "description": "RFC3339 end, used when preset is not provided."},
+                    "day_start_hour": {"type": "integer", "description": "Earliest local hour to suggest (default 8)."},
+                    "day_end_hour": {"type": "integer", "description": "Latest local hour a slot may end (default 20)."},
+                    "calendars": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Extra calendar ids (e.g. shared or work calendars) whose busy time should also count."
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "optimize_schedule",
+            "description": "Propose a rearrangement of the user's own events so nothing overlaps, keeping meetings with other people and recurring events fixed. Shows a preview first; call again with confirm=true only after the user approves.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "preset": {
+                        "type": "string",
+                        "description": "Range to optimise. Same values as find_events.preset. Defaults to this_week."
+                    },
+                    "time_min": {"type": "string", "description": "RFC3339 start, used when preset is not provided."},
+                    "time_max": {"type": "string", "description": "RFC3339 end, used when preset is not provided."},
+                    "day_start_hour": {"type": "integer", "description": "Earliest local hour events may be moved to (default 8)."},
+                    "day_end_hour": {"type": "integer", "description": "Latest local hour moved events may end (default 20)."},
+                    "buffer_minutes": {"type": "integer", "description": "Preferred gap between events (default 10)."},
+                    "keep": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Title keywords of events that must not move."
+                    },
+                    "only": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "If set, only events whose titles contain one of these keywords may move."
+                    },
+                    "confirm": {"type": "boolean", "description": "Apply the last proposed changes."}
+                }
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -265,6 +323,26 @@ calendar_tools = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "plan_goal_sessions",
+            "description": "Plan calendar sessions that cover a goal's remaining amount before its target date, fitted around existing events. Shows a preview first; call again with confirm=true only after the user approves.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "goal_id": {"type": "string", "description": "Identifier of the goal to plan."},
+                    "goal_title": {"type": "string", "description": "Use when the goal ID is unknown; the goal title or a distinctive part of it."},
+                    "session_minutes": {"type": "integer", "description": "Length of each session (default 60)."},
+                    "sessions_per_week": {"type": "integer", "description": "Sessions per week for goals not measured in time (default 3)."},
+                    "preferred_hour": {"type": "number", "description": "Preferred local start hour, e.g. 7 or 18.5."},
+                    "day_start_hour": {"type": "integer", "description": "Earliest local hour for a session (default 8)."},
+                    "day_end_hour": {"type": "integer", "description": "Latest local hour a session may end (default 20)."},
+                    "confirm": {"type": "boolean", "description": "Add the last previewed plan to the calendar."}
+                }
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -282,6 +360,23 @@ calendar_tools = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "goal_insights",
+            "description": "Report how the user is tracking across all goals: pace, required daily rate, projected finish date and which goals are at risk. Use for questions like 'how am I tracking?' or 'am I on pace?'.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "state": {
+                        "type": "string",
+                        "enum": ["at_risk", "overdue", "on_track", "ahead", "no_deadline", "complete"],
+                        "description": "Optional filter, e.g. only goals at risk."
+                    }
+                }
+            }
+        }
+    },
     # {
     #     "type": "function",
     #     "name": "get_events",
@@ -13,6 +13,27 @@ const CATEGORY_UNITS = {
   other: "",
 };
 
+const GOAL_SYNC_INTERVAL_MS = 15000;
+
+// the backend formats and schedules dates in this zone
+const BROWSER_TIMEZONE = (() => {
+  try {
+    return Intl.DateTimeFormat().resolvedOptions().timeZone || "";
+  } catch {
+    return "";
+  }
+})();
+const TIMEZONE_HEADERS = BROWSER_TIMEZONE ? { "X-Timezone": BROWSER_TIMEZONE } : {};
+
+// the backend replays the first result for a repeated key instead of writing twice
+const newIdempotencyKey = () => {
+  try {
+    return crypto.randomUUID();
+  } catch {
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+  }
+};
+
 const HAT_STORAGE_KEY = "dolmaHat";
 const HAT_VARIANTS = {
   hat_classic: {
@@ -174,6 +195,10 @@ export default function Home() {
   const [goalLoading, setGoalLoading] = useState(false);
   const [goalSaving, setGoalSaving] = useState(false);
   const chatEndRef = useRef(null);
+  const goalRevisionRef = useRef(null);
+  // Idempotency-Key per unanswered goal write (scope -> { body, key }): a double submit or a
+  // retry of the same body reuses the key, an edited body or a settled request gets a new one
+  const goalWriteKeysRef = useRef(new Map());
   const navigate = useNavigate();
   const location = useLocation();
 
@@ -227,12 +252,17 @@ export default function Home() {
     try {
       setGoalLoading(true);
       setGoalError(null);
-      const resp = await fetch(apiUrl("/api/goals"));
+      const resp = await fetch(apiUrl("/api/goals"), {
+        credentials: "include",
+        headers: TIMEZONE_HEADERS,
+      });
       const data = await resp.json().catch(() => ({}));
       if (!resp.ok) {
         throw new Error(data?.error || `HTTP ${resp.status}`);
       }
       setGoals(Array.isArray(data.goals) ? data.goals : []);
+      goalRevisionRef.current =
+        typeof data.revision === "number" ? data.revision : null;
     } catch (err) {
       console.error("Fetch goals error:", err);
       setGoalError(
@@ -249,6 +279,97 @@ export default function Home() {
     fetchGoals();
   }, [fetchGoals]);
 
+  const applyGoalDelta = useCallback((changed, deletedIds, revision) => {
+    if (typeof revision === "number") {
+      goalRevisionRef.current = revision;
+    }
+    const deleted = new Set(deletedIds || []);
+    if (!changed.length && !deleted.size) return;
+    setGoals((prev) => {
+      const byId = new Map(changed.map((goal) => [goal.id, goal]));
+      const next = prev
+        .filter((goal) => !deleted.has(goal.id))
+        .map((goal) => byId.get(goal.id) || goal);
+      const known = new Set(next.map((goal) => goal.id));
+      changed.forEach((goal) => {
+        if (!known.has(goal.id)) next.push(goal);
+      });
+      return next;
+    });
+  }, []);
+
+  // fallback delta sync for browsers without EventSource
+  const syncGoalChanges = useCallback(async () => {
+    const since = goalRevisionRef.current;
+    if (since === null) return;
+    try {
+      const resp = await fetch(
+        apiUrl(`/api/goals/changes?since=${since}&include=goals`),
+        { credentials: "include" }
+      );
+      if (!resp.ok) return;
+      const data = await resp.json().catch(() => ({}));
+      if (data.reset) {
+        fetchGoals();
+        return;
+      }
+      applyGoalDelta(
+        Array.isArray(data.goals) ? data.goals : [],
+        data.deleted,
+        data.revision
+      );
+    } catch (err) {
+      console.error("Goal sync error:", err);
+    }
+  }, [API_BASE, fetchGoals, applyGoalDelta]);
+
+  // server push: goal and calendar changes arrive over SSE, no polling needed
+  useEffect(() => {
+    if (typeof window === "undefined") return;
+    if (typeof window.EventSource === "undefined") {
+      const timer = window.setInterval(() => {
+        if (document.visibilityState === "visible") {
+          syncGoalChanges();
+        }
+      }, GOAL_SYNC_INTERVAL_MS);
+      return () => window.clearInterval(timer);
+    }
+
+    const source = new window.EventSource(apiUrl("/api/events/stream"), {
+      withCredentials: true,
+    });
+    const parse = (event) => {
+      try {
+        return JSON.parse(event.data);
+      } catch {
+        return {};
+      }
+    };
+    source.addEventListener("goals", (event) => {
+      const data = parse(event);
+      const since = goalRevisionRef.current;
+      if (since !== null && typeof data.revision === "number" && data.revision > since + 1) {
+        // missed a revision (e.g. before our first fetch finished): resync
+        fetchGoals();
+        return;
+      }
+      applyGoalDelta(
+        Array.isArray(data.goals) ? data.goals : [],
+        data.deleted,
+        data.revision
+      );
+    });
+    source.addEventListener("resync", () => {
+      fetchGoals();
+    });
+    source.addEventListener("calendar", (event) => {
+      window.dispatchEvent(
+        new CustomEvent("dolma-calendar-change", { detail: parse(event) })
+      );
+    });
+    return () => source.close();
+  }, [API_BASE, fetchGoals, applyGoalDelta, syncGoalChanges]);
+
   useEffect(() => {
     console.info("[DOLMA] API base URL:", API_BASE);
   }, [API_BASE]);
@@ -330,16 +451,41 @@ export default function Home() {
     return () => clearTimeout(timer);
   }, [goalMessage]);
 
+  const goalWriteKey = useCallback((scope, body) => {
+    const pending = goalWriteKeysRef.current.get(scope);
+    if (pending && pending.body === body) return pending.key;
+    const key = newIdempotencyKey();
+    goalWriteKeysRef.current.set(scope, { body, key });
+    return key;
+  }, []);
+
+  // the server answered (success or a client error): a later identical write is a new one.
+  // 5xx and network errors keep the key so a retry can be replayed instead of applied twice.
+  const settleGoalWrite = useCallback((scope, key, resp) => {
+    if (resp.status >= 500) return;
+    if (goalWriteKeysRef.current.get(scope)?.key === key) {
+      goalWriteKeysRef.current.delete(scope);
+    }
+  }, []);
+
   const applyGoalUpdate = useCallback(
     async (goalId, payload, successText) => {
       try {
         setGoalError(null);
         setGoalMessage(null);
+        const scope = `goal:${goalId}`;
+        const body = JSON.stringify(payload);
+        const key = goalWriteKey(scope, body);
         const resp = await fetch(apiUrl(`/api/goals/${goalId}`), {
           method: "PATCH",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify(payload),
+          credentials: "include",
+          headers: {
+            "Content-Type": "application/json",
+            "Idempotency-Key": key,
+          },
+          body,
         });
+        settleGoalWrite(scope, key, resp);
         const data = await resp.json().catch(() => ({}));
         if (!resp.ok) {
           throw new Error(data.error || `HTTP ${resp.status}`);
@@ -364,7 +510,7 @@ export default function Home() {
         setGoalError(err.message || "Unable to update goal.");
       }
     },
-    [API_BASE]
+    [API_BASE, goalWriteKey, settleGoalWrite]
   );
 
   const handleGoalSubmit = async (e) => {
@@ -411,16 +557,25 @@ export default function Home() {
       }
       payload.target_unit = unitSymbol;
       payload.progress_value = 0;
+      const body = JSON.stringify(payload);
+      const key = goalWriteKey("goal:new", body);
       const resp = await fetch(apiUrl("/api/goals"), {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
+        credentials: "include",
+        headers: {
+          "Content-Type": "application/json",
+          "Idempotency-Key": key,
+        },
+        body,
       });
+      settleGoalWrite("goal:new", key, resp);
       const data = await resp.json().catch(() => ({}));
       if (!resp.ok) {
         throw new Error(data.error || `HTTP ${resp.status}`);
       }
-      setGoals((prev) => [...prev, data]);
+      setGoals((prev) =>
+        prev.some((goal) => goal.id === data.id) ? prev : [...prev, data]
+      );
       setGoalForm({
         title: "",
         description: "",
@@ -478,6 +633,7 @@ export default function Home() {
       setGoalMessage(null);
       const resp = await fetch(apiUrl(`/api/goals/${goalId}`), {
         method: "DELETE",
+        credentials: "include",
       });
       const data = await resp.json().catch(() => ({}));
       if (!resp.ok) {
@@ -512,6 +668,7 @@ export default function Home() {
     if (!input.trim()) return;
 
     const userMsg = { role: "user", text: input };
+    const requestKey = newIdempotencyKey();
     setMessages((prev) => [...prev, userMsg]);
     setInput("");
 
@@ -526,7 +683,11 @@ export default function Home() {
       const response = await fetch(apiUrl("/api/chat"), {
         method: "POST",
         credentials: "include",
-        headers: { "Content-Type": "application/json" },
+        headers: {
+          "Content-Type": "application/json",
+          "Idempotency-Key": requestKey,
+          ...TIMEZONE_HEADERS,
+        },
         body: JSON.stringify({
           message: userMsg.text,
           conversation: filteredConversation,
@@ -543,6 +704,12 @@ export default function Home() {
 
       if (Array.isArray(data.goals)) {
         setGoals(data.goals);
+      } else if (data.goal && data.goal.id) {
+        setGoals((prev) =>
+          prev.some((goal) => goal.id === data.goal.id)
+            ? prev.map((goal) => (goal.id === data.goal.id ? data.goal : goal))
+            : [...prev, data.goal]
+        );
       }
 
       // builds a single assistant message that prefers structured fields if present
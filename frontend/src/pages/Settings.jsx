@@ -51,10 +51,28 @@ export default function Settings() {
   const API_BASE = import.meta.env.VITE_API_BASE || "http://localhost:5000";
 
   useEffect(() => {
-    fetch(`${API_BASE}/api/google/status`, { credentials: "include" })
-      .then((res) => res.json())
-      .then((data) => setIsConnected(Boolean(data.connected)))
-      .catch(() => setIsConnected(false));
+    let timer = null;
+    let cancelled = false;
+    // after the OAuth redirect the token exchange may still be running; poll until it settles
+    const checkStatus = () => {
+      fetch(`${API_BASE}/api/google/status`, { credentials: "include" })
+        .then((res) => res.json())
+        .then((data) => {
+          if (cancelled) return;
+          setIsConnected(Boolean(data.connected));
+          if (data.connecting) {
+            timer = window.setTimeout(checkStatus, 1000);
+          }
+        })
+        .catch(() => {
+          if (!cancelled) setIsConnected(false);
+        });
+    };
+    checkStatus();
+    return () => {
+      cancelled = true;
+      if (timer) window.clearTimeout(timer);
+    };
   }, [API_BASE]);
 
   useEffect(() => {
@@ -90,7 +108,8 @@ export default function Settings() {
 
   const handleGoogleConnect = () => {
     if (isConnected) return;
-    window.location.href = `${API_BASE}/api/google/login`;
+    const returnTo = encodeURIComponent(window.location.origin);
+    window.location.href = `${API_BASE}/api/google/login?return_to=${returnTo}`;
   };
 
   const hatMeta = HAT_VARIANTS[selectedHat] || HAT_VARIANTS.classic;